@@ -0,0 +1,71 @@
+"""Add portfolio snapshot rollups
+
+Revision ID: 2616e17931ce
+Revises: a850378dcf22
+Create Date: 2026-10-17 15:02:19.734211
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2616e17931ce'
+down_revision = 'a850378dcf22'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('portfolio_snapshot_rollups',
+    sa.Column('portfolio_id', sa.Integer(), nullable=False),
+    sa.Column('tier', sa.String(length=8), nullable=False),
+    sa.Column('bucket_start', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('first_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('last_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('open_value', sa.Float(), nullable=False),
+    sa.Column('high_value', sa.Float(), nullable=False),
+    sa.Column('low_value', sa.Float(), nullable=False),
+    sa.Column('close_value', sa.Float(), nullable=False),
+    sa.Column('close_cost_basis', sa.Float(), nullable=False),
+    sa.Column('close_gain_loss', sa.Float(), nullable=False),
+    sa.Column('close_gain_loss_percent', sa.Float(), nullable=False),
+    sa.Column('high_gain_loss', sa.Float(), nullable=False),
+    sa.Column('low_gain_loss', sa.Float(), nullable=False),
+    sa.Column('sample_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['portfolio_id'], ['portfolios.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('portfolio_id', 'tier', 'bucket_start')
+    )
+
+    # Backfill every tier from the snapshots already stored (UTC buckets, ISO weeks).
+    for tier in ('hour', 'day', 'week'):
+        op.execute(f"""
+            INSERT INTO portfolio_snapshot_rollups (
+                portfolio_id, tier, bucket_start, first_at, last_at,
+                open_value, high_value, low_value, close_value,
+                close_cost_basis, close_gain_loss, close_gain_loss_percent,
+                high_gain_loss, low_gain_loss, sample_count
+            )
+            SELECT
+                portfolio_id,
+                '{tier}',
+                date_trunc('{tier}', snapshot_date AT TIME ZONE 'UTC') AT TIME ZONE 'UTC',
+                min(snapshot_date),
+                max(snapshot_date),
+                (array_agg(total_value ORDER BY snapshot_date))[1],
+                max(total_value),
+                min(total_value),
+                (array_agg(total_value ORDER BY snapshot_date DESC))[1],
+                (array_agg(total_cost_basis ORDER BY snapshot_date DESC))[1],
+                (array_agg(total_gain_loss ORDER BY snapshot_date DESC))[1],
+                (array_agg(total_gain_loss_percent ORDER BY snapshot_date DESC))[1],
+                max(total_gain_loss),
+                min(total_gain_loss),
+                count(*)
+            FROM portfolio_snapshots
+            GROUP BY portfolio_id, 3
+        """)
+
+
+def downgrade() -> None:
+    op.drop_table('portfolio_snapshot_rollups')
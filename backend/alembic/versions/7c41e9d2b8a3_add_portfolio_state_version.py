@@ -0,0 +1,24 @@
+"""Add portfolio state_version
+
+Revision ID: 7c41e9d2b8a3
+Revises: 2616e17931ce
+Create Date: 2026-10-17 17:40:06.218447
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c41e9d2b8a3'
+down_revision = '2616e17931ce'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('portfolios', sa.Column('state_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('portfolios', 'state_version')
@@ -0,0 +1,32 @@
+"""Add symbol_prices last-known-good price store
+
+Revision ID: a850378dcf22
+Revises: 53960d22af24
+Create Date: 2026-10-17 10:12:41.518302
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a850378dcf22'
+down_revision = '53960d22af24'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('symbol_prices',
+    sa.Column('symbol', sa.String(), nullable=False),
+    sa.Column('price', sa.Float(), nullable=False),
+    sa.Column('previous_close', sa.Float(), nullable=True),
+    sa.Column('currency', sa.String(), nullable=True),
+    sa.Column('fetched_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('symbol')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('symbol_prices')
@@ -0,0 +1,148 @@
+"""Partition portfolio snapshots by month, composite time-series indexes
+
+Revision ID: b5f3a1c8d920
+Revises: 7c41e9d2b8a3
+Create Date: 2026-10-17 19:12:44.508913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5f3a1c8d920'
+down_revision = '7c41e9d2b8a3'
+branch_labels = None
+depends_on = None
+
+
+SNAPSHOT_COLUMNS = (
+    "id, portfolio_id, total_value, total_cost_basis, total_gain_loss, "
+    "total_gain_loss_percent, snapshot_date, created_at"
+)
+
+# Creates the monthly partitions (UTC months) covering [from_ts, to_ts] that don't
+# exist yet. Rows that landed in the default partition for a month are moved into
+# it first, so ATTACH never conflicts. Called by the snapshot writer to keep
+# partitions a few months ahead.
+ENSURE_PARTITIONS_FUNCTION = """
+CREATE OR REPLACE FUNCTION ensure_portfolio_snapshot_partitions(from_ts timestamptz, to_ts timestamptz)
+RETURNS integer LANGUAGE plpgsql AS $$
+DECLARE
+    month_start timestamptz := date_trunc('month', from_ts AT TIME ZONE 'UTC') AT TIME ZONE 'UTC';
+    month_end timestamptz;
+    partition_name text;
+    created integer := 0;
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('ensure_portfolio_snapshot_partitions'));
+    WHILE month_start <= to_ts LOOP
+        month_end := ((month_start AT TIME ZONE 'UTC') + interval '1 month') AT TIME ZONE 'UTC';
+        partition_name := 'portfolio_snapshots_' || to_char(month_start AT TIME ZONE 'UTC', 'YYYY_MM');
+        IF to_regclass(partition_name) IS NULL THEN
+            EXECUTE format('CREATE TABLE %I (LIKE portfolio_snapshots INCLUDING DEFAULTS)', partition_name);
+            EXECUTE format(
+                'WITH moved AS (DELETE FROM portfolio_snapshots_default '
+                'WHERE snapshot_date >= $1 AND snapshot_date < $2 RETURNING *) '
+                'INSERT INTO %I SELECT * FROM moved',
+                partition_name
+            ) USING month_start, month_end;
+            EXECUTE format(
+                'ALTER TABLE portfolio_snapshots ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                partition_name, month_start, month_end
+            );
+            created := created + 1;
+        END IF;
+        month_start := month_end;
+    END LOOP;
+    RETURN created;
+END;
+$$
+"""
+
+
+def upgrade() -> None:
+    # news: (symbol, published_at DESC) serves the symbol + recency filter and its
+    # ORDER BY ... LIMIT; the old symbol index is a prefix of it
+    op.drop_index('ix_news_articles_symbol', table_name='news_articles')
+    op.create_index(
+        'ix_news_articles_symbol_published_at',
+        'news_articles',
+        ['symbol', sa.text('published_at DESC')],
+        unique=False
+    )
+
+    # portfolio_snapshots: rebuild as a table partitioned by month on snapshot_date.
+    # The primary key must include the partition key; ids keep their sequence.
+    op.rename_table('portfolio_snapshots', 'portfolio_snapshots_unpartitioned')
+    op.execute("ALTER TABLE portfolio_snapshots_unpartitioned RENAME CONSTRAINT portfolio_snapshots_pkey TO portfolio_snapshots_unpartitioned_pkey")
+    op.drop_index('ix_portfolio_snapshots_id', table_name='portfolio_snapshots_unpartitioned')
+    op.drop_index('ix_portfolio_snapshots_portfolio_id', table_name='portfolio_snapshots_unpartitioned')
+    op.drop_index('ix_portfolio_snapshots_snapshot_date', table_name='portfolio_snapshots_unpartitioned')
+    op.execute("ALTER SEQUENCE portfolio_snapshots_id_seq OWNED BY NONE")
+
+    op.create_table('portfolio_snapshots',
+    sa.Column('id', sa.Integer(), server_default=sa.text("nextval('portfolio_snapshots_id_seq')"), nullable=False),
+    sa.Column('portfolio_id', sa.Integer(), nullable=False),
+    sa.Column('total_value', sa.Float(), nullable=False),
+    sa.Column('total_cost_basis', sa.Float(), nullable=False),
+    sa.Column('total_gain_loss', sa.Float(), nullable=False),
+    sa.Column('total_gain_loss_percent', sa.Float(), nullable=False),
+    sa.Column('snapshot_date', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['portfolio_id'], ['portfolios.id'], ),
+    sa.PrimaryKeyConstraint('id', 'snapshot_date'),
+    postgresql_partition_by='RANGE (snapshot_date)'
+    )
+    op.execute("ALTER SEQUENCE portfolio_snapshots_id_seq OWNED BY portfolio_snapshots.id")
+    op.create_index('ix_portfolio_snapshots_portfolio_id_snapshot_date', 'portfolio_snapshots', ['portfolio_id', 'snapshot_date'], unique=False)
+    op.create_index(op.f('ix_portfolio_snapshots_snapshot_date'), 'portfolio_snapshots', ['snapshot_date'], unique=False)
+    # Catches rows outside every monthly partition, so an insert never fails
+    op.execute("CREATE TABLE portfolio_snapshots_default PARTITION OF portfolio_snapshots DEFAULT")
+
+    op.execute(ENSURE_PARTITIONS_FUNCTION)
+    op.execute("""
+        SELECT ensure_portfolio_snapshot_partitions(
+            coalesce((SELECT min(snapshot_date) FROM portfolio_snapshots_unpartitioned), now()),
+            now() + interval '3 months'
+        )
+    """)
+    op.execute(f"""
+        INSERT INTO portfolio_snapshots ({SNAPSHOT_COLUMNS})
+        SELECT {SNAPSHOT_COLUMNS} FROM portfolio_snapshots_unpartitioned
+    """)
+    op.drop_table('portfolio_snapshots_unpartitioned')
+    op.execute("ANALYZE portfolio_snapshots")
+
+
+def downgrade() -> None:
+    op.rename_table('portfolio_snapshots', 'portfolio_snapshots_partitioned')
+    op.execute("ALTER TABLE portfolio_snapshots_partitioned RENAME CONSTRAINT portfolio_snapshots_pkey TO portfolio_snapshots_partitioned_pkey")
+    op.drop_index('ix_portfolio_snapshots_portfolio_id_snapshot_date', table_name='portfolio_snapshots_partitioned')
+    op.drop_index('ix_portfolio_snapshots_snapshot_date', table_name='portfolio_snapshots_partitioned')
+    op.execute("ALTER SEQUENCE portfolio_snapshots_id_seq OWNED BY NONE")
+
+    op.create_table('portfolio_snapshots',
+    sa.Column('id', sa.Integer(), server_default=sa.text("nextval('portfolio_snapshots_id_seq')"), nullable=False),
+    sa.Column('portfolio_id', sa.Integer(), nullable=False),
+    sa.Column('total_value', sa.Float(), nullable=False),
+    sa.Column('total_cost_basis', sa.Float(), nullable=False),
+    sa.Column('total_gain_loss', sa.Float(), nullable=False),
+    sa.Column('total_gain_loss_percent', sa.Float(), nullable=False),
+    sa.Column('snapshot_date', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['portfolio_id'], ['portfolios.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute("ALTER SEQUENCE portfolio_snapshots_id_seq OWNED BY portfolio_snapshots.id")
+    op.execute(f"""
+        INSERT INTO portfolio_snapshots ({SNAPSHOT_COLUMNS})
+        SELECT {SNAPSHOT_COLUMNS} FROM portfolio_snapshots_partitioned
+    """)
+    op.drop_table('portfolio_snapshots_partitioned')  # drops every partition with it
+    op.execute("DROP FUNCTION ensure_portfolio_snapshot_partitions(timestamptz, timestamptz)")
+    op.create_index(op.f('ix_portfolio_snapshots_id'), 'portfolio_snapshots', ['id'], unique=False)
+    op.create_index(op.f('ix_portfolio_snapshots_portfolio_id'), 'portfolio_snapshots', ['portfolio_id'], unique=False)
+    op.create_index(op.f('ix_portfolio_snapshots_snapshot_date'), 'portfolio_snapshots', ['snapshot_date'], unique=False)
+
+    op.drop_index('ix_news_articles_symbol_published_at', table_name='news_articles')
+    op.create_index(op.f('ix_news_articles_symbol'), 'news_articles', ['symbol'], unique=False)
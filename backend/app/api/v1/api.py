@@ -1,9 +1,10 @@
 from fastapi import APIRouter
-from app.api.v1.endpoints import portfolios, news, chatbot, plaid
+from app.api.v1.endpoints import portfolios, news, chatbot, plaid, metrics, stream
 
 api_router = APIRouter()
 api_router.include_router(portfolios.router, prefix="/portfolios", tags=["portfolios"])
 api_router.include_router(news.router, prefix="/news", tags=["news"])
 api_router.include_router(chatbot.router, prefix="/chatbot", tags=["chatbot"])
 api_router.include_router(plaid.router, prefix="/plaid", tags=["plaid"])
-
+api_router.include_router(stream.router, prefix="/stream", tags=["stream"])
+api_router.include_router(metrics.router, prefix="/metrics", tags=["metrics"])
@@ -0,0 +1,29 @@
+from fastapi import APIRouter
+from app.core.database import async_engine, engine
+from app.core.db_pool import pool_stats
+from app.core.llm_client import llm_stats
+from app.core.response_cache import response_cache
+from app.core.upstream_guard import guard_stats
+from app.services.price_service import quote_cache
+from app.services.price_refresher import refresher_stats
+from app.services.projection import projection_stats
+from app.services.quote_stream import quote_hub
+from app.services.snapshot_writer import snapshot_writer
+
+router = APIRouter()
+
+
+@router.get("/")
+async def get_metrics():
+    """Runtime counters for in-process caches, upstream clients and database pools."""
+    return {
+        "quote_cache": quote_cache.stats(),
+        "response_cache": response_cache.stats(),
+        "price_refresher": refresher_stats(),
+        "upstream": guard_stats(),
+        "llm": llm_stats(),
+        "quote_stream": quote_hub.stats(),
+        "snapshot_writer": snapshot_writer.stats(),
+        "projection": projection_stats(),
+        "db_pool": {"sync": pool_stats(engine), "async": pool_stats(async_engine.sync_engine)}
+    }
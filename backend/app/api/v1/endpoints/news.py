@@ -1,8 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from typing import List, Optional
 from datetime import datetime, timedelta
-from app.core.database import get_db
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, get_async_db
+from app.core.response_cache import response_cache
 from app.schemas.news import NewsArticleResponse, StockSentimentResponse
 from app.models.news import NewsArticle, StockSentiment
 from app.models.portfolio import Holding
@@ -19,16 +26,18 @@ CURRENT_USER_ID = 1
 async def get_news_for_symbol(
     symbol: str,
     limit: int = 5,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get news articles for a specific stock symbol with sentiment analysis and summaries."""
     # Check if we have recent articles in the database (within last 24 hours)
     from datetime import timedelta
     recent_cutoff = datetime.utcnow() - timedelta(hours=24)
-    existing_articles = db.query(NewsArticle).filter(
-        NewsArticle.symbol == symbol.upper(),
-        NewsArticle.published_at >= recent_cutoff
-    ).order_by(NewsArticle.published_at.desc()).limit(limit).all()
+    existing_articles = (await db.execute(
+        select(NewsArticle).where(
+            NewsArticle.symbol == symbol.upper(),
+            NewsArticle.published_at >= recent_cutoff
+        ).order_by(NewsArticle.published_at.desc()).limit(limit)
+    )).scalars().all()
     
     if existing_articles and len(existing_articles) >= limit:
         # Return existing articles with summaries
@@ -60,7 +69,7 @@ async def get_news_for_symbol(
         db.add(db_article)
         articles.append(db_article)
     
-    db.commit()
+    await db.commit()
     
     # Analyze sentiment and generate summaries
     if articles:
@@ -74,7 +83,7 @@ async def get_news_for_symbol(
             article.summary = summary
             db.add(article)
         
-        db.commit()
+        await db.commit()
     
     return [NewsArticleResponse(
         id=art.id,
@@ -91,17 +100,18 @@ async def get_news_for_symbol(
 @router.get("/sentiment/{symbol}", response_model=StockSentimentResponse)
 async def get_sentiment_for_symbol(
     symbol: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get sentiment analysis for a specific stock symbol."""
     # Get recent news articles
-    recent_articles = db.query(NewsArticle).filter(
+    recent_articles = (await db.execute(select(NewsArticle).where(
         NewsArticle.symbol == symbol.upper(),
         NewsArticle.published_at >= datetime.utcnow() - timedelta(days=7)
-    ).all()
+    ))).scalars().all()
     
     if not recent_articles:
-        # Fetch new news if none exists
+        # Fetch new news if none exists; end the read first so no connection is held meanwhile
+        await db.commit()
         news_data = await fetch_financial_news(symbol.upper(), 10)
         headlines = [item["title"] for item in news_data]
         sentiment_score = await analyze_sentiment(headlines)
@@ -113,9 +123,9 @@ async def get_sentiment_for_symbol(
     sentiment_label = get_sentiment_label(sentiment_score)
     
     # Update or create sentiment record
-    sentiment = db.query(StockSentiment).filter(
+    sentiment = (await db.execute(select(StockSentiment).where(
         StockSentiment.symbol == symbol.upper()
-    ).first()
+    ))).scalar_one_or_none()
     
     if sentiment:
         sentiment.sentiment_score = sentiment_score
@@ -131,8 +141,8 @@ async def get_sentiment_for_symbol(
         )
         db.add(sentiment)
     
-    db.commit()
-    db.refresh(sentiment)
+    await db.commit()
+    await db.refresh(sentiment)
     
     return StockSentimentResponse(
         symbol=sentiment.symbol,
@@ -146,26 +156,66 @@ async def get_sentiment_for_symbol(
 @router.get("/portfolio/{portfolio_id}/sentiments", response_model=List[StockSentimentResponse])
 async def get_portfolio_sentiments(
     portfolio_id: int,
-    db: Session = Depends(get_db)
+    request: Request,
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get sentiment analysis for all stocks in a portfolio."""
+    """
+    Get sentiment analysis for all stocks in a portfolio.
+    Symbols are computed concurrently (at most SENTIMENT_CONCURRENCY at a time);
+    ones that fail or exceed SENTIMENT_SYMBOL_TIMEOUT_SECONDS are left out and
+    listed in the X-Missing-Symbols header.
+    Cached per portfolio state version for RESPONSE_CACHE_SENTIMENT_TTL_SECONDS.
+    """
     from app.models.portfolio import Portfolio
     
-    portfolio = db.query(Portfolio).filter(
-        Portfolio.id == portfolio_id,
-        Portfolio.user_id == CURRENT_USER_ID
-    ).first()
+    portfolio = (await db.execute(
+        select(Portfolio).options(selectinload(Portfolio.holdings)).where(
+            Portfolio.id == portfolio_id,
+            Portfolio.user_id == CURRENT_USER_ID
+        )
+    )).scalar_one_or_none()
     
     if not portfolio:
         raise HTTPException(status_code=404, detail="Portfolio not found")
     
-    # Get unique symbols from holdings
-    symbols = set([holding.symbol for holding in portfolio.holdings])
+    key = (portfolio_id, "sentiments")
+    entry = response_cache.get(key, portfolio.state_version)
+    if entry is not None:
+        return response_cache.respond(request, entry)
     
-    sentiments = []
-    for symbol in symbols:
-        sentiment = await get_sentiment_for_symbol(symbol, db)
-        sentiments.append(sentiment)
+    # Get unique symbols from holdings
+    symbols = sorted(set(holding.symbol for holding in portfolio.holdings))
+    await db.commit()  # release this session's connection; the tasks below use their own
+    semaphore = asyncio.Semaphore(max(1, settings.SENTIMENT_CONCURRENCY))
+    
+    async def sentiment_for(symbol: str) -> Optional[StockSentimentResponse]:
+        # Each task gets its own session: an AsyncSession must not be shared across tasks
+        async with semaphore:
+            try:
+                async with AsyncSessionLocal() as session:
+                    return await asyncio.wait_for(
+                        get_sentiment_for_symbol(symbol, session),
+                        timeout=settings.SENTIMENT_SYMBOL_TIMEOUT_SECONDS
+                    )
+            except asyncio.TimeoutError:
+                print(f"Sentiment for {symbol} timed out")
+            except Exception as e:
+                print(f"Error computing sentiment for {symbol}: {e}")
+            return None
+    
+    results = await asyncio.gather(*(sentiment_for(symbol) for symbol in symbols))
+    sentiments = [sentiment for sentiment in results if sentiment is not None]
+    missing = [symbol for symbol, sentiment in zip(symbols, results) if sentiment is None]
+    
+    if missing:
+        # Partial results aren't cached, so the next request retries the missing symbols
+        return JSONResponse(
+            content=jsonable_encoder(sentiments),
+            headers={"X-Missing-Symbols": ",".join(missing), "Cache-Control": "no-store"}
+        )
     
-    return sentiments
-
+    entry = response_cache.put(
+        key, portfolio.state_version, sentiments,
+        ttl_seconds=settings.RESPONSE_CACHE_SENTIMENT_TTL_SECONDS
+    )
+    return response_cache.respond(request, entry)
@@ -1,9 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import Optional
-from datetime import datetime
+from datetime import datetime, timedelta
+import asyncio
+from collections import defaultdict
+from app.core.config import settings
 from app.core.database import get_db
+from app.schemas.portfolio import PortfolioReturns
+from app.services.bar_store import schedule_backfill
+from app.services.returns_engine import compute_returns, events_from_plaid_transactions, summarize
 from app.services.plaid_service import (
     create_link_token,
     exchange_public_token,
@@ -143,3 +149,55 @@ async def get_investment_transactions_endpoint(
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to fetch investment transactions: {str(e)}")
 
+
+
+@router.post("/investments/returns", response_model=PortfolioReturns)
+async def get_investment_returns_endpoint(
+    request: AccessTokenRequest,
+    date_range: Optional[DateRangeRequest] = None,
+    max_points: int = Query(settings.PERFORMANCE_MAX_POINTS, ge=3, le=10000),
+    db: Session = Depends(get_db)
+):
+    """
+    Daily value with time- and money-weighted returns for a Plaid investment
+    account, rebuilt from its investment transactions and stored daily closes.
+    Positions held at the start of the range are derived from the current
+    holdings minus every trade since the start of the range.
+    Optional date range (defaults to last 30 days).
+    """
+    try:
+        start_date = None
+        end_date = None
+        if date_range:
+            if date_range.start_date:
+                start_date = datetime.fromisoformat(date_range.start_date.replace('Z', '+00:00'))
+            if date_range.end_date:
+                end_date = datetime.fromisoformat(date_range.end_date.replace('Z', '+00:00'))
+        # Pin the default window here: the opening positions are derived as of its start.
+        start_date = start_date or datetime.now() - timedelta(days=30)
+        
+        # Trades up to now, not just to end_date: holdings are current, so every
+        # later trade has to be unwound too to get the positions held at start_date.
+        holdings, transactions = await asyncio.gather(
+            get_investment_holdings(request.access_token),
+            get_investment_transactions(request.access_token, start_date, None)
+        )
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Failed to fetch investment history: {str(e)}")
+    
+    events = events_from_plaid_transactions(transactions)
+    opening = defaultdict(float)
+    for holding in holdings:
+        if holding.get("ticker_symbol"):
+            opening[holding["ticker_symbol"].upper()] += holding["quantity"] or 0.0
+    for event in events:
+        if event.get("symbol"):
+            opening[event["symbol"]] -= event["quantity"]
+    if end_date:
+        events = [e for e in events if e["date"] <= end_date.date()]
+    
+    schedule_backfill(list(opening))
+    result = await asyncio.to_thread(
+        compute_returns, events, dict(opening), start_date.date(), end_date.date() if end_date else None
+    )
+    return PortfolioReturns(**summarize(result, max_points))
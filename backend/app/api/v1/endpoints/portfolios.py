@@ -1,9 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
-from typing import List
-from datetime import datetime, timedelta
-from app.core.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from sqlalchemy import bindparam, insert, select, update
+from starlette.formparsers import MultiPartException, MultiPartParser
+from typing import Dict, List, Literal, Optional
+from datetime import date, datetime, timedelta
+import asyncio
+import numpy as np
+from app.core.config import settings
+from app.core.database import get_async_db
+from app.core.query_counter import query_budget
+from app.core.response_cache import response_cache
 from app.schemas.portfolio import (
     PortfolioCreate,
     PortfolioResponse,
@@ -12,11 +19,28 @@ from app.schemas.portfolio import (
     HoldingResponse,
     PortfolioSummary,
     HistoricalPerformance,
-    PortfolioSnapshotResponse
+    PortfolioSnapshotResponse,
+    PortfolioReturns,
+    NetWorth,
+    PortfolioValue,
+    HoldingsImportResult,
+    PortfolioRisk,
+    PortfolioProjection
 )
 from app.models.portfolio import Portfolio, Holding
 from app.models.portfolio_snapshot import PortfolioSnapshot
-from app.services.price_service import get_stock_price
+from app.services.bar_store import bar_store, schedule_backfill, valid_symbol
+from app.services.downsampling import lttb_indices
+from app.services.holdings_import import (
+    MULTIPART_OVERHEAD_BYTES, HoldingsImportError, UploadTooLarge, detect_format, limit_bytes, merge_position, read_positions
+)
+from app.services.price_service import get_stock_price, get_price_statuses
+from app.services.projection import project
+from app.services.risk_engine import compute_risk
+from app.services.returns_engine import compute_returns, events_from_holdings, summarize
+from app.services.snapshot_rollups import choose_tier, load_rollups
+from app.services.snapshot_writer import snapshot_writer
+from app.services.valuation import value_holdings, value_portfolios, value_exposure, allocation_rows
 
 router = APIRouter()
 
@@ -25,17 +49,70 @@ router = APIRouter()
 CURRENT_USER_ID = 1
 
 
-@router.get("/", response_model=List[PortfolioResponse])
-async def get_portfolios(db: Session = Depends(get_db)):
+def _holding_responses(holdings: List[Holding], valuation: Dict, price_statuses: Optional[Dict] = None) -> List[HoldingResponse]:
+    """Build holding responses from a valuation (see app.services.valuation)."""
+    price_statuses = price_statuses or {}
+    responses = []
+    for i, holding in enumerate(holdings):
+        price_status = price_statuses.get(holding.symbol.upper(), {})
+        current_price = valuation["current_price"][i]
+        responses.append(HoldingResponse(
+            id=holding.id,
+            portfolio_id=holding.portfolio_id,
+            symbol=holding.symbol,
+            quantity=holding.quantity,
+            average_cost=holding.average_cost,
+            current_price=None if np.isnan(current_price) else float(current_price),
+            market_value=float(valuation["market_value"][i]),
+            gain_loss=float(valuation["gain_loss"][i]),
+            gain_loss_percent=float(valuation["gain_loss_percent"][i]),
+            price_stale=price_status.get("stale"),
+            price_as_of=price_status.get("as_of"),
+            created_at=holding.created_at
+        ))
+    return responses
+
+
+async def _owned_portfolio(db: AsyncSession, portfolio_id: int, with_holdings: bool = True) -> Optional[Portfolio]:
+    """
+    Load one of the current user's portfolios, with its holdings eagerly loaded
+    unless with_holdings is False (use _load_holdings once they are needed;
+    relationships never lazy-load on an AsyncSession).
+    """
+    stmt = select(Portfolio).where(
+        Portfolio.id == portfolio_id,
+        Portfolio.user_id == CURRENT_USER_ID
+    )
+    if with_holdings:
+        stmt = stmt.options(selectinload(Portfolio.holdings))
+    return (await db.execute(stmt)).scalar_one_or_none()
+
+
+async def _load_holdings(db: AsyncSession, portfolio_id: int) -> List[Holding]:
+    result = await db.execute(select(Holding).where(Holding.portfolio_id == portfolio_id).order_by(Holding.id))
+    return list(result.scalars().all())
+
+
+async def _bump_state_version(db: AsyncSession, portfolio_id: int) -> None:
+    """Mark the portfolio's holdings as changed; cached responses keyed on the old version stop matching."""
+    await db.execute(
+        update(Portfolio).where(Portfolio.id == portfolio_id).values(state_version=Portfolio.state_version + 1)
+    )
+
+
+@router.get("/", response_model=List[PortfolioResponse], dependencies=[query_budget(2)])
+async def get_portfolios(db: AsyncSession = Depends(get_async_db)):
     """Get all portfolios for the current user."""
-    portfolios = db.query(Portfolio).filter(Portfolio.user_id == CURRENT_USER_ID).all()
-    return portfolios
+    result = await db.execute(
+        select(Portfolio).options(selectinload(Portfolio.holdings)).where(Portfolio.user_id == CURRENT_USER_ID)
+    )
+    return result.scalars().all()
 
 
 @router.post("/", response_model=PortfolioResponse, status_code=201)
 async def create_portfolio(
     portfolio: PortfolioCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create a new portfolio."""
     db_portfolio = Portfolio(
@@ -43,115 +120,144 @@ async def create_portfolio(
         name=portfolio.name
     )
     db.add(db_portfolio)
-    db.commit()
-    db.refresh(db_portfolio)
+    await db.commit()
+    await db.refresh(db_portfolio, ["created_at", "updated_at", "holdings"])
     return db_portfolio
 
 
-@router.get("/{portfolio_id}", response_model=PortfolioResponse)
-async def get_portfolio(portfolio_id: int, db: Session = Depends(get_db)):
+@router.get("/net-worth", response_model=NetWorth, dependencies=[query_budget(3)])
+async def get_net_worth(db: AsyncSession = Depends(get_async_db)):
+    """
+    Net worth across all of the user's portfolios: per-portfolio and consolidated
+    totals plus exposure per symbol. Every holding is loaded in one query and each
+    distinct symbol is priced once, however many portfolios hold it.
+    """
+    rows = (await db.execute(
+        select(
+            Portfolio.id.label("portfolio_id"),
+            Portfolio.name.label("portfolio_name"),
+            Holding.id.label("holding_id"),
+            Holding.symbol,
+            Holding.quantity,
+            Holding.average_cost,
+            Holding.current_price
+        ).outerjoin(Holding, Holding.portfolio_id == Portfolio.id).where(
+            Portfolio.user_id == CURRENT_USER_ID
+        ).order_by(Portfolio.id)
+    )).all()
+    names = {row.portfolio_id: row.portfolio_name for row in rows}
+    holdings = [row for row in rows if row.holding_id is not None]
+    
+    price_statuses = await get_price_statuses(sorted({h.symbol.upper() for h in holdings}))
+    prices = {symbol: status.get("price") for symbol, status in price_statuses.items()}
+    per_portfolio = value_portfolios(holdings, prices, names)
+    cost_basis = sum(t["total_cost_basis"] for t in per_portfolio.values())
+    net_worth = sum(t["total_market_value"] for t in per_portfolio.values())
+    gain_loss = net_worth - cost_basis
+    
+    exposure = value_exposure(holdings, prices)
+    for entry in exposure:
+        status = price_statuses.get(entry["symbol"], {})
+        entry["current_price"] = status.get("price")
+        entry["price_stale"] = status.get("stale")
+    
+    return NetWorth(
+        total_portfolios=len(names),
+        total_holdings=len(holdings),
+        total_cost_basis=round(cost_basis, 2),
+        total_market_value=round(net_worth, 2),
+        total_gain_loss=round(gain_loss, 2),
+        total_gain_loss_percent=round(gain_loss / cost_basis * 100, 2) if cost_basis > 0 else 0.0,
+        portfolios=[
+            PortfolioValue(
+                portfolio_id=portfolio_id,
+                portfolio_name=name,
+                total_holdings=per_portfolio[portfolio_id]["total_holdings"],
+                total_cost_basis=round(per_portfolio[portfolio_id]["total_cost_basis"], 2),
+                total_market_value=round(per_portfolio[portfolio_id]["total_market_value"], 2),
+                total_gain_loss=round(per_portfolio[portfolio_id]["total_gain_loss"], 2),
+                total_gain_loss_percent=round(per_portfolio[portfolio_id]["total_gain_loss_percent"], 2),
+                allocation=round(per_portfolio[portfolio_id]["total_market_value"] / net_worth * 100, 2) if net_worth > 0 else 0.0
+            )
+            for portfolio_id, name in names.items()
+        ],
+        exposure=exposure
+    )
+
+
+@router.get("/{portfolio_id}", response_model=PortfolioResponse, dependencies=[query_budget(2)])
+async def get_portfolio(portfolio_id: int, db: AsyncSession = Depends(get_async_db)):
     """Get a specific portfolio by ID."""
-    portfolio = db.query(Portfolio).filter(
-        Portfolio.id == portfolio_id,
-        Portfolio.user_id == CURRENT_USER_ID
-    ).first()
+    portfolio = await _owned_portfolio(db, portfolio_id)
     if not portfolio:
         raise HTTPException(status_code=404, detail="Portfolio not found")
     return portfolio
 
 
-@router.get("/{portfolio_id}/summary", response_model=PortfolioSummary)
-async def get_portfolio_summary(portfolio_id: int, db: Session = Depends(get_db)):
-    """Get portfolio summary with calculated values."""
-    portfolio = db.query(Portfolio).filter(
-        Portfolio.id == portfolio_id,
-        Portfolio.user_id == CURRENT_USER_ID
-    ).first()
-    if not portfolio:
-        raise HTTPException(status_code=404, detail="Portfolio not found")
-    
-    # Update current prices
-    holdings_with_prices = []
-    total_cost_basis = 0.0
-    total_market_value = 0.0
-    
-    for holding in portfolio.holdings:
-        current_price = await get_stock_price(holding.symbol)
-        if current_price:
-            holding.current_price = current_price
-        
-        cost_basis = holding.quantity * holding.average_cost
-        market_value = holding.quantity * (holding.current_price or holding.average_cost)
-        gain_loss = market_value - cost_basis
-        gain_loss_percent = (gain_loss / cost_basis * 100) if cost_basis > 0 else 0
-        
-        total_cost_basis += cost_basis
-        total_market_value += market_value
-        
-        holdings_with_prices.append(HoldingResponse(
-            id=holding.id,
-            portfolio_id=holding.portfolio_id,
-            symbol=holding.symbol,
-            quantity=holding.quantity,
-            average_cost=holding.average_cost,
-            current_price=holding.current_price,
-            market_value=market_value,
-            gain_loss=gain_loss,
-            gain_loss_percent=gain_loss_percent,
-            created_at=holding.created_at
-        ))
-    
-    db.commit()
+async def _summarize(portfolio: Portfolio, holdings: List[Holding]) -> PortfolioSummary:
+    """Value a portfolio's holdings at current prices and offer the totals to the snapshot writer."""
+    price_statuses = await get_price_statuses([h.symbol for h in holdings])
+    prices = {symbol: status.get("price") for symbol, status in price_statuses.items()}
+    valuation = value_holdings(holdings, prices)
+    holdings_with_prices = _holding_responses(holdings, valuation, price_statuses)
+    totals = valuation["totals"]
+    asset_allocation = allocation_rows([h.symbol for h in holdings], valuation)
     
-    total_gain_loss = total_market_value - total_cost_basis
-    total_gain_loss_percent = (total_gain_loss / total_cost_basis * 100) if total_cost_basis > 0 else 0
-    
-    # Calculate asset allocation
-    asset_allocation = []
-    for holding in holdings_with_prices:
-        if holding.market_value and total_market_value > 0:
-            allocation = (holding.market_value / total_market_value) * 100
-            asset_allocation.append({
-                "symbol": holding.symbol,
-                "allocation": round(allocation, 2),
-                "value": holding.market_value
-            })
-    
-    # Create snapshot for historical tracking
-    snapshot = PortfolioSnapshot(
-        portfolio_id=portfolio.id,
-        total_value=round(total_market_value, 2),
-        total_cost_basis=round(total_cost_basis, 2),
-        total_gain_loss=round(total_gain_loss, 2),
-        total_gain_loss_percent=round(total_gain_loss_percent, 2)
-    )
-    db.add(snapshot)
-    db.commit()
+    # Snapshots are buffered and deduplicated; the summary itself writes nothing
+    snapshot_writer.record(portfolio.id, totals)
     
     return PortfolioSummary(
         portfolio_id=portfolio.id,
         portfolio_name=portfolio.name,
         total_holdings=len(holdings_with_prices),
-        total_cost_basis=round(total_cost_basis, 2),
-        total_market_value=round(total_market_value, 2),
-        total_gain_loss=round(total_gain_loss, 2),
-        total_gain_loss_percent=round(total_gain_loss_percent, 2),
+        total_cost_basis=round(totals["total_cost_basis"], 2),
+        total_market_value=round(totals["total_market_value"], 2),
+        total_gain_loss=round(totals["total_gain_loss"], 2),
+        total_gain_loss_percent=round(totals["total_gain_loss_percent"], 2),
         asset_allocation=asset_allocation,
         holdings=holdings_with_prices
     )
 
 
+async def portfolio_summary(db: AsyncSession, portfolio_id: int) -> PortfolioSummary:
+    """Uncached summary of one of the current user's portfolios (404 if it isn't theirs)."""
+    portfolio = await _owned_portfolio(db, portfolio_id)
+    if not portfolio:
+        raise HTTPException(status_code=404, detail="Portfolio not found")
+    return await _summarize(portfolio, list(portfolio.holdings))
+
+
+@router.get("/{portfolio_id}/summary", response_model=PortfolioSummary, dependencies=[query_budget(4)])
+async def get_portfolio_summary(portfolio_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    """Get portfolio summary with calculated values."""
+    portfolio = await _owned_portfolio(db, portfolio_id, with_holdings=False)
+    if not portfolio:
+        raise HTTPException(status_code=404, detail="Portfolio not found")
+    
+    key = (portfolio_id, "summary")
+    entry = response_cache.get(key, portfolio.state_version)
+    if entry is None:
+        holdings = await _load_holdings(db, portfolio_id)
+        symbols = [h.symbol for h in holdings]
+        epoch = response_cache.price_epoch(symbols)
+        summary = await _summarize(portfolio, holdings)
+        entry = response_cache.put(
+            key, portfolio.state_version, summary, symbols, epoch,
+            extra=summary.model_dump(include={"total_cost_basis", "total_market_value", "total_gain_loss", "total_gain_loss_percent"})
+        )
+    else:
+        snapshot_writer.record(portfolio_id, entry["extra"])
+    return response_cache.respond(request, entry)
+
+
 @router.post("/{portfolio_id}/holdings", response_model=HoldingResponse, status_code=201)
 async def add_holding(
     portfolio_id: int,
     holding: HoldingCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Add a holding to a portfolio."""
-    portfolio = db.query(Portfolio).filter(
-        Portfolio.id == portfolio_id,
-        Portfolio.user_id == CURRENT_USER_ID
-    ).first()
+    portfolio = await _owned_portfolio(db, portfolio_id, with_holdings=False)
     if not portfolio:
         raise HTTPException(status_code=404, detail="Portfolio not found")
     
@@ -165,20 +271,131 @@ async def add_holding(
         current_price=current_price
     )
     db.add(db_holding)
-    db.commit()
-    db.refresh(db_holding)
+    await _bump_state_version(db, portfolio_id)
+    await db.commit()
+    response_cache.invalidate(portfolio_id)
+    await db.refresh(db_holding)
+    
+    return _holding_responses([db_holding], value_holdings([db_holding]))[0]
+
+
+@router.post("/{portfolio_id}/holdings/import", response_model=HoldingsImportResult, dependencies=[query_budget(9)])
+async def import_holdings(
+    portfolio_id: int,
+    request: Request,
+    strict: bool = Query(False, description="Reject the whole upload if any row is invalid"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Import many holdings from a CSV, NDJSON or JSON array upload, sent as the
+    raw request body (Content-Type picks the format) or as a multipart `file`.
+    Rows for the same symbol, and rows for symbols the portfolio already holds,
+    are merged at the weighted average cost. New positions are written in one
+    bulk INSERT, merged ones in one executemany UPDATE, and every imported symbol
+    is then priced with one batched lookup. Uploads over IMPORT_MAX_BYTES get a 413.
+    """
+    portfolio = await _owned_portfolio(db, portfolio_id)
+    if not portfolio:
+        raise HTTPException(status_code=404, detail="Portfolio not found")
+    
+    content_type = request.headers.get("content-type", "")
+    multipart = content_type.startswith("multipart/form-data")
+    max_body = settings.IMPORT_MAX_BYTES + (MULTIPART_OVERHEAD_BYTES if multipart else 0)
+    declared = request.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > max_body:
+        raise HTTPException(status_code=413, detail=f"Upload exceeds {settings.IMPORT_MAX_BYTES} bytes")
+    try:
+        if multipart:
+            # Parsed from a byte-counted stream so an oversized upload (chunked, or with a
+            # wrong Content-Length) is cut off before it is spooled rather than after.
+            try:
+                form = await MultiPartParser(
+                    request.headers, limit_bytes(request.stream(), max_body), max_files=1, max_fields=10
+                ).parse()
+            except MultiPartException as e:
+                raise HoldingsImportError(e.message)
+            try:
+                upload = form.get("file")
+                if upload is None or isinstance(upload, str):
+                    raise HoldingsImportError("Multipart uploads need a 'file' part")
+                fmt = detect_format(upload.content_type, upload.filename)
+                
+                async def chunks():
+                    while chunk := await upload.read(64 * 1024):
+                        yield chunk
+                positions, errors, rows = await read_positions(chunks(), fmt)
+            finally:
+                await form.close()
+        else:
+            positions, errors, rows = await read_positions(request.stream(), detect_format(content_type))
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except HoldingsImportError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if strict and errors:
+        raise HTTPException(status_code=422, detail={"message": "Upload has invalid rows", "errors": errors})
+    
+    existing = {}
+    for holding in portfolio.holdings:
+        existing.setdefault(holding.symbol.upper(), holding)
+    new_rows, merged_rows = [], []
+    for symbol, (quantity, average_cost) in positions.items():
+        holding = existing.get(symbol)
+        if holding is None:
+            new_rows.append({"portfolio_id": portfolio_id, "symbol": symbol, "quantity": quantity, "average_cost": average_cost})
+        else:
+            quantity, average_cost = merge_position(holding.quantity, holding.average_cost, quantity, average_cost)
+            merged_rows.append({"b_id": holding.id, "b_quantity": quantity, "b_average_cost": average_cost})
+    
+    table = Holding.__table__
+    if new_rows:
+        await db.execute(insert(table), new_rows)
+    if merged_rows:
+        await db.execute(
+            update(table).where(table.c.id == bindparam("b_id")).values(
+                quantity=bindparam("b_quantity"), average_cost=bindparam("b_average_cost")
+            ),
+            merged_rows
+        )
+    if positions:
+        await _bump_state_version(db, portfolio_id)
+    await db.commit()
+    response_cache.invalidate(portfolio_id)
+    
+    # Price everything imported at once and store it on the holdings
+    price_statuses = await get_price_statuses(list(positions))
+    priced = [
+        {"b_symbol": symbol, "b_price": status["price"]}
+        for symbol, status in price_statuses.items() if status.get("price")
+    ]
+    if priced:
+        await db.execute(
+            update(table).where(
+                table.c.portfolio_id == portfolio_id, table.c.symbol == bindparam("b_symbol")
+            ).values(current_price=bindparam("b_price")),
+            priced
+        )
+        await db.commit()
     
-    return HoldingResponse(
-        id=db_holding.id,
-        portfolio_id=db_holding.portfolio_id,
-        symbol=db_holding.symbol,
-        quantity=db_holding.quantity,
-        average_cost=db_holding.average_cost,
-        current_price=db_holding.current_price,
-        market_value=db_holding.quantity * (db_holding.current_price or db_holding.average_cost),
-        gain_loss=None,
-        gain_loss_percent=None,
-        created_at=db_holding.created_at
+    imported = []
+    if positions:
+        # populate_existing: merged holdings are already in the session with their pre-import values
+        result = await db.execute(
+            select(Holding).where(
+                Holding.portfolio_id == portfolio_id,
+                Holding.symbol.in_(list(positions))
+            ).order_by(Holding.symbol).execution_options(populate_existing=True)
+        )
+        imported = list(result.scalars().all())
+    prices = {symbol: status.get("price") for symbol, status in price_statuses.items()}
+    return HoldingsImportResult(
+        portfolio_id=portfolio_id,
+        rows_read=rows,
+        rows_rejected=len(errors),
+        holdings_created=len(new_rows),
+        holdings_updated=len(merged_rows),
+        errors=errors,
+        holdings=_holding_responses(imported, value_holdings(imported, prices), price_statuses)
     )
 
 
@@ -187,13 +404,13 @@ async def update_holding(
     portfolio_id: int,
     holding_id: int,
     holding_update: HoldingUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update a holding in a portfolio."""
-    holding = db.query(Holding).filter(
+    holding = (await db.execute(select(Holding).where(
         Holding.id == holding_id,
         Holding.portfolio_id == portfolio_id
-    ).first()
+    ))).scalar_one_or_none()
     if not holding:
         raise HTTPException(status_code=404, detail="Holding not found")
     
@@ -207,96 +424,246 @@ async def update_holding(
         # Fetch latest price if not provided
         holding.current_price = await get_stock_price(holding.symbol)
     
-    db.commit()
-    db.refresh(holding)
-    
-    market_value = holding.quantity * (holding.current_price or holding.average_cost)
-    cost_basis = holding.quantity * holding.average_cost
-    gain_loss = market_value - cost_basis
-    gain_loss_percent = (gain_loss / cost_basis * 100) if cost_basis > 0 else 0
+    await _bump_state_version(db, portfolio_id)
+    await db.commit()
+    response_cache.invalidate(portfolio_id)
+    await db.refresh(holding)
     
-    return HoldingResponse(
-        id=holding.id,
-        portfolio_id=holding.portfolio_id,
-        symbol=holding.symbol,
-        quantity=holding.quantity,
-        average_cost=holding.average_cost,
-        current_price=holding.current_price,
-        market_value=market_value,
-        gain_loss=gain_loss,
-        gain_loss_percent=gain_loss_percent,
-        created_at=holding.created_at
-    )
+    return _holding_responses([holding], value_holdings([holding]))[0]
 
 
 @router.delete("/{portfolio_id}/holdings/{holding_id}", status_code=204)
 async def delete_holding(
     portfolio_id: int,
     holding_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Delete a holding from a portfolio."""
-    holding = db.query(Holding).filter(
+    holding = (await db.execute(select(Holding).where(
         Holding.id == holding_id,
         Holding.portfolio_id == portfolio_id
-    ).first()
+    ))).scalar_one_or_none()
     if not holding:
         raise HTTPException(status_code=404, detail="Holding not found")
     
-    db.delete(holding)
-    db.commit()
+    await db.delete(holding)
+    await _bump_state_version(db, portfolio_id)
+    await db.commit()
+    response_cache.invalidate(portfolio_id)
     return None
 
 
-@router.get("/{portfolio_id}/performance", response_model=HistoricalPerformance)
+def _downsample(rows: List, times: List[datetime], values: List[float], max_points: int) -> List:
+    if len(rows) <= max_points:
+        return rows
+    x = np.fromiter((t.timestamp() for t in times), dtype=float, count=len(rows))
+    y = np.asarray(values, dtype=float)
+    return [rows[i] for i in lttb_indices(x, y, max_points)]
+
+
+async def _raw_points(db: AsyncSession, portfolio_id: int, since: datetime, max_points: int) -> List[PortfolioSnapshotResponse]:
+    """Raw snapshots since a moment (plain rows, no ORM objects), downsampled to max_points."""
+    snapshots = (await db.execute(
+        select(
+            PortfolioSnapshot.id,
+            PortfolioSnapshot.total_value,
+            PortfolioSnapshot.total_cost_basis,
+            PortfolioSnapshot.total_gain_loss,
+            PortfolioSnapshot.total_gain_loss_percent,
+            PortfolioSnapshot.snapshot_date
+        ).where(
+            PortfolioSnapshot.portfolio_id == portfolio_id,
+            PortfolioSnapshot.snapshot_date >= since
+        ).order_by(PortfolioSnapshot.snapshot_date.asc())
+    )).all()
+    snapshots = _downsample(snapshots, [s.snapshot_date for s in snapshots], [s.total_value for s in snapshots], max_points)
+    return [PortfolioSnapshotResponse(
+        id=s.id,
+        portfolio_id=portfolio_id,
+        total_value=s.total_value,
+        total_cost_basis=s.total_cost_basis,
+        total_gain_loss=s.total_gain_loss,
+        total_gain_loss_percent=s.total_gain_loss_percent,
+        snapshot_date=s.snapshot_date
+    ) for s in snapshots]
+
+
+async def _rollup_points(db: AsyncSession, portfolio_id: int, tier: str, since: datetime, max_points: int) -> List[PortfolioSnapshotResponse]:
+    """One OHLC point per rollup bucket since a moment, downsampled to max_points."""
+    rollups = await db.run_sync(load_rollups, portfolio_id, tier, since)
+    rollups = _downsample(rollups, [r.bucket_start for r in rollups], [r.close_value for r in rollups], max_points)
+    return [PortfolioSnapshotResponse(
+        portfolio_id=portfolio_id,
+        total_value=r.close_value,
+        total_cost_basis=r.close_cost_basis,
+        total_gain_loss=r.close_gain_loss,
+        total_gain_loss_percent=r.close_gain_loss_percent,
+        snapshot_date=r.bucket_start,
+        open_value=r.open_value,
+        high_value=r.high_value,
+        low_value=r.low_value
+    ) for r in rollups]
+
+
+@router.get("/{portfolio_id}/performance", response_model=HistoricalPerformance, dependencies=[query_budget(6)])
 async def get_historical_performance(
+    request: Request,
     portfolio_id: int,
     days: int = 30,
-    db: Session = Depends(get_db)
+    max_points: int = Query(
+        settings.PERFORMANCE_MAX_POINTS, ge=3, le=10000,
+        description="Upper bound on returned data points; longer series are downsampled (LTTB)"
+    ),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get historical performance data for a portfolio."""
-    portfolio = db.query(Portfolio).filter(
-        Portfolio.id == portfolio_id,
-        Portfolio.user_id == CURRENT_USER_ID
-    ).first()
+    portfolio = await _owned_portfolio(db, portfolio_id, with_holdings=False)
     if not portfolio:
         raise HTTPException(status_code=404, detail="Portfolio not found")
     
-    # Get snapshots from the last N days
+    # New snapshots only land on a flush, so the flush count versions the series
+    key = (portfolio_id, "performance", days, max_points)
+    version = (portfolio.state_version, snapshot_writer.flushes)
+    entry = response_cache.get(key, version)
+    if entry is not None:
+        return response_cache.respond(request, entry)
+    
     cutoff_date = datetime.utcnow() - timedelta(days=days)
-    snapshots = db.query(PortfolioSnapshot).filter(
-        PortfolioSnapshot.portfolio_id == portfolio_id,
-        PortfolioSnapshot.snapshot_date >= cutoff_date
-    ).order_by(PortfolioSnapshot.snapshot_date.asc()).all()
+    resolution = choose_tier(days, max_points)
+    if resolution == "raw":
+        data_points = await _raw_points(db, portfolio_id, cutoff_date, max_points)
+    else:
+        data_points = await _rollup_points(db, portfolio_id, resolution, cutoff_date, max_points)
     
     # Get current portfolio value
-    current_summary = await get_portfolio_summary(portfolio_id, db)
+    holdings = await _load_holdings(db, portfolio_id)
+    symbols = [h.symbol for h in holdings]
+    epoch = response_cache.price_epoch(symbols)
+    current_summary = await _summarize(portfolio, holdings)
     current_value = current_summary.total_market_value
     
     # Calculate total return if we have initial value
     initial_value = None
     total_return = None
     total_return_percent = None
-    if snapshots:
-        initial_value = snapshots[0].total_value
+    if data_points:
+        first = data_points[0]
+        initial_value = first.open_value if first.open_value is not None else first.total_value
         total_return = current_value - initial_value
         total_return_percent = (total_return / initial_value * 100) if initial_value > 0 else 0
     
-    return HistoricalPerformance(
-        portfolio_id=portfolio.id,
-        portfolio_name=portfolio.name,
-        data_points=[PortfolioSnapshotResponse(
-            id=s.id,
-            portfolio_id=s.portfolio_id,
-            total_value=s.total_value,
-            total_cost_basis=s.total_cost_basis,
-            total_gain_loss=s.total_gain_loss,
-            total_gain_loss_percent=s.total_gain_loss_percent,
-            snapshot_date=s.snapshot_date
-        ) for s in snapshots],
+    performance = HistoricalPerformance(
+        portfolio_id=portfolio_id,
+        portfolio_name=current_summary.portfolio_name,
+        resolution=resolution,
+        data_points=data_points,
         current_value=current_value,
         initial_value=initial_value,
         total_return=total_return,
         total_return_percent=total_return_percent
     )
+    entry = response_cache.put(key, version, performance, symbols, epoch)
+    return response_cache.respond(request, entry)
+
 
+@router.get("/{portfolio_id}/returns", response_model=PortfolioReturns, dependencies=[query_budget(2)])
+async def get_portfolio_returns(
+    portfolio_id: int,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    max_points: int = Query(settings.PERFORMANCE_MAX_POINTS, ge=3, le=10000),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Daily value with time- and money-weighted returns, rebuilt from the holdings
+    and stored daily closes rather than from snapshots. Each holding counts as
+    opened on the day it was added, at that day's close. Symbols without stored
+    bars are reported in missing_symbols and backfilled in the background.
+    """
+    portfolio = await _owned_portfolio(db, portfolio_id)
+    if not portfolio:
+        raise HTTPException(status_code=404, detail="Portfolio not found")
+    
+    events = events_from_holdings(portfolio.holdings)
+    schedule_backfill(e["symbol"] for e in events)
+    result = await asyncio.to_thread(compute_returns, events, None, start, end)
+    return PortfolioReturns(portfolio_id=portfolio_id, **summarize(result, max_points))
+
+
+@router.get("/{portfolio_id}/risk", response_model=PortfolioRisk, dependencies=[query_budget(2)])
+async def get_portfolio_risk(
+    request: Request,
+    portfolio_id: int,
+    days: int = Query(settings.RISK_LOOKBACK_DAYS, ge=30, le=3650),
+    benchmark: str = settings.RISK_BENCHMARK_SYMBOL,
+    confidence: float = Query(0.95, gt=0.5, lt=1.0),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Volatility, beta against a benchmark, historical and parametric VaR/CVaR and
+    the holdings' correlation matrix from stored daily closes. Positions are
+    weighted by their stored prices, and results are cached per portfolio state
+    and latest benchmark trading day. Symbols without stored bars are reported
+    in missing_symbols and backfilled in the background.
+    """
+    portfolio = await _owned_portfolio(db, portfolio_id, with_holdings=False)
+    if not portfolio:
+        raise HTTPException(status_code=404, detail="Portfolio not found")
+    
+    benchmark = benchmark.upper()
+    if not valid_symbol(benchmark):
+        raise HTTPException(status_code=400, detail=f"Invalid benchmark symbol: {benchmark}")
+    key = (portfolio_id, "risk", days, benchmark, confidence)
+    entry = response_cache.get(key, (portfolio.state_version, bar_store.last_date(benchmark), bar_store.rewrites))
+    if entry is not None:
+        return response_cache.respond(request, entry)
+    
+    exposure = value_exposure(await _load_holdings(db, portfolio_id))
+    symbols = [e["symbol"] for e in exposure]
+    missing = schedule_backfill(symbols + [benchmark])
+    result = await asyncio.to_thread(
+        compute_risk, symbols, [e["market_value"] for e in exposure], benchmark,
+        date.today() - timedelta(days=days), None, confidence
+    )
+    risk = PortfolioRisk(portfolio_id=portfolio_id, **result)
+    if missing:
+        # Still backfilling: the next request should see the new bars, not this
+        return risk
+    entry = response_cache.put(
+        key, (portfolio.state_version, bar_store.last_date(benchmark), bar_store.rewrites), risk,
+        ttl_seconds=settings.RISK_CACHE_TTL_SECONDS
+    )
+    return response_cache.respond(request, entry)
+
+
+@router.get("/{portfolio_id}/projection", response_model=PortfolioProjection, dependencies=[query_budget(4)])
+async def get_portfolio_projection(
+    portfolio_id: int,
+    years: int = Query(10, ge=1, le=50),
+    monthly_contribution: float = Query(0.0, ge=0),
+    paths: int = Query(10000, ge=100, le=settings.PROJECTION_MAX_PATHS),
+    method: Literal["bootstrap", "parametric"] = "bootstrap",
+    seed: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Monte Carlo projection of the portfolio's value: percentile bands of
+    simulated monthly paths, starting from its current value with returns
+    bootstrapped from (or fitted to) its history at current weights. Holdings
+    without stored bars are reported in missing_symbols and backfilled in the
+    background.
+    """
+    portfolio = await _owned_portfolio(db, portfolio_id)
+    if not portfolio:
+        raise HTTPException(status_code=404, detail="Portfolio not found")
+    
+    holdings = list(portfolio.holdings)
+    price_statuses = await get_price_statuses([h.symbol for h in holdings])
+    exposure = value_exposure(holdings, {s: status.get("price") for s, status in price_statuses.items()})
+    symbols = [e["symbol"] for e in exposure]
+    missing = schedule_backfill(symbols)
+    result = await project(
+        symbols, [e["market_value"] for e in exposure], years, monthly_contribution, paths, method,
+        date.today() - timedelta(days=settings.PROJECTION_LOOKBACK_DAYS), seed
+    )
+    return PortfolioProjection(portfolio_id=portfolio_id, missing_symbols=missing, **result)
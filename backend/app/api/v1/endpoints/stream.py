@@ -0,0 +1,125 @@
+import asyncio
+import json
+from typing import List, Optional, Set
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, status
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.portfolio import Portfolio, Holding
+from app.services.quote_stream import quote_hub
+
+router = APIRouter()
+
+
+# Temporary user ID for development (replace with auth later)
+CURRENT_USER_ID = 1
+
+
+def _portfolio_symbols(portfolio_id: int) -> Optional[List[str]]:
+    """Symbols held in one of the current user's portfolios, or None if it isn't theirs."""
+    db = SessionLocal()
+    try:
+        owned = db.query(Portfolio.id).filter(
+            Portfolio.id == portfolio_id,
+            Portfolio.user_id == CURRENT_USER_ID
+        ).first()
+        if not owned:
+            return None
+        rows = db.query(Holding.symbol).filter(Holding.portfolio_id == portfolio_id).distinct().all()
+        return [row[0] for row in rows]
+    finally:
+        db.close()
+
+
+class InvalidMessage(Exception):
+    """A client message the stream can't act on; the connection is closed with 1008."""
+
+
+def _parse_portfolio_id(value) -> int:
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.strip().isdigit():
+        return int(value)
+    raise InvalidMessage(f"Invalid portfolio_id: {value!r}")
+
+
+def _parse_symbols(value) -> List[str]:
+    """A list of symbols, or one string of them comma-separated like the ?symbols= query."""
+    if value is None:
+        return []
+    if isinstance(value, str):
+        value = value.split(",")
+    if not isinstance(value, list) or not all(isinstance(s, str) for s in value):
+        raise InvalidMessage(f"Invalid symbols: {value!r}")
+    return [s.strip() for s in value if s.strip()]
+
+
+async def _resolve_symbols(message: dict) -> List[str]:
+    symbols = _parse_symbols(message.get("symbols"))
+    portfolio_id = message.get("portfolio_id")
+    if portfolio_id is not None:
+        held = await asyncio.to_thread(_portfolio_symbols, _parse_portfolio_id(portfolio_id))
+        if held is None:
+            raise ValueError("Portfolio not found")
+        symbols.extend(held)
+    return [s.upper() for s in symbols]
+
+
+@router.websocket("/quotes")
+async def stream_quotes(websocket: WebSocket, symbols: Optional[str] = None, portfolio_id: Optional[int] = None):
+    """
+    Stream price changes over a WebSocket.
+    Subscribe at connect time with ?symbols=AAPL,MSFT and/or ?portfolio_id=1, or
+    by sending {"action": "subscribe" | "unsubscribe", "symbols": [...], "portfolio_id": 1}.
+    Each changed price arrives as {"type": "quote", "symbol", "price", "change", "change_percent", "as_of"}.
+    A malformed portfolio_id or symbols value closes the connection with code 1008.
+    """
+    await websocket.accept()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=settings.STREAM_QUEUE_SIZE)
+    subscribed: Set[str] = set()
+
+    async def handle(message: dict) -> None:
+        action = message.get("action", "subscribe")
+        try:
+            requested = await _resolve_symbols(message)
+        except ValueError as e:
+            await websocket.send_json({"type": "error", "detail": str(e)})
+            return
+        if action == "unsubscribe":
+            quote_hub.unsubscribe(queue, requested)
+            subscribed.difference_update(requested)
+        elif action == "subscribe":
+            room = settings.STREAM_MAX_SYMBOLS_PER_CONNECTION - len(subscribed)
+            new = [s for s in dict.fromkeys(requested) if s not in subscribed][:max(room, 0)]
+            subscribed.update(quote_hub.subscribe(queue, new))
+        else:
+            await websocket.send_json({"type": "error", "detail": f"Unknown action: {action}"})
+            return
+        await websocket.send_json({"type": "subscribed", "symbols": sorted(subscribed)})
+
+    async def writer() -> None:
+        while True:
+            await websocket.send_json(await queue.get())
+
+    writer_task = asyncio.create_task(writer())
+    try:
+        if symbols or portfolio_id is not None:
+            await handle({
+                "action": "subscribe",
+                "symbols": [s for s in (symbols or "").split(",") if s],
+                "portfolio_id": portfolio_id
+            })
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+            except ValueError:
+                await websocket.send_json({"type": "error", "detail": "Messages must be JSON objects"})
+                continue
+            if isinstance(message, dict):
+                await handle(message)
+    except WebSocketDisconnect:
+        pass
+    except InvalidMessage as e:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=str(e)[:120])
+    finally:
+        writer_task.cancel()
+        quote_hub.unsubscribe(queue)
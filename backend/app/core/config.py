@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import List, Optional
 
 
 class Settings(BaseSettings):
@@ -7,12 +7,117 @@ class Settings(BaseSettings):
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     DATABASE_URL: str
+    ASYNC_DATABASE_URL: Optional[str] = None  # defaults to DATABASE_URL on the asyncio driver (asyncpg)
     OPENAI_API_KEY: str
+    OPENAI_BASE_URL: Optional[str] = None  # override to point at a local stand-in
+    OPENAI_MODEL: str = "gpt-3.5-turbo"
+    
+    # Database connection pools (each of the sync and async engines gets its own)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT_SECONDS: float = 10.0  # wait for a free connection before failing
+    DB_POOL_RECYCLE_SECONDS: int = 1800  # replace connections older than this
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_TIMEOUT_MS: int = 30000  # PostgreSQL statement_timeout; 0 disables
     
     # Plaid Configuration
     PLAID_CLIENT_ID: str = ""
     PLAID_SECRET: str = ""
     PLAID_ENV: str = "sandbox"  # sandbox, development, or production
+    PLAID_BASE_URL: str = ""  # overrides the host derived from PLAID_ENV
+    
+    # Shared outbound HTTP client
+    HTTP_TIMEOUT_SECONDS: float = 10.0
+    HTTP_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+    HTTP_MAX_CONNECTIONS_PER_HOST: int = 20  # in-flight requests per upstream host
+    HTTP2_ENABLED: bool = True
+    
+    # Upstream protection (per host): rate limit, adaptive concurrency, circuit breaker
+    UPSTREAM_RATE_PER_SECOND: float = 10.0
+    UPSTREAM_BURST: int = 20
+    UPSTREAM_MAX_QUEUE_WAIT_SECONDS: float = 2.0  # fail fast instead of queueing longer
+    UPSTREAM_CONCURRENCY_INITIAL: int = 8
+    UPSTREAM_CONCURRENCY_MIN: int = 1
+    UPSTREAM_CONCURRENCY_MAX: int = 32
+    UPSTREAM_TARGET_LATENCY_SECONDS: float = 1.5
+    BREAKER_FAILURE_THRESHOLD: int = 5
+    BREAKER_RESET_SECONDS: float = 15.0
+    BREAKER_MAX_RESET_SECONDS: float = 300.0
+    
+    # LLM calls (shared OpenAI client)
+    LLM_MAX_CONCURRENCY: int = 8  # in-flight completions across the process
+    LLM_TIMEOUT_SECONDS: float = 20.0  # per-call deadline, covering queueing, retries and backoff
+    LLM_MAX_RETRIES: int = 3
+    LLM_RETRY_BASE_SECONDS: float = 0.5
+    LLM_RETRY_MAX_SECONDS: float = 8.0
+    
+    # Portfolio sentiments
+    SENTIMENT_CONCURRENCY: int = 8  # symbols computed at once per request
+    SENTIMENT_SYMBOL_TIMEOUT_SECONDS: float = 20.0  # slower symbols are left out of the response
+    
+    # Yahoo Finance endpoints (override to point at a local stub)
+    YAHOO_QUERY1_URL: str = "https://query1.finance.yahoo.com"
+    YAHOO_QUERY2_URL: str = "https://query2.finance.yahoo.com"
+    
+    # Quote fetching
+    QUOTE_BATCH_SIZE: int = 50  # symbols per multi-quote request
+    QUOTE_FETCH_CONCURRENCY: int = 8  # max in-flight per-symbol requests
+    YAHOO_MULTI_QUOTE_ENABLED: bool = True
+    QUOTE_CACHE_TTL_SECONDS: float = 15.0
+    QUOTE_CACHE_MAX_SIZE: int = 5000
+    PRICE_STALE_AFTER_SECONDS: float = 900.0  # stored prices older than this are flagged stale
+    
+    # Background price refresher
+    PRICE_REFRESHER_ENABLED: bool = True
+    PRICE_REFRESH_OPEN_INTERVAL_SECONDS: float = 15.0
+    PRICE_REFRESH_AFTER_HOURS_INTERVAL_SECONDS: float = 300.0
+    PRICE_REFRESH_BATCH_SIZE: int = 100
+    MARKET_TIMEZONE: str = "America/New_York"
+    
+    # Live quote streaming
+    STREAM_POLL_INTERVAL_SECONDS: float = 5.0  # per-symbol poll while the market is open
+    STREAM_IDLE_POLL_INTERVAL_SECONDS: float = 60.0
+    STREAM_QUEUE_SIZE: int = 100  # per connection; oldest ticks dropped when full
+    STREAM_MAX_SYMBOLS_PER_CONNECTION: int = 200
+    
+    # Historical daily bars
+    BAR_STORE_PATH: str = "data/bars"
+    BAR_STORE_HISTORY_YEARS: int = 5  # backfill depth for newly seen symbols
+    
+    # Portfolio value snapshots
+    SNAPSHOT_MIN_INTERVAL_SECONDS: float = 900.0  # at most one snapshot per portfolio per interval
+    SNAPSHOT_FLUSH_INTERVAL_SECONDS: float = 30.0
+    SNAPSHOT_FLUSH_BATCH_SIZE: int = 500  # flush early once this many are buffered
+    SNAPSHOT_MAX_PENDING: int = 20000  # buffer cap while the database is failing; oldest dropped past it
+    SNAPSHOT_RAW_RETENTION_DAYS: int = 14  # older raw snapshots survive only as rollups
+    SNAPSHOT_HOURLY_RETENTION_DAYS: int = 90  # daily and weekly rollups are kept indefinitely
+    SNAPSHOT_COMPACT_INTERVAL_SECONDS: float = 21600.0
+    SNAPSHOT_PARTITION_MONTHS_AHEAD: int = 3  # monthly partitions kept created ahead (PostgreSQL)
+    PERFORMANCE_MAX_POINTS: int = 500  # default cap on /performance data points (LTTB downsampled)
+    
+    # Response cache (summary, performance, portfolio sentiments)
+    RESPONSE_CACHE_TTL_SECONDS: float = 60.0  # also bounds drift in stale flags and moving windows
+    RESPONSE_CACHE_SENTIMENT_TTL_SECONDS: float = 900.0
+    RESPONSE_CACHE_MAX_SIZE: int = 2000
+    
+    # Risk analytics
+    RISK_BENCHMARK_SYMBOL: str = "SPY"
+    RISK_LOOKBACK_DAYS: int = 365
+    RISK_CACHE_TTL_SECONDS: float = 21600.0  # entries are also keyed on the latest benchmark bar
+    
+    # Monte Carlo projections
+    PROJECTION_WORKERS: Optional[int] = None  # worker processes; None = CPU count, 0 = simulate in a thread
+    PROJECTION_SHARD_PATHS: int = 10000  # paths per worker task
+    PROJECTION_MAX_PATHS: int = 100000
+    PROJECTION_MAX_POINTS: int = 121  # percentile checkpoints returned over the horizon
+    PROJECTION_LOOKBACK_DAYS: int = 1825  # history used to estimate returns
+    
+    # Bulk holdings import
+    IMPORT_MAX_BYTES: int = 5_000_000
+    IMPORT_MAX_ROWS: int = 10000
     
     # CORS
     BACKEND_CORS_ORIGINS: List[str] = [
@@ -0,0 +1,144 @@
+"""
+Database connection pool configuration and telemetry.
+Both engines (sync and async) get a queue pool sized from Settings, pre-ping and
+recycle to survive dropped connections, a checkout timeout so requests fail fast
+instead of queueing invisibly, and a server-side statement timeout on PostgreSQL.
+
+Checkouts are timed on the pool itself, so the wait a request spends queueing for
+a connection (plus pre-ping) is measured separately from the queries it runs.
+"""
+import threading
+import time
+from collections import deque
+from typing import Any, Dict
+from sqlalchemy import event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from app.core.config import settings
+
+
+class PoolStats:
+    """Checkout wait times, timeouts and overflow connections for one pool class."""
+
+    def __init__(self, window: int = 1000):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.overflow_connections = 0  # connections opened beyond pool_size
+        self.lock = threading.Lock()
+        self.connects = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.peak_in_use = 0
+        self._recent = deque(maxlen=window)
+
+    def record_checkout(self, wait: float, in_use: int) -> None:
+        self.checkouts += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+        self.peak_in_use = max(self.peak_in_use, in_use)
+        self._recent.append(wait)
+
+    def snapshot(self, pool: Any) -> Dict:
+        recent = sorted(self._recent)
+
+        def percentile(p: float) -> float:
+            return round(recent[min(len(recent) - 1, int(p * len(recent)))] * 1000, 2) if recent else 0.0
+
+        return {
+            "pool_size": pool.size(),
+            "in_use": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "overflow": max(0, pool.overflow()),
+            "peak_in_use": self.peak_in_use,
+            "checkouts": self.checkouts,
+            "checkout_timeouts": self.timeouts,
+            "overflow_connections": self.overflow_connections,
+            "connections_opened": self.connects,
+            "checkout_wait_avg_ms": round(self.wait_total / self.checkouts * 1000, 2) if self.checkouts else 0.0,
+            "checkout_wait_p95_ms": percentile(0.95),
+            "checkout_wait_max_ms": round(self.wait_max * 1000, 2),
+        }
+
+
+class _TimedCheckout:
+    """Pool mixin timing every checkout. Stats live on the class: dispose() recreates the pool."""
+
+    stats: PoolStats
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            self.stats.timeouts += 1
+            raise
+        self.stats.record_checkout(time.perf_counter() - start, self.checkedout())
+        return connection
+
+    def _inc_overflow(self):
+        # The pool's overflow counter goes above zero only for connections beyond pool_size
+        with self.stats.lock:
+            opened = super()._inc_overflow()
+            if opened and self._overflow > 0:
+                self.stats.overflow_connections += 1
+        return opened
+
+    def _dec_overflow(self):
+        with self.stats.lock:
+            return super()._dec_overflow()
+
+
+class InstrumentedQueuePool(_TimedCheckout, QueuePool):
+    stats = PoolStats()
+
+
+class InstrumentedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    stats = PoolStats()
+
+
+def _statement_timeout_args(url: str) -> Dict:
+    """Driver-specific connect_args setting PostgreSQL's statement_timeout (milliseconds)."""
+    parsed = make_url(url)
+    timeout = settings.DB_STATEMENT_TIMEOUT_MS
+    if not timeout or parsed.get_backend_name() != "postgresql":
+        return {}
+    if parsed.get_driver_name() == "asyncpg":
+        return {"server_settings": {"statement_timeout": str(timeout)}}
+    return {"options": f"-c statement_timeout={timeout}"}
+
+
+def engine_options(url: str, asynchronous: bool = False) -> Dict:
+    """Keyword arguments for create_engine / create_async_engine."""
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        return {}  # in-memory SQLite must keep its single shared connection
+    options = {
+        "poolclass": InstrumentedAsyncQueuePool if asynchronous else InstrumentedQueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+    connect_args = _statement_timeout_args(url)
+    if connect_args:
+        options["connect_args"] = connect_args
+    return options
+
+
+def instrument(engine) -> None:
+    """Count new DBAPI connections (including reconnects) on a sync engine or an async engine's sync_engine."""
+    pool_class = type(engine.pool)
+    if not issubclass(pool_class, _TimedCheckout):
+        return
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        pool_class.stats.connects += 1
+
+
+def pool_stats(engine) -> Dict:
+    pool = engine.pool
+    if isinstance(pool, _TimedCheckout):
+        return pool.stats.snapshot(pool)
+    return {"pool_class": type(pool).__name__}
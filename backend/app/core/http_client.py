@@ -0,0 +1,113 @@
+"""
+Shared outbound HTTP client.
+One pooled httpx.AsyncClient is opened in the app lifespan and reused by every
+upstream service, so quote and news lookups skip the TCP+TLS handshake.
+Requests pass through the per-host upstream guard (see upstream_guard.py).
+"""
+import asyncio
+from typing import Callable, Dict, Optional
+import httpx
+from app.core.config import settings
+from app.core.upstream_guard import GuardedTransport
+
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    """Response body wrapper that runs a callback once the body is closed."""
+
+    def __init__(self, stream: httpx.AsyncByteStream, release: Callable[[], None]):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            self._release()
+
+
+class _PerHostLimitTransport(httpx.AsyncBaseTransport):
+    """
+    Caps in-flight requests per upstream host.
+    httpx only limits the pool as a whole, so one slow host could otherwise
+    take every connection.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, max_per_host: int):
+        self._transport = transport
+        self._max_per_host = max(1, max_per_host)
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        semaphore = self._semaphores.setdefault(request.url.host, asyncio.Semaphore(self._max_per_host))
+        await semaphore.acquire()
+        released = False
+
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                semaphore.release()
+
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            release()
+            raise
+        if response.is_closed:
+            # The transport already buffered the body, so the slot is free now.
+            release()
+        else:
+            response.stream = _ReleasingStream(response.stream, release)
+        return response
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """Build a pooled client from the HTTP_* settings."""
+    limits = httpx.Limits(
+        max_connections=settings.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SECONDS,
+    )
+    timeout = httpx.Timeout(settings.HTTP_TIMEOUT_SECONDS, connect=settings.HTTP_CONNECT_TIMEOUT_SECONDS)
+    transport = httpx.AsyncHTTPTransport(http2=settings.HTTP2_ENABLED, limits=limits)
+    return httpx.AsyncClient(
+        transport=GuardedTransport(_PerHostLimitTransport(transport, settings.HTTP_MAX_CONNECTIONS_PER_HOST)),
+        timeout=timeout,
+    )
+
+
+async def init_http_client() -> httpx.AsyncClient:
+    """Open the shared client. Called from the app lifespan."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = create_http_client()
+    return _client
+
+
+async def close_http_client() -> None:
+    """Close the shared client and its pooled connections."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Return the shared client.
+    Outside the app (scripts, shells) it is created on first use.
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = create_http_client()
+    return _client
@@ -0,0 +1,173 @@
+"""
+Shared OpenAI client.
+One AsyncOpenAI client is reused by every LLM call, so completions never block
+the event loop and keep their pooled connections. Each call gets a deadline that
+covers queueing, retries and backoff; at most LLM_MAX_CONCURRENCY calls are in
+flight; rate limits, timeouts, connection errors and 5xx responses are retried
+with jittered exponential backoff (honouring Retry-After). Token usage is counted
+per purpose for /metrics.
+
+Point OPENAI_BASE_URL at a local stand-in (see benchmarks/stubs.py) to exercise
+it without the real API.
+"""
+import asyncio
+import random
+from typing import Dict, List, Optional
+import openai
+from openai import AsyncOpenAI
+from app.core.config import settings
+
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+
+class LLMUnavailable(Exception):
+    """Raised when a completion could not be obtained before its deadline."""
+
+
+_client: Optional[AsyncOpenAI] = None
+_semaphore: Optional[asyncio.Semaphore] = None
+_stats = {
+    "requests": 0,
+    "succeeded": 0,
+    "failed": 0,
+    "retries": 0,
+    "deadline_exceeded": 0,
+    "inflight": 0,
+    "prompt_tokens": 0,
+    "completion_tokens": 0,
+}
+_usage_by_purpose: Dict[str, Dict[str, int]] = {}
+
+
+def get_llm_client() -> AsyncOpenAI:
+    """Return the shared client, creating it on first use."""
+    global _client, _semaphore
+    if _client is None or _client.is_closed():
+        # Retries are ours: the SDK's own would not respect the call deadline
+        _client = AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            base_url=settings.OPENAI_BASE_URL,
+            max_retries=0,
+            timeout=settings.LLM_TIMEOUT_SECONDS,
+        )
+        _semaphore = asyncio.Semaphore(max(1, settings.LLM_MAX_CONCURRENCY))
+    return _client
+
+
+async def close_llm_client() -> None:
+    """Close the shared client. Called from the app lifespan."""
+    global _client, _semaphore
+    if _client is not None:
+        await _client.close()
+        _client = None
+        _semaphore = None
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _backoff(attempt: int, error: Exception) -> float:
+    """Full-jitter exponential backoff, but never sooner than the server's Retry-After."""
+    delay = random.uniform(0, min(settings.LLM_RETRY_MAX_SECONDS, settings.LLM_RETRY_BASE_SECONDS * 2 ** attempt))
+    return max(delay, _retry_after(error) or 0.0)
+
+
+def _record_usage(purpose: str, usage) -> None:
+    if usage is None:
+        return
+    totals = _usage_by_purpose.setdefault(purpose, {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0})
+    totals["calls"] += 1
+    totals["prompt_tokens"] += usage.prompt_tokens
+    totals["completion_tokens"] += usage.completion_tokens
+    _stats["prompt_tokens"] += usage.prompt_tokens
+    _stats["completion_tokens"] += usage.completion_tokens
+
+
+async def complete(
+    messages: List[Dict[str, str]],
+    purpose: str,
+    temperature: float = 0.7,
+    max_tokens: int = 200,
+    timeout: Optional[float] = None,
+    model: Optional[str] = None
+) -> str:
+    """
+    Chat completion text for `messages`, stripped.
+    `timeout` (default LLM_TIMEOUT_SECONDS) bounds the whole call; raises
+    LLMUnavailable when it runs out or a retryable error persists, and lets
+    other API errors (bad request, authentication) through.
+    """
+    client = get_llm_client()
+    semaphore = _semaphore
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + (timeout or settings.LLM_TIMEOUT_SECONDS)
+    _stats["requests"] += 1
+
+    def remaining() -> float:
+        return deadline - loop.time()
+
+    try:
+        await asyncio.wait_for(semaphore.acquire(), timeout=max(remaining(), 0))
+    except asyncio.TimeoutError:
+        _stats["deadline_exceeded"] += 1
+        _stats["failed"] += 1
+        raise LLMUnavailable(f"no LLM slot free before the deadline ({purpose})")
+
+    _stats["inflight"] += 1
+    try:
+        attempt = 0
+        while True:
+            try:
+                response = await asyncio.wait_for(
+                    client.chat.completions.create(
+                        model=model or settings.OPENAI_MODEL,
+                        messages=messages,
+                        temperature=temperature,
+                        max_tokens=max_tokens,
+                        timeout=max(remaining(), 0.001),
+                    ),
+                    timeout=max(remaining(), 0.001),
+                )
+            except (asyncio.TimeoutError, *RETRYABLE_ERRORS) as e:
+                delay = _backoff(attempt, e)
+                out_of_time = delay >= remaining()
+                if out_of_time or attempt >= settings.LLM_MAX_RETRIES:
+                    _stats["failed"] += 1
+                    if out_of_time:
+                        _stats["deadline_exceeded"] += 1
+                    raise LLMUnavailable(f"LLM call failed ({purpose}): {e!r}") from e
+                attempt += 1
+                _stats["retries"] += 1
+                await asyncio.sleep(delay)
+                continue
+            except Exception:
+                _stats["failed"] += 1
+                raise
+            _stats["succeeded"] += 1
+            _record_usage(purpose, response.usage)
+            return (response.choices[0].message.content or "").strip()
+    finally:
+        _stats["inflight"] -= 1
+        semaphore.release()
+
+
+def llm_stats() -> Dict:
+    return {
+        **_stats,
+        "total_tokens": _stats["prompt_tokens"] + _stats["completion_tokens"],
+        "max_concurrency": settings.LLM_MAX_CONCURRENCY,
+        "by_purpose": {k: dict(v) for k, v in _usage_by_purpose.items()},
+    }
@@ -0,0 +1,66 @@
+"""
+Per-request SQL query counting.
+Every statement executed on any engine is counted against the current request.
+Routes declare how many queries they may issue with query_budget(n); the
+middleware reports the count and budget in X-Query-Count / X-Query-Budget
+response headers and logs requests that go over (the benchmark suite fails on them).
+"""
+from contextvars import ContextVar
+from typing import Dict, Optional
+from fastapi import Depends
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+_current: ContextVar[Optional[Dict]] = ContextVar("query_counter", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    counter = _current.get()
+    if counter is not None:
+        counter["queries"] += 1
+
+
+def query_budget(limit: int):
+    """Route dependency declaring the most queries one request to the route may issue."""
+    def declare():
+        counter = _current.get()
+        if counter is not None:
+            counter["budget"] = limit
+    return Depends(declare)
+
+
+class QueryCountMiddleware:
+    """ASGI middleware that scopes a query counter to each HTTP request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # A mutable holder, so counts made in threadpool copies of the context land here too.
+        counter = {"queries": 0, "budget": None}
+        token = _current.set(counter)
+
+        async def send_with_count(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-query-count", str(counter["queries"]).encode()))
+                if counter["budget"] is not None:
+                    headers.append((b"x-query-budget", str(counter["budget"]).encode()))
+                    if counter["queries"] > counter["budget"]:
+                        print(
+                            f"Query budget exceeded: {scope['method']} {scope['path']} "
+                            f"ran {counter['queries']} queries (budget {counter['budget']})"
+                        )
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_count)
+        finally:
+            _current.reset(token)
@@ -0,0 +1,131 @@
+"""
+In-process cache of rendered JSON responses for portfolio read endpoints.
+An entry is valid while the portfolio's state_version (bumped by every holding
+mutation) and any caller-supplied version match, the price epoch of the symbols it
+was computed from has not moved, and its TTL has not run out. The price epoch is
+process-local: a per-symbol counter that moves whenever a stored quote changes price.
+
+Every cached response carries a strong ETag (hash of the body), so clients that
+send If-None-Match get a 304 without the body being rebuilt or resent.
+"""
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from app.core.config import settings
+
+
+class ResponseCache:
+    def __init__(self, ttl_seconds: float, max_size: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max(1, max_size)
+        self._entries: "OrderedDict[Tuple, Dict]" = OrderedDict()
+        self._prices: Dict[str, float] = {}
+        self._symbol_epochs: Dict[str, int] = {}
+        self._epoch = 0
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.invalidations = 0
+
+    def note_prices(self, quotes: Dict[str, Dict]) -> None:
+        """Advance the price epoch of every symbol whose price changed."""
+        for symbol, quote in quotes.items():
+            key = symbol.upper()
+            price = quote.get("price")
+            if price is not None and self._prices.get(key) != price:
+                self._prices[key] = price
+                self._epoch += 1
+                self._symbol_epochs[key] = self._epoch
+
+    def price_epoch(self, symbols: Iterable[str]) -> int:
+        return max((self._symbol_epochs.get(s.upper(), 0) for s in symbols), default=0)
+
+    def get(self, key: Tuple, version: Hashable) -> Optional[Dict]:
+        """The entry for `key` if it is still valid for `version`, else None."""
+        entry = self._entries.get(key)
+        if entry is not None and (
+            entry["version"] != version
+            or entry["expires_at"] <= time.monotonic()
+            or self.price_epoch(entry["symbols"]) != entry["price_epoch"]
+        ):
+            del self._entries[key]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(
+        self,
+        key: Tuple,
+        version: Hashable,
+        content: Any,
+        symbols: Iterable[str] = (),
+        price_epoch: int = 0,
+        ttl_seconds: Optional[float] = None,
+        extra: Any = None
+    ) -> Dict:
+        """
+        Render `content` and cache it. `price_epoch` must be taken before the
+        prices were read, so a change that lands mid-computation expires the entry.
+        `extra` is kept alongside for the caller (e.g. totals to replay on a hit).
+        """
+        body = json.dumps(
+            jsonable_encoder(content), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+        ).encode("utf-8")
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        entry = {
+            "version": version,
+            "symbols": tuple(s.upper() for s in symbols),
+            "price_epoch": price_epoch,
+            "expires_at": time.monotonic() + ttl,
+            "body": body,
+            "etag": '"%s"' % hashlib.sha1(body).hexdigest(),
+            "extra": extra,
+        }
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, portfolio_id: int) -> None:
+        """Drop every entry for a portfolio. Keys start with the portfolio id."""
+        for key in [k for k in self._entries if k[0] == portfolio_id]:
+            del self._entries[key]
+        self.invalidations += 1
+
+    def respond(self, request: Request, entry: Dict) -> Response:
+        """200 with the cached body, or 304 when the client already has it."""
+        headers = {"ETag": entry["etag"], "Cache-Control": "private, no-cache"}
+        candidates = [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]
+        if entry["etag"] in candidates or f"W/{entry['etag']}" in candidates or "*" in candidates:
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=entry["body"], media_type="application/json", headers=headers)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "invalidations": self.invalidations,
+            "price_epoch": self._epoch,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+response_cache = ResponseCache(
+    ttl_seconds=settings.RESPONSE_CACHE_TTL_SECONDS,
+    max_size=settings.RESPONSE_CACHE_MAX_SIZE
+)
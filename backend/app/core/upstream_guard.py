@@ -0,0 +1,332 @@
+"""
+Per-host protection for outbound calls.
+Every upstream host gets a HostGuard combining a token-bucket rate limiter, an
+AIMD concurrency limit and a circuit breaker. GuardedTransport applies it to
+every request sent through the shared HTTP client. When a host is throttling us
+or down, calls fail fast with UpstreamUnavailable instead of each waiting out
+a full timeout.
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Dict, Optional
+import httpx
+from app.core.config import settings
+
+
+THROTTLE_STATUSES = {429, 503}
+
+
+class UpstreamUnavailable(httpx.TransportError):
+    """Raised without contacting the host when its guard refuses the request."""
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = max(rate, 1e-6)
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def pause(self, seconds: float) -> None:
+        """Stop handing out tokens for a while, e.g. to honour Retry-After."""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    async def acquire(self, max_wait: float) -> bool:
+        """Take a token, waiting up to max_wait seconds. False if it would take longer."""
+        now = time.monotonic()
+        self._refill(now)
+        wait = max(self.paused_until - now, (1 - self.tokens) / self.rate if self.tokens < 1 else 0.0)
+        if wait > max_wait:
+            return False
+        # Reserve the token now so concurrent callers queue behind us.
+        self.tokens -= 1
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return True
+
+
+class AdaptiveConcurrencyLimit:
+    """
+    AIMD limit on in-flight requests: grows by 1/limit per healthy response,
+    shrinks by half on throttling, errors or timeouts and by 10% when responses
+    are slower than the target latency.
+    """
+
+    def __init__(self, initial: int, minimum: int, maximum: int, target_latency: float):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.target_latency = target_latency
+        self.inflight = 0
+        self._waiters: "deque[asyncio.Future]" = deque()
+
+    async def acquire(self, max_wait: float) -> bool:
+        """Take a slot, waiting up to max_wait seconds. False if none freed up in time."""
+        if self.inflight < int(self.limit) and not self._waiters:
+            self.inflight += 1
+            return True
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=max_wait)
+            return True
+        except asyncio.TimeoutError:
+            # The slot may have been handed over right as the timeout fired.
+            return waiter.done() and not waiter.cancelled()
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # A slot was handed to us just as we were cancelled; pass it on.
+                self.release(overloaded=False, latency=0.0)
+            raise
+        finally:
+            if not waiter.done():
+                waiter.cancel()
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def release(self, overloaded: bool, latency: float) -> None:
+        self.inflight -= 1
+        if overloaded:
+            self.limit = max(self.minimum, self.limit * 0.5)
+        elif latency > self.target_latency:
+            self.limit = max(self.minimum, self.limit * 0.9)
+        else:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+        while self._waiters and self.inflight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.inflight += 1
+                waiter.set_result(None)
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects calls until
+    the reset timeout passes. Then one probe is let through: success closes the
+    breaker, failure re-opens it with the timeout doubled (up to max_reset_seconds).
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float, max_reset_seconds: float):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self.max_reset_seconds = max(reset_seconds, max_reset_seconds)
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.open_for = reset_seconds
+        self.opened_at = 0.0
+        self.opens = 0
+        self._probe_inflight = False
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.open_for:
+            self.state = "half_open"
+        if self.state == "half_open" and not self._probe_inflight:
+            self._probe_inflight = True
+            return True
+        return False
+
+    def release_probe(self) -> None:
+        """Give back a probe slot that was granted but never used."""
+        self._probe_inflight = False
+
+    def record_success(self) -> None:
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.open_for = self.reset_seconds
+        self._probe_inflight = False
+
+    def record_failure(self, open_for: Optional[float] = None) -> None:
+        self.consecutive_failures += 1
+        if self.state == "half_open":
+            self._trip(max(open_for or 0, min(self.open_for * 2, self.max_reset_seconds)))
+        elif self.state == "closed" and self.consecutive_failures >= self.failure_threshold:
+            self._trip(max(open_for or 0, self.reset_seconds))
+        self._probe_inflight = False
+
+    def _trip(self, open_for: float) -> None:
+        self.state = "open"
+        self.open_for = open_for
+        self.opened_at = time.monotonic()
+        self.opens += 1
+
+    def retry_in(self) -> float:
+        if self.state != "open":
+            return 0.0
+        return max(0.0, self.opened_at + self.open_for - time.monotonic())
+
+
+class HostGuard:
+    def __init__(self, host: str):
+        self.host = host
+        self.bucket = TokenBucket(settings.UPSTREAM_RATE_PER_SECOND, settings.UPSTREAM_BURST)
+        self.limiter = AdaptiveConcurrencyLimit(
+            settings.UPSTREAM_CONCURRENCY_INITIAL,
+            settings.UPSTREAM_CONCURRENCY_MIN,
+            settings.UPSTREAM_CONCURRENCY_MAX,
+            settings.UPSTREAM_TARGET_LATENCY_SECONDS
+        )
+        self.breaker = CircuitBreaker(
+            settings.BREAKER_FAILURE_THRESHOLD,
+            settings.BREAKER_RESET_SECONDS,
+            settings.BREAKER_MAX_RESET_SECONDS
+        )
+        self.successes = 0
+        self.failures = 0
+        self.throttled = 0
+        self.rejected = 0
+
+    def stats(self) -> Dict:
+        return {
+            "breaker_state": self.breaker.state,
+            "breaker_opens": self.breaker.opens,
+            "breaker_retry_in_seconds": round(self.breaker.retry_in(), 2),
+            "consecutive_failures": self.breaker.consecutive_failures,
+            "concurrency_limit": round(self.limiter.limit, 2),
+            "inflight": self.limiter.inflight,
+            "tokens": round(self.bucket.tokens, 2),
+            "successes": self.successes,
+            "failures": self.failures,
+            "throttled": self.throttled,
+            "rejected": self.rejected,
+        }
+
+
+_guards: Dict[str, HostGuard] = {}
+
+
+def get_guard(host: str) -> HostGuard:
+    guard = _guards.get(host)
+    if guard is None:
+        guard = _guards[host] = HostGuard(host)
+    return guard
+
+
+def guard_stats() -> Dict[str, Dict]:
+    return {host: guard.stats() for host, guard in _guards.items()}
+
+
+def reset_guards() -> None:
+    """Forget all per-host state (used when pointing the app at a different upstream)."""
+    _guards.clear()
+
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    value = response.headers.get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    """Response body that gives the concurrency slot back once it is closed."""
+
+    def __init__(self, stream: httpx.AsyncByteStream, release):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            release, self._release = self._release, None
+            if release is not None:
+                release()
+
+
+class GuardedTransport(httpx.AsyncBaseTransport):
+    """Runs every request through the HostGuard of its target host."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        guard = get_guard(request.url.host)
+        breaker = guard.breaker
+        max_wait = settings.UPSTREAM_MAX_QUEUE_WAIT_SECONDS
+
+        if not breaker.allow():
+            guard.rejected += 1
+            raise UpstreamUnavailable(
+                f"{guard.host} circuit open, retry in {breaker.retry_in():.1f}s", request=request
+            )
+        # allow() only lets a request through a breaker that isn't closed by handing it the probe
+        probe = breaker.state != "closed"
+
+        def record(ok: bool, open_for: Optional[float] = None) -> None:
+            # Only the probe, or any request while the breaker is closed, may move the breaker;
+            # a stale answer from before it opened must not close it or clear another probe
+            if not probe and breaker.state != "closed":
+                return
+            if ok:
+                breaker.record_success()
+            else:
+                breaker.record_failure(open_for=open_for)
+
+        # The half-open probe slot must be handed back if we never get to send it,
+        # including when the caller is cancelled while queueing (e.g. a wait_for timeout)
+        try:
+            if not await guard.bucket.acquire(max_wait):
+                guard.rejected += 1
+                raise UpstreamUnavailable(f"{guard.host} rate limit exceeded", request=request)
+            if not await guard.limiter.acquire(max_wait):
+                guard.rejected += 1
+                raise UpstreamUnavailable(f"{guard.host} concurrency limit exceeded", request=request)
+        except BaseException:
+            if probe:
+                breaker.release_probe()
+            raise
+
+        started = time.monotonic()
+        try:
+            response = await self._transport.handle_async_request(request)
+        except asyncio.CancelledError:
+            if probe:
+                breaker.release_probe()
+            guard.limiter.release(overloaded=False, latency=0.0)
+            raise
+        except Exception:
+            guard.failures += 1
+            record(ok=False)
+            guard.limiter.release(overloaded=True, latency=time.monotonic() - started)
+            raise
+
+        latency = time.monotonic() - started
+        overloaded = True
+        if response.status_code in THROTTLE_STATUSES:
+            guard.throttled += 1
+            retry_after = _retry_after(response)
+            if retry_after:
+                guard.bucket.pause(retry_after)
+            record(ok=False, open_for=retry_after)
+        elif response.status_code >= 500:
+            guard.failures += 1
+            record(ok=False)
+        else:
+            guard.successes += 1
+            record(ok=True)
+            overloaded = False
+        def release() -> None:
+            guard.limiter.release(overloaded=overloaded, latency=latency)
+
+        # The slot stays taken until the body has been read and the response closed
+        if response.is_closed:
+            release()
+        else:
+            response.stream = _ReleasingStream(response.stream, release)
+        return response
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
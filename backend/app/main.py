@@ -1,12 +1,43 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.v1.api import api_router
 from app.core.config import settings
+from app.core.database import async_engine
+from app.core.http_client import init_http_client, close_http_client
+from app.core.llm_client import close_llm_client
+from app.core.query_counter import QueryCountMiddleware
+from app.services.bar_store import cancel_backfills
+from app.services.price_refresher import start_price_refresher, stop_price_refresher
+from app.services.projection import start_projection_pool, stop_projection_pool
+from app.services.quote_stream import quote_hub
+from app.services.snapshot_writer import snapshot_writer
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await init_http_client()
+    start_price_refresher()
+    snapshot_writer.start()
+    start_projection_pool()
+    try:
+        yield
+    finally:
+        await quote_hub.close()
+        await stop_price_refresher()
+        await cancel_backfills()
+        await snapshot_writer.close()
+        stop_projection_pool()
+        await close_http_client()
+        await close_llm_client()
+        await async_engine.dispose()
+
 
 app = FastAPI(
     title="One View API",
     description="Personal finance application API for unified portfolio management",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -16,7 +47,9 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Query-Count", "X-Query-Budget", "X-Missing-Symbols"],
 )
+app.add_middleware(QueryCountMiddleware)
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
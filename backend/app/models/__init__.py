@@ -1,7 +1,8 @@
 from app.models.user import User
 from app.models.portfolio import Portfolio, Holding
 from app.models.news import NewsArticle, StockSentiment
-from app.models.portfolio_snapshot import PortfolioSnapshot
+from app.models.portfolio_snapshot import PortfolioSnapshot, PortfolioSnapshotRollup
+from app.models.symbol_price import SymbolPrice
 
-__all__ = ["User", "Portfolio", "Holding", "NewsArticle", "StockSentiment", "PortfolioSnapshot"]
+__all__ = ["User", "Portfolio", "Holding", "NewsArticle", "StockSentiment", "PortfolioSnapshot", "PortfolioSnapshotRollup", "SymbolPrice"]
 
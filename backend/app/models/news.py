@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text, JSON
+from sqlalchemy import Column, Integer, String, Float, DateTime, Text, JSON, Index
 from sqlalchemy.sql import func
 from app.core.database import Base
 
@@ -7,7 +7,7 @@ class NewsArticle(Base):
     __tablename__ = "news_articles"
 
     id = Column(Integer, primary_key=True, index=True)
-    symbol = Column(String, nullable=False, index=True)
+    symbol = Column(String, nullable=False)
     title = Column(String, nullable=False)
     source = Column(String, nullable=True)
     url = Column(String, nullable=True)
@@ -18,6 +18,10 @@ class NewsArticle(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 
+# Serves "latest articles for a symbol": equality on symbol, newest first
+Index("ix_news_articles_symbol_published_at", NewsArticle.symbol, NewsArticle.published_at.desc())
+
+
 class StockSentiment(Base):
     __tablename__ = "stock_sentiments"
 
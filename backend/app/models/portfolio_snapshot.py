@@ -1,20 +1,68 @@
-from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey, Index, PrimaryKeyConstraint, Sequence, String
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.schema import CreateColumn
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 
 
 class PortfolioSnapshot(Base):
+    """
+    Point-in-time portfolio totals, keyed by (id, snapshot_date). On PostgreSQL
+    the table is range-partitioned by month on snapshot_date; the migration owns
+    the partitioning and the snapshot writer keeps future months created.
+    """
     __tablename__ = "portfolio_snapshots"
+    __table_args__ = (
+        Index("ix_portfolio_snapshots_portfolio_id_snapshot_date", "portfolio_id", "snapshot_date"),
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
-    portfolio_id = Column(Integer, ForeignKey("portfolios.id"), nullable=False, index=True)
+    id = Column(Integer, Sequence("portfolio_snapshots_id_seq"), primary_key=True, autoincrement=True)
+    portfolio_id = Column(Integer, ForeignKey("portfolios.id"), nullable=False)
     total_value = Column(Float, nullable=False)
     total_cost_basis = Column(Float, nullable=False)
     total_gain_loss = Column(Float, nullable=False)
     total_gain_loss_percent = Column(Float, nullable=False)
-    snapshot_date = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
+    snapshot_date = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True, primary_key=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     portfolio = relationship("Portfolio", backref="snapshots")
 
+
+# SQLite (development, tests) can't autoincrement a composite primary key: there
+# id is declared the rowid alias and (id, snapshot_date) becomes a unique constraint.
+@compiles(CreateColumn, "sqlite")
+def _sqlite_snapshot_id(element, compiler, **kw):
+    column = element.element
+    if column.table is PortfolioSnapshot.__table__ and column.name == "id":
+        return "id INTEGER NOT NULL PRIMARY KEY"
+    return compiler.visit_create_column(element, **kw)
+
+
+@compiles(PrimaryKeyConstraint, "sqlite")
+def _sqlite_snapshot_key(constraint, compiler, **kw):
+    if constraint.table is PortfolioSnapshot.__table__:
+        return "UNIQUE (id, snapshot_date)"
+    return compiler.visit_primary_key_constraint(constraint, **kw)
+
+
+
+class PortfolioSnapshotRollup(Base):
+    """OHLC-style aggregate of a portfolio's snapshots over one hour, day or week (UTC buckets)."""
+    __tablename__ = "portfolio_snapshot_rollups"
+
+    portfolio_id = Column(Integer, ForeignKey("portfolios.id", ondelete="CASCADE"), primary_key=True)
+    tier = Column(String(8), primary_key=True)  # hour, day or week
+    bucket_start = Column(DateTime(timezone=True), primary_key=True)
+    first_at = Column(DateTime(timezone=True), nullable=False)
+    last_at = Column(DateTime(timezone=True), nullable=False)
+    open_value = Column(Float, nullable=False)
+    high_value = Column(Float, nullable=False)
+    low_value = Column(Float, nullable=False)
+    close_value = Column(Float, nullable=False)
+    close_cost_basis = Column(Float, nullable=False)
+    close_gain_loss = Column(Float, nullable=False)
+    close_gain_loss_percent = Column(Float, nullable=False)
+    high_gain_loss = Column(Float, nullable=False)
+    low_gain_loss = Column(Float, nullable=False)
+    sample_count = Column(Integer, nullable=False)
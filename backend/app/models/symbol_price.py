@@ -0,0 +1,15 @@
+from sqlalchemy import Column, String, Float, DateTime
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class SymbolPrice(Base):
+    """Last known good price per symbol, used when the upstream quote source fails."""
+    __tablename__ = "symbol_prices"
+
+    symbol = Column(String, primary_key=True)
+    price = Column(Float, nullable=False)
+    previous_close = Column(Float, nullable=True)
+    currency = Column(String, nullable=True)
+    fetched_at = Column(DateTime(timezone=True), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -1,12 +1,12 @@
 from pydantic import BaseModel, Field
 from typing import List, Optional
-from datetime import datetime
+from datetime import date, datetime
 
 
 class HoldingBase(BaseModel):
     symbol: str = Field(..., description="Stock symbol (e.g., AAPL)")
-    quantity: float = Field(..., gt=0, description="Number of shares")
-    average_cost: float = Field(..., gt=0, description="Average purchase price per share")
+    quantity: float = Field(..., gt=0, allow_inf_nan=False, description="Number of shares")
+    average_cost: float = Field(..., gt=0, allow_inf_nan=False, description="Average purchase price per share")
 
 
 class HoldingCreate(HoldingBase):
@@ -14,8 +14,8 @@ class HoldingCreate(HoldingBase):
 
 
 class HoldingUpdate(BaseModel):
-    quantity: Optional[float] = Field(None, gt=0)
-    average_cost: Optional[float] = Field(None, gt=0)
+    quantity: Optional[float] = Field(None, gt=0, allow_inf_nan=False)
+    average_cost: Optional[float] = Field(None, gt=0, allow_inf_nan=False)
     current_price: Optional[float] = None
 
 
@@ -26,6 +26,8 @@ class HoldingResponse(HoldingBase):
     market_value: Optional[float] = None
     gain_loss: Optional[float] = None
     gain_loss_percent: Optional[float] = None
+    price_stale: Optional[bool] = None  # True when current_price is an old last-known-good value
+    price_as_of: Optional[datetime] = None
     created_at: datetime
     
     class Config:
@@ -61,13 +63,16 @@ class PortfolioSummary(BaseModel):
 
 
 class PortfolioSnapshotResponse(BaseModel):
-    id: int
+    id: Optional[int] = None  # None for points read from rollups
     portfolio_id: int
-    total_value: float
+    total_value: float  # closing value when the point is a rollup bucket
     total_cost_basis: float
     total_gain_loss: float
     total_gain_loss_percent: float
-    snapshot_date: datetime
+    snapshot_date: datetime  # bucket start for rollup points
+    open_value: Optional[float] = None
+    high_value: Optional[float] = None
+    low_value: Optional[float] = None
     
     class Config:
         from_attributes = True
@@ -76,9 +81,147 @@ class PortfolioSnapshotResponse(BaseModel):
 class HistoricalPerformance(BaseModel):
     portfolio_id: int
     portfolio_name: str
+    resolution: str = "raw"  # raw, hour, day or week
     data_points: List[PortfolioSnapshotResponse]
     current_value: float
     initial_value: Optional[float] = None
     total_return: Optional[float] = None
     total_return_percent: Optional[float] = None
 
+
+
+class ReturnsDataPoint(BaseModel):
+    date: date
+    value: float
+    net_flow: float
+    cumulative_twr: float
+
+
+class PortfolioReturns(BaseModel):
+    portfolio_id: Optional[int] = None
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    start_value: float
+    end_value: float
+    net_contributions: float
+    income: float
+    twr: float  # time-weighted return over the whole window
+    twr_annualized: Optional[float] = None  # only for windows of a year or more
+    mwr_annualized: Optional[float] = None  # money-weighted (IRR)
+    missing_symbols: List[str] = []  # no stored prices; valued at zero
+    data_points: List[ReturnsDataPoint]
+
+
+class PortfolioValue(BaseModel):
+    portfolio_id: int
+    portfolio_name: str
+    total_holdings: int
+    total_cost_basis: float
+    total_market_value: float
+    total_gain_loss: float
+    total_gain_loss_percent: float
+    allocation: float  # share of net worth, in percent
+
+
+class SymbolExposure(BaseModel):
+    symbol: str
+    quantity: float
+    cost_basis: float
+    market_value: float
+    allocation: float  # share of net worth, in percent
+    portfolios: int  # number of portfolios holding the symbol
+    current_price: Optional[float] = None
+    price_stale: Optional[bool] = None
+
+
+class NetWorth(BaseModel):
+    total_portfolios: int
+    total_holdings: int
+    total_cost_basis: float
+    total_market_value: float
+    total_gain_loss: float
+    total_gain_loss_percent: float
+    portfolios: List[PortfolioValue]
+    exposure: List[SymbolExposure]
+
+
+class ImportRowError(BaseModel):
+    row: int  # 1-based data row (header excluded)
+    error: str
+
+
+class HoldingsImportResult(BaseModel):
+    portfolio_id: int
+    rows_read: int
+    rows_rejected: int
+    holdings_created: int
+    holdings_updated: int
+    errors: List[ImportRowError]
+    holdings: List[HoldingResponse]  # the imported positions after merging, priced
+
+
+class ValueAtRisk(BaseModel):
+    var: float  # one-day loss as a fraction of portfolio value
+    cvar: float  # expected loss beyond the VaR
+    var_amount: float
+    cvar_amount: float
+
+
+class ValueAtRiskMethods(BaseModel):
+    historical: ValueAtRisk
+    parametric: ValueAtRisk  # normal distribution fitted to the daily returns
+
+
+class HoldingRisk(BaseModel):
+    symbol: str
+    weight: float
+    volatility_annualized: Optional[float] = None
+    beta: Optional[float] = None
+
+
+class CorrelationMatrix(BaseModel):
+    symbols: List[str]
+    matrix: List[List[Optional[float]]]  # rows and columns follow symbols
+
+
+class PortfolioRisk(BaseModel):
+    portfolio_id: int
+    benchmark: str
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    observations: int  # daily returns used
+    confidence: float
+    total_value: float
+    volatility_annualized: Optional[float] = None
+    beta: Optional[float] = None
+    value_at_risk: Optional[ValueAtRiskMethods] = None
+    holdings: List[HoldingRisk]
+    correlation: CorrelationMatrix
+    missing_symbols: List[str]  # holdings with no stored daily bars
+
+
+class ProjectionPoint(BaseModel):
+    month: int
+    date: date
+    invested: float  # starting value plus contributions so far
+    p5: float
+    p25: float
+    p50: float
+    p75: float
+    p95: float
+
+
+class PortfolioProjection(BaseModel):
+    portfolio_id: int
+    method: str  # "bootstrap" or "parametric"
+    years: int
+    paths: int
+    monthly_contribution: float
+    start_value: float
+    total_contributions: float
+    observations: int  # daily returns the estimate is based on
+    monthly_mean: Optional[float] = None  # log return
+    monthly_volatility: Optional[float] = None
+    probability_of_loss: Optional[float] = None  # ending below starting value plus contributions
+    points: List[ProjectionPoint]
+    missing_symbols: List[str] = []  # holdings with no stored daily bars (being backfilled)
@@ -0,0 +1,312 @@
+"""
+Columnar daily OHLCV bar store.
+Each symbol is a directory of flat binary files, one per column, read back through
+np.memmap so range reads are array slices with no per-row Python objects.
+New bars are appended. The date column is written last, so its length is the
+committed row count; anything past it in the other columns is a torn write and is
+trimmed before the next append.
+
+Yahoo re-adjusts past closes after a split or dividend, so appending after one
+would mix adjustment bases. Ingest therefore re-fetches the last stored bar: when
+a split or dividend falls after it, or the bar no longer matches what is stored,
+the symbol's whole history is fetched again and swapped in (replace()).
+
+Request handlers never ingest inline: they serve what is stored and hand symbols
+with no or stale bars to schedule_backfill(), which ingests them in a background
+task. The price refresher keeps held symbols current after each close.
+
+Symbols become directory names, so only ones matching SYMBOL_PATTERN are ever
+turned into paths; anything else reads as having no bars and can't be written.
+"""
+import asyncio
+import os
+import re
+import shutil
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
+from app.core.config import settings
+from app.services.yahoo_finance_service import get_daily_bars
+
+
+BAR_COLUMNS: Dict[str, np.dtype] = {
+    "open": np.dtype("<f8"),
+    "high": np.dtype("<f8"),
+    "low": np.dtype("<f8"),
+    "close": np.dtype("<f8"),
+    "adj_close": np.dtype("<f8"),
+    "volume": np.dtype("<i8"),
+}
+DATE_DTYPE = np.dtype("<M8[D]")
+
+# Tickers such as AAPL, BRK.B, BF-B, ^GSPC, EURUSD=X. Must not start with "." or "-",
+# so "." / ".." and option-like names can't be used as a path.
+SYMBOL_PATTERN = re.compile(r"^[A-Z0-9^][A-Z0-9.\-^=]{0,14}$")
+# Suffixes of replace()'s side directories; never symbols, as those are upper case.
+STAGING_SUFFIXES = (".rewrite", ".retired")
+
+
+def valid_symbol(symbol: str) -> bool:
+    return isinstance(symbol, str) and SYMBOL_PATTERN.match(symbol.upper()) is not None
+
+
+def _to_day(value) -> np.datetime64:
+    return np.datetime64(value, "D")
+
+
+class BarStore:
+    def __init__(self, root: str):
+        self.root = root
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self.rewrites = 0  # histories replaced after a re-adjustment; part of cache keys over stored bars
+
+    def _dir(self, symbol: str) -> str:
+        if not valid_symbol(symbol):
+            raise ValueError(f"Invalid symbol: {symbol!r}")
+        return os.path.join(self.root, symbol.upper())
+
+    def _path(self, symbol: str, column: str) -> str:
+        return os.path.join(self._dir(symbol), f"{column}.bin")
+
+    def lock(self, symbol: str) -> asyncio.Lock:
+        """Per-symbol lock so concurrent ingests don't interleave appends."""
+        return self._locks.setdefault(symbol.upper(), asyncio.Lock())
+
+    def symbols(self) -> List[str]:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            name for name in os.listdir(self.root)
+            if not name.endswith(STAGING_SUFFIXES) and valid_symbol(name) and os.path.isfile(self._path(name, "date"))
+        )
+
+    def _map(self, symbol: str, column: str, dtype: np.dtype, length: int) -> np.ndarray:
+        if length == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(self._path(symbol, column), dtype=dtype, mode="r", shape=(length,))
+
+    def length(self, symbol: str) -> int:
+        """Committed number of bars for a symbol (0 for an invalid one)."""
+        if not valid_symbol(symbol):
+            return 0
+        path = self._path(symbol, "date")
+        if not os.path.exists(path):
+            return 0
+        return os.path.getsize(path) // DATE_DTYPE.itemsize
+
+    def last_date(self, symbol: str) -> Optional[date]:
+        n = self.length(symbol)
+        if n == 0:
+            return None
+        return self._map(symbol, "date", DATE_DTYPE, n)[-1].astype(date)
+
+    def _trim_torn_write(self, symbol: str, n: int) -> None:
+        for column, dtype in BAR_COLUMNS.items():
+            path = self._path(symbol, column)
+            if os.path.exists(path) and os.path.getsize(path) > n * dtype.itemsize:
+                with open(path, "r+b") as f:
+                    f.truncate(n * dtype.itemsize)
+
+    def first_date(self, symbol: str) -> Optional[date]:
+        if self.length(symbol) == 0:
+            return None
+        return self._map(symbol, "date", DATE_DTYPE, 1)[0].astype(date)
+
+    @staticmethod
+    def _write(directory: str, bars: Dict[str, np.ndarray], keep: np.ndarray, mode: str) -> None:
+        for column, dtype in BAR_COLUMNS.items():
+            values = np.asarray(bars[column])[keep]
+            if dtype.kind == "i":
+                values = np.nan_to_num(values.astype("f8"), nan=0.0)
+            with open(os.path.join(directory, f"{column}.bin"), mode) as f:
+                f.write(values.astype(dtype).tobytes())
+        with open(os.path.join(directory, "date.bin"), mode) as f:
+            f.write(np.asarray(bars["date"], dtype=DATE_DTYPE)[keep].tobytes())
+
+    def append(self, symbol: str, bars: Dict[str, np.ndarray]) -> int:
+        """
+        Append bars dated after the last stored bar. `bars` maps "date" and every
+        BAR_COLUMNS name to equal-length arrays sorted by date.
+        Returns the number of rows written.
+        """
+        dates = np.asarray(bars["date"], dtype=DATE_DTYPE)
+        last = self.last_date(symbol)
+        keep = dates > _to_day(last) if last is not None else np.ones(len(dates), dtype=bool)
+        if not keep.any():
+            return 0
+
+        os.makedirs(self._dir(symbol), exist_ok=True)
+        self._trim_torn_write(symbol, self.length(symbol))
+        self._write(self._dir(symbol), bars, keep, "ab")
+        return int(keep.sum())
+
+    def replace(self, symbol: str, bars: Dict[str, np.ndarray]) -> int:
+        """
+        Replace a symbol's whole history with `bars` (same layout as append).
+        The new files are written to a side directory and swapped in by rename,
+        so readers see either the old history or the new one.
+        """
+        directory = self._dir(symbol)
+        staging, retired = directory + ".rewrite", directory + ".retired"
+        for path in (staging, retired):
+            shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(staging)
+        self._write(staging, bars, np.ones(len(bars["date"]), dtype=bool), "wb")
+        if os.path.isdir(directory):
+            os.replace(directory, retired)
+        os.replace(staging, directory)
+        shutil.rmtree(retired, ignore_errors=True)
+        self.rewrites += 1
+        return len(bars["date"])
+
+    def matches(self, symbol: str, bars: Dict[str, np.ndarray]) -> bool:
+        """Whether the fetched bars agree with the stored ones on the dates both have."""
+        stored = self.read(symbol, start=np.asarray(bars["date"])[0].astype(date) if len(bars["date"]) else None)
+        common, stored_idx, fetched_idx = np.intersect1d(stored["date"], bars["date"], return_indices=True)
+        if not len(common):
+            return True
+        return all(
+            np.allclose(stored[column][stored_idx], np.asarray(bars[column])[fetched_idx], rtol=1e-6, equal_nan=True)
+            for column in ("close", "adj_close")
+        )
+
+    def read(self, symbol: str, start: Optional[date] = None, end: Optional[date] = None) -> Dict[str, np.ndarray]:
+        """
+        Bars with start <= date <= end as a dict of column arrays (read-only views
+        over the memory-mapped files). Unknown symbols give empty arrays.
+        """
+        n = self.length(symbol)
+        dates = self._map(symbol, "date", DATE_DTYPE, n)
+        lo = int(np.searchsorted(dates, _to_day(start), side="left")) if start is not None else 0
+        hi = int(np.searchsorted(dates, _to_day(end), side="right")) if end is not None else n
+        result = {"date": dates[lo:hi]}
+        for column, dtype in BAR_COLUMNS.items():
+            result[column] = self._map(symbol, column, dtype, n)[lo:hi]
+        return result
+
+    def read_matrix(
+        self,
+        symbols: Iterable[str],
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        column: str = "adj_close"
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Align one column across symbols on the union of their dates.
+        Returns (dates, matrix) with matrix shaped (len(dates), len(symbols)) and
+        NaN where a symbol has no bar for a date.
+        """
+        symbols = list(symbols)
+        series = [self._read_column(s, column, start, end) for s in symbols]
+        if not any(len(d) for d, _ in series):
+            return np.empty(0, dtype=DATE_DTYPE), np.empty((0, len(symbols)))
+        dates = np.unique(np.concatenate([d for d, _ in series]))
+        matrix = np.full((len(dates), len(symbols)), np.nan)
+        for j, (d, values) in enumerate(series):
+            if len(d):
+                matrix[np.searchsorted(dates, d), j] = values
+        return dates, matrix
+
+    def _read_column(
+        self, symbol: str, column: str, start: Optional[date], end: Optional[date]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """(dates, values) of one column in range; maps only the two files needed."""
+        n = self.length(symbol)
+        if n == 0:
+            return np.empty(0, dtype=DATE_DTYPE), np.empty(0)
+        dates = self._map(symbol, "date", DATE_DTYPE, n)
+        lo = int(np.searchsorted(dates, _to_day(start), side="left")) if start is not None else 0
+        hi = int(np.searchsorted(dates, _to_day(end), side="right")) if end is not None else n
+        return dates[lo:hi], self._map(symbol, column, BAR_COLUMNS[column], n)[lo:hi]
+
+
+bar_store = BarStore(settings.BAR_STORE_PATH)
+
+
+async def ingest_symbol(symbol: str, store: BarStore = bar_store) -> int:
+    """
+    Fetch and append the bars for a symbol since its last stored bar
+    (or BAR_STORE_HISTORY_YEARS of history for a new symbol). The last stored
+    bar is fetched again as a check; if a split or dividend came after it or it
+    no longer matches, the history is re-fetched and replaced.
+    Returns the number of bars written.
+    """
+    if not valid_symbol(symbol):
+        raise ValueError(f"Invalid symbol: {symbol!r}")
+    symbol = symbol.upper()
+    async with store.lock(symbol):
+        last = store.last_date(symbol)
+        if last is None:
+            bars = await get_daily_bars(symbol, date.today() - timedelta(days=365 * settings.BAR_STORE_HISTORY_YEARS))
+            if not bars or not len(bars["date"]):
+                return 0
+            return await asyncio.to_thread(store.append, symbol, bars)
+
+        if last + timedelta(days=1) >= date.today():
+            return 0
+        bars = await get_daily_bars(symbol, last)
+        if not bars or not len(bars["date"]):
+            return 0
+        readjusted = bool(np.any(bars["action_dates"] > _to_day(last))) or not store.matches(symbol, bars)
+        if not readjusted:
+            return await asyncio.to_thread(store.append, symbol, bars)
+
+        history = await get_daily_bars(symbol, store.first_date(symbol))
+        if not history or not len(history["date"]):
+            return 0
+        return await asyncio.to_thread(store.replace, symbol, history)
+
+
+async def ingest_symbols(symbols: Iterable[str], store: BarStore = bar_store) -> Dict[str, int]:
+    """Incrementally ingest several symbols, at most QUOTE_FETCH_CONCURRENCY at a time."""
+    semaphore = asyncio.Semaphore(max(1, settings.QUOTE_FETCH_CONCURRENCY))
+    unique_symbols = list(dict.fromkeys(s.upper() for s in symbols if s))
+
+    async def ingest_one(symbol: str) -> int:
+        async with semaphore:
+            return await ingest_symbol(symbol, store)
+
+    results = await asyncio.gather(*(ingest_one(s) for s in unique_symbols), return_exceptions=True)
+    appended = {}
+    for symbol, result in zip(unique_symbols, results):
+        if isinstance(result, Exception):
+            print(f"Error ingesting daily bars for {symbol}: {result}")
+        else:
+            appended[symbol] = result
+    return appended
+
+
+_backfill_tasks: Set[asyncio.Task] = set()
+_backfill_attempted: Dict[str, date] = {}
+
+
+def schedule_backfill(symbols: Iterable[str], store: BarStore = bar_store) -> List[str]:
+    """
+    Start a background ingest of the symbols whose bars are missing or end before
+    yesterday, at most once per symbol a day. Returns the symbols that have no
+    stored bars at all, for the caller to report as missing.
+    """
+    today = date.today()
+    missing, stale = [], []
+    for symbol in dict.fromkeys(s.upper() for s in symbols if s):
+        last = store.last_date(symbol)
+        if last is None:
+            missing.append(symbol)
+        if not valid_symbol(symbol):
+            continue
+        if (last is None or last < today - timedelta(days=1)) and _backfill_attempted.get(symbol) != today:
+            _backfill_attempted[symbol] = today
+            stale.append(symbol)
+    if stale:
+        task = asyncio.create_task(ingest_symbols(stale, store))
+        _backfill_tasks.add(task)
+        task.add_done_callback(_backfill_tasks.discard)
+    return missing
+
+
+async def cancel_backfills() -> None:
+    """Cancel background ingests still running. Called from the app lifespan."""
+    tasks = list(_backfill_tasks)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
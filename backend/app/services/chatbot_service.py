@@ -1,6 +1,5 @@
-from openai import OpenAI
 from typing import List, Dict
-from app.core.config import settings
+from app.core.llm_client import complete
 from app.services.yahoo_finance_service import get_multiple_stock_quotes
 
 
@@ -50,18 +49,15 @@ Keep the response concise, friendly, and actionable (2-3 paragraphs max).
 Provide your analysis:"""
 
     try:
-        client = OpenAI(api_key=settings.OPENAI_API_KEY)
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
+        return await complete(
+            [
                 {"role": "system", "content": "You are a helpful financial advisor AI. Provide clear, concise, and actionable portfolio analysis."},
                 {"role": "user", "content": prompt}
             ],
+            purpose="insights",
             temperature=0.7,
             max_tokens=300
         )
-        
-        return response.choices[0].message.content.strip()
     except Exception as e:
         print(f"Error generating insights: {e}")
         return "I'm having trouble analyzing your portfolio right now. Please try again later."
@@ -99,18 +95,15 @@ User Question: {user_message}
 Provide a helpful, concise answer (2-3 sentences max). If they ask about specific stocks, use the data above."""
 
     try:
-        client = OpenAI(api_key=settings.OPENAI_API_KEY)
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
+        return await complete(
+            [
                 {"role": "system", "content": "You are a helpful financial advisor AI. Answer questions about the user's portfolio clearly and concisely."},
                 {"role": "user", "content": prompt}
             ],
+            purpose="chat",
             temperature=0.7,
             max_tokens=200
         )
-        
-        return response.choices[0].message.content.strip()
     except Exception as e:
         print(f"Error in chatbot: {e}")
         return "I'm having trouble processing your question right now. Please try again later."
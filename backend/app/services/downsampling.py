@@ -0,0 +1,43 @@
+"""
+Time-series downsampling for charts.
+Largest-Triangle-Three-Buckets (LTTB) picks a subset of real points that keeps
+the visual shape of a series (peaks, troughs, first and last point), so long
+windows can be served with a bounded number of points.
+"""
+import numpy as np
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, max_points: int) -> np.ndarray:
+    """
+    Indices of the points to keep, in ascending order.
+    `x` must be sorted ascending. Series with at most `max_points` points (or a
+    `max_points` below 3) are returned whole.
+    """
+    n = len(x)
+    if max_points >= n or max_points < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    buckets = max_points - 2
+    # Bucket b covers [bounds[b], bounds[b + 1]); the first and last points are kept as-is.
+    bounds = (np.arange(buckets + 1) * (n - 2) / buckets).astype(np.intp) + 1
+    bounds[-1] = n - 1
+    sizes = np.diff(bounds)
+    mean_x = np.add.reduceat(x[:-1], bounds[:-1]) / sizes
+    mean_y = np.add.reduceat(y[:-1], bounds[:-1]) / sizes
+
+    selected = np.empty(max_points, dtype=np.intp)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for b in range(buckets):
+        start, end = bounds[b], bounds[b + 1]
+        if b + 1 < buckets:
+            next_x, next_y = mean_x[b + 1], mean_y[b + 1]
+        else:
+            next_x, next_y = x[-1], y[-1]
+        # Twice the triangle area between the last kept point, each candidate and the next bucket's mean.
+        area = np.abs((x[a] - next_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (next_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[b + 1] = a
+    return selected
@@ -0,0 +1,190 @@
+"""
+Bulk holdings import.
+Uploads are parsed as they stream in: CSV and NDJSON line by line, so a large
+brokerage export is never held in memory as a whole. A JSON array has no line
+structure and is parsed in one go (bounded by IMPORT_MAX_BYTES). Rows are
+validated like a single POST /holdings body, and rows for the same symbol are
+merged into one position at the quantity-weighted average cost.
+"""
+import codecs
+import csv
+import json
+import math
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from pydantic import ValidationError
+from app.core.config import settings
+from app.schemas.portfolio import HoldingCreate
+from app.services.bar_store import valid_symbol
+
+
+# Column names accepted for each field (compared lower-cased, spaces as underscores).
+COLUMN_ALIASES = {
+    "symbol": ("symbol", "ticker", "ticker_symbol", "security"),
+    "quantity": ("quantity", "shares", "qty", "units"),
+    "average_cost": ("average_cost", "avg_cost", "average_price", "cost_per_share", "price_paid", "cost_basis_per_share"),
+    "cost_basis": ("cost_basis", "total_cost", "book_value"),
+}
+
+# Room for part headers and boundaries on top of IMPORT_MAX_BYTES in a multipart body.
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+class HoldingsImportError(ValueError):
+    """The upload as a whole cannot be read (unknown format, missing columns, too large)."""
+
+
+class UploadTooLarge(HoldingsImportError):
+    """The upload is over IMPORT_MAX_BYTES."""
+
+
+async def limit_bytes(chunks: AsyncIterator[bytes], limit: int) -> AsyncIterator[bytes]:
+    """Pass chunks through, raising UploadTooLarge as soon as more than `limit` bytes have arrived."""
+    received = 0
+    async for chunk in chunks:
+        received += len(chunk)
+        if received > limit:
+            raise UploadTooLarge(f"Upload exceeds {settings.IMPORT_MAX_BYTES} bytes")
+        yield chunk
+
+
+def detect_format(content_type: Optional[str], filename: Optional[str] = None) -> str:
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    name = (filename or "").lower()
+    if content_type in ("text/csv", "application/csv") or name.endswith(".csv"):
+        return "csv"
+    if content_type in ("application/x-ndjson", "application/jsonl", "application/ndjson") or name.endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    if content_type == "application/json" or name.endswith(".json"):
+        return "json"
+    raise HoldingsImportError("Unsupported upload type; send CSV, NDJSON or a JSON array")
+
+
+async def _lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Decoded lines from a byte stream, enforcing IMPORT_MAX_BYTES."""
+    buffer = ""
+    decoder = None
+    async for chunk in limit_bytes(chunks, settings.IMPORT_MAX_BYTES):
+        if decoder is None:
+            # Brokerage exports often carry a UTF-8 BOM.
+            decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+        buffer += decoder.decode(chunk)
+        *complete, buffer = buffer.split("\n")
+        for line in complete:
+            yield line.rstrip("\r")
+    if decoder is not None:
+        buffer += decoder.decode(b"", final=True)
+    if buffer.strip():
+        yield buffer.rstrip("\r")
+
+
+def _normalize_keys(record: Dict) -> Dict:
+    """Map a raw record's keys onto symbol / quantity / average_cost / cost_basis."""
+    lowered = {str(k).strip().lower().replace(" ", "_"): v for k, v in record.items()}
+    return {
+        field: next((lowered[a] for a in aliases if lowered.get(a) not in (None, "")), None)
+        for field, aliases in COLUMN_ALIASES.items()
+    }
+
+
+async def iter_records(chunks: AsyncIterator[bytes], fmt: str) -> AsyncIterator[Tuple[int, Optional[Dict]]]:
+    """(row number, normalized record) for every data row; the record is None when a JSON row is not an object."""
+    if fmt == "json":
+        data = b""
+        async for chunk in limit_bytes(chunks, settings.IMPORT_MAX_BYTES):
+            data += chunk
+        try:
+            records = json.loads(data.decode("utf-8-sig"))
+        except ValueError as e:
+            raise HoldingsImportError(f"Invalid JSON: {e}")
+        if not isinstance(records, list):
+            raise HoldingsImportError("Expected a JSON array of holdings")
+        for number, record in enumerate(records, start=1):
+            yield number, _normalize_keys(record) if isinstance(record, dict) else None
+        return
+
+    header: Optional[List[str]] = None
+    number = 0
+    async for line in _lines(chunks):
+        if not line.strip():
+            continue
+        if fmt == "ndjson":
+            number += 1
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            yield number, _normalize_keys(record) if isinstance(record, dict) else None
+            continue
+        # Quoted fields spanning several lines are not supported.
+        values = next(csv.reader([line]))
+        if header is None:
+            header = values
+            if not any(_normalize_keys({h: "x" for h in header}).get(f) for f in ("symbol", "quantity")):
+                raise HoldingsImportError("CSV header must name symbol and quantity columns")
+            continue
+        number += 1
+        yield number, _normalize_keys(dict(zip(header, values)))
+
+
+def _to_float(value) -> Optional[float]:
+    if value is None or isinstance(value, (int, float)):
+        return value
+    text = str(value).strip().replace(",", "").replace("$", "")
+    return float(text) if text else None
+
+
+def validate_record(record: Dict) -> HoldingCreate:
+    """A HoldingCreate for one normalized record; average cost may come from a total cost basis."""
+    try:
+        quantity = _to_float(record.get("quantity"))
+        average_cost = _to_float(record.get("average_cost"))
+        cost_basis = _to_float(record.get("cost_basis"))
+    except ValueError:
+        raise ValueError("quantity and cost must be numbers")
+    if any(v is not None and not math.isfinite(v) for v in (quantity, average_cost, cost_basis)):
+        raise ValueError("quantity and cost must be finite numbers")
+    if average_cost is None and cost_basis is not None and quantity:
+        average_cost = cost_basis / quantity
+    symbol = str(record.get("symbol") or "").strip().upper()
+    if not symbol:
+        raise ValueError("missing symbol")
+    if not valid_symbol(symbol):
+        raise ValueError(f"invalid symbol: {symbol[:20]}")
+    try:
+        return HoldingCreate(symbol=symbol, quantity=quantity, average_cost=average_cost)
+    except ValidationError as e:
+        raise ValueError("; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()))
+
+
+def merge_position(quantity: float, average_cost: float, add_quantity: float, add_cost: float) -> Tuple[float, float]:
+    """Combine two lots into one position at the quantity-weighted average cost."""
+    total = quantity + add_quantity
+    return total, (quantity * average_cost + add_quantity * add_cost) / total
+
+
+async def read_positions(chunks: AsyncIterator[bytes], fmt: str) -> Tuple[Dict[str, Tuple[float, float]], List[Dict], int]:
+    """
+    Parse and validate an upload.
+    Returns ({symbol: (quantity, average_cost)} with duplicates merged,
+    [{"row", "error"}] for rejected rows, number of data rows read).
+    """
+    positions: Dict[str, Tuple[float, float]] = {}
+    errors: List[Dict] = []
+    rows = 0
+    async for number, record in iter_records(chunks, fmt):
+        rows += 1
+        if rows > settings.IMPORT_MAX_ROWS:
+            raise HoldingsImportError(f"Upload has more than {settings.IMPORT_MAX_ROWS} rows")
+        if record is None:
+            errors.append({"row": number, "error": "row is not a JSON object"})
+            continue
+        try:
+            holding = validate_record(record)
+        except ValueError as e:
+            errors.append({"row": number, "error": str(e)})
+            continue
+        if holding.symbol in positions:
+            positions[holding.symbol] = merge_position(*positions[holding.symbol], holding.quantity, holding.average_cost)
+        else:
+            positions[holding.symbol] = (holding.quantity, holding.average_cost)
+    return positions, errors, rows
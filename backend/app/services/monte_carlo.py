@@ -0,0 +1,50 @@
+"""
+Monte Carlo simulation kernel for portfolio projections.
+Runs in process-pool workers, so it imports nothing but NumPy and every argument
+and result is a plain picklable value.
+
+Paths move in monthly steps: value = value * exp(r) + contribution, where r is a
+monthly log return either drawn from historical monthly returns (bootstrap) or
+from a normal distribution (parametric). All paths of a shard advance together.
+"""
+from typing import Optional, Sequence
+import numpy as np
+
+
+def simulate_shard(
+    seed: int,
+    paths: int,
+    months: int,
+    start_value: float,
+    monthly_contribution: float,
+    checkpoints: Sequence[int],
+    sample: Optional[np.ndarray] = None,
+    mean: float = 0.0,
+    volatility: float = 0.0
+) -> np.ndarray:
+    """
+    Simulate `paths` value paths and return their values at the given month
+    checkpoints as a float32 array shaped (paths, len(checkpoints)).
+    With `sample` (monthly log returns) returns are bootstrapped from it;
+    otherwise they are normal with the given monthly mean and volatility.
+    """
+    rng = np.random.default_rng(seed)
+    checkpoints = np.asarray(checkpoints, dtype=np.intp)
+    out = np.empty((paths, len(checkpoints)), dtype=np.float32)
+    value = np.full(paths, float(start_value))
+    column = 0
+    if len(checkpoints) and checkpoints[0] == 0:
+        out[:, 0] = value
+        column = 1
+    for month in range(1, months + 1):
+        if sample is not None:
+            r = sample[rng.integers(0, len(sample), size=paths)]
+        else:
+            r = rng.normal(mean, volatility, size=paths)
+        value *= np.exp(r)
+        value += monthly_contribution
+        np.maximum(value, 0.0, out=value)
+        if column < len(checkpoints) and checkpoints[column] == month:
+            out[:, column] = value
+            column += 1
+    return out
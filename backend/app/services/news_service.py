@@ -1,17 +1,20 @@
-from typing import List, Dict
+from typing import List, Dict, Optional
 from datetime import datetime, timedelta
 import httpx
 import json
+from app.core.config import settings
+from app.core.http_client import get_http_client
 
 
-async def fetch_financial_news(symbol: str, limit: int = 10) -> List[Dict]:
+async def fetch_financial_news(symbol: str, limit: int = 10, client: Optional[httpx.AsyncClient] = None) -> List[Dict]:
     """
     Fetch financial news for a given stock symbol from Yahoo Finance.
-    Uses Yahoo Finance's RSS/news API.
+    Uses Yahoo Finance's RSS/news API through the shared pooled client unless one is passed in.
     """
+    client = client or get_http_client()
     try:
         # Yahoo Finance news endpoint
-        url = f"https://query2.finance.yahoo.com/v1/finance/search"
+        url = f"{settings.YAHOO_QUERY2_URL}/v1/finance/search"
         params = {
             "q": symbol.upper(),
             "quotes_count": 1,
@@ -23,39 +26,38 @@ async def fetch_financial_news(symbol: str, limit: int = 10) -> List[Dict]:
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
         }
         
-        async with httpx.AsyncClient(timeout=10.0, headers=headers) as client:
-            response = await client.get(url, params=params)
+        response = await client.get(url, params=params, headers=headers)
+        
+        if response.status_code == 200:
+            data = response.json()
+            news_items = data.get("news", [])
             
-            if response.status_code == 200:
-                data = response.json()
-                news_items = data.get("news", [])
+            articles = []
+            for item in news_items[:limit]:
+                # Extract news data
+                title = item.get("title", "")
+                publisher = item.get("publisher", "Unknown")
+                link = item.get("link", "")
+                pub_date = item.get("providerPublishTime")
                 
-                articles = []
-                for item in news_items[:limit]:
-                    # Extract news data
-                    title = item.get("title", "")
-                    publisher = item.get("publisher", "Unknown")
-                    link = item.get("link", "")
-                    pub_date = item.get("providerPublishTime")
-                    
-                    # Convert timestamp to datetime
-                    published_at = datetime.utcnow() - timedelta(hours=1)  # Default fallback
-                    if pub_date:
-                        try:
-                            published_at = datetime.fromtimestamp(pub_date)
-                        except:
-                            pass
-                    
-                    articles.append({
-                        "title": title,
-                        "source": publisher,
-                        "url": link,
-                        "published_at": published_at,
-                        "content": item.get("summary", "")
-                    })
+                # Convert timestamp to datetime
+                published_at = datetime.utcnow() - timedelta(hours=1)  # Default fallback
+                if pub_date:
+                    try:
+                        published_at = datetime.fromtimestamp(pub_date)
+                    except:
+                        pass
                 
-                if articles:
-                    return articles
+                articles.append({
+                    "title": title,
+                    "source": publisher,
+                    "url": link,
+                    "published_at": published_at,
+                    "content": item.get("summary", "")
+                })
+            
+            if articles:
+                return articles
     except Exception as e:
         print(f"Error fetching Yahoo Finance news for {symbol}: {e}")
     
@@ -1,6 +1,5 @@
-from openai import OpenAI
 from typing import List, Dict
-from app.core.config import settings
+from app.core.llm_client import complete
 
 
 async def analyze_sentiment(headlines: List[str]) -> float:
@@ -22,19 +21,17 @@ async def analyze_sentiment(headlines: List[str]) -> float:
     Respond with only a decimal number between -1.0 and 1.0:"""
     
     try:
-        client = OpenAI(api_key=settings.OPENAI_API_KEY)
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
+        content = await complete(
+            [
                 {"role": "system", "content": "You are a financial sentiment analysis expert. Return only a number."},
                 {"role": "user", "content": prompt}
             ],
+            purpose="sentiment",
             temperature=0.3,
             max_tokens=10
         )
         
-        score_str = response.choices[0].message.content.strip()
-        score = float(score_str)
+        score = float(content)
         return max(-1.0, min(1.0, score))  # Clamp between -1 and 1
     except Exception as e:
         print(f"Error in sentiment analysis: {e}")
@@ -62,18 +59,15 @@ async def summarize_news(symbol: str, headlines: List[str], articles: List[Dict]
     Provide a clear, investor-focused summary:"""
     
     try:
-        client = OpenAI(api_key=settings.OPENAI_API_KEY)
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
+        return await complete(
+            [
                 {"role": "system", "content": "You are a financial news summarizer. Provide concise, investor-focused summaries."},
                 {"role": "user", "content": prompt}
             ],
+            purpose="news_summary",
             temperature=0.5,
             max_tokens=150
         )
-        
-        return response.choices[0].message.content.strip()
     except Exception as e:
         print(f"Error in news summarization: {e}")
         return f"Unable to generate summary for {symbol} due to an error."
@@ -33,7 +33,7 @@ def get_plaid_client():
     
     # Create configuration
     configuration = Configuration(
-        host=settings.PLAID_ENV,  # 'sandbox', 'development', or 'production'
+        host=settings.PLAID_BASE_URL or settings.PLAID_ENV,  # 'sandbox', 'development', or 'production'
     )
     configuration.api_key['clientId'] = settings.PLAID_CLIENT_ID
     configuration.api_key['secret'] = settings.PLAID_SECRET
@@ -239,11 +239,14 @@ async def get_investment_transactions(access_token: str, start_date: Optional[da
         response = client.investments_transactions_get(request)
         
         transactions = []
+        securities_map = {s['security_id']: s for s in response.get('securities', [])}
         for transaction in response.get('investment_transactions', []):
+            security = securities_map.get(transaction.get('security_id'), {})
             transactions.append({
                 'investment_transaction_id': transaction['investment_transaction_id'],
                 'account_id': transaction['account_id'],
                 'security_id': transaction.get('security_id'),
+                'ticker_symbol': security.get('ticker_symbol'),
                 'amount': transaction.get('amount'),
                 'date': transaction['date'].isoformat() if hasattr(transaction['date'], 'isoformat') else str(transaction['date']),
                 'name': transaction['name'],
@@ -0,0 +1,192 @@
+"""
+Background price refresher.
+Periodically re-prices every symbol held in any portfolio and writes the quotes
+into the shared quote cache, the symbol_prices table and the holdings' stored
+current_price, so request handlers read prices instead of fetching or writing
+them. The cadence follows the US equity session: fast while the market is open,
+slow in the extended/overnight hours and paused over the weekend. Once a day
+after the close it also appends the finished session's daily bars to the bar store.
+Exchange holidays are treated as regular trading days.
+"""
+import asyncio
+from datetime import datetime, time as dtime, timedelta
+from typing import Dict, List, Optional
+from zoneinfo import ZoneInfo
+from app.core.config import settings
+from sqlalchemy import bindparam, update
+from app.core.database import SessionLocal
+from app.models.portfolio import Holding
+from app.services.bar_store import ingest_symbols
+from app.services.price_service import store_quotes
+from app.services.yahoo_finance_service import get_multiple_stock_quotes
+
+
+MARKET_TZ = ZoneInfo(settings.MARKET_TIMEZONE)
+MARKET_OPEN = dtime(9, 30)
+MARKET_CLOSE = dtime(16, 0)
+EXTENDED_OPEN = dtime(4, 0)
+EXTENDED_CLOSE = dtime(20, 0)
+
+# Extra lifetime given to refreshed quotes so they outlive the gap to the next run.
+TTL_GRACE_SECONDS = 30.0
+
+_task: Optional[asyncio.Task] = None
+_stop_event: Optional[asyncio.Event] = None
+_stats: Dict = {
+    "runs": 0,
+    "symbols_refreshed": 0,
+    "symbols_failed": 0,
+    "last_run_at": None,
+    "last_bar_ingest_date": None,
+    "last_session": None,
+    "next_run_in_seconds": None,
+}
+
+
+def market_session(now: datetime) -> str:
+    """Classify a moment as 'open', 'extended', 'closed' or 'weekend' in market time."""
+    local = now.astimezone(MARKET_TZ)
+    if local.weekday() >= 5:
+        return "weekend"
+    t = local.time()
+    if MARKET_OPEN <= t < MARKET_CLOSE:
+        return "open"
+    if EXTENDED_OPEN <= t < EXTENDED_CLOSE:
+        return "extended"
+    return "closed"
+
+
+def _next_weekday_start(local: datetime) -> datetime:
+    """Start of pre-market on the next weekday after the given market-time moment."""
+    day = local.date() + timedelta(days=1)
+    while day.weekday() >= 5:
+        day += timedelta(days=1)
+    return datetime.combine(day, EXTENDED_OPEN, tzinfo=MARKET_TZ)
+
+
+def next_refresh_delay(now: datetime) -> float:
+    """Seconds to wait before the next refresh run."""
+    local = now.astimezone(MARKET_TZ)
+    session = market_session(local)
+    if session == "weekend":
+        return (_next_weekday_start(local) - local).total_seconds()
+
+    interval = (
+        settings.PRICE_REFRESH_OPEN_INTERVAL_SECONDS if session == "open"
+        else settings.PRICE_REFRESH_AFTER_HOURS_INTERVAL_SECONDS
+    )
+    next_run = local + timedelta(seconds=interval)
+    if market_session(next_run) == "weekend":
+        # Skip straight to Monday instead of waking up all weekend.
+        return (_next_weekday_start(local) - local).total_seconds()
+    return interval
+
+
+def _load_held_symbols() -> List[str]:
+    db = SessionLocal()
+    try:
+        rows = db.query(Holding.symbol).distinct().all()
+        return sorted({row[0].upper() for row in rows if row[0]})
+    finally:
+        db.close()
+
+
+def _update_holding_prices(quotes: Dict[str, Dict]) -> None:
+    """Copy refreshed prices onto every holding of each symbol in one executemany UPDATE."""
+    if not quotes:
+        return
+    table = Holding.__table__
+    stmt = update(table).where(table.c.symbol == bindparam("b_symbol")).values(current_price=bindparam("b_price"))
+    db = SessionLocal()
+    try:
+        db.execute(stmt, [{"b_symbol": symbol, "b_price": quote["price"]} for symbol, quote in quotes.items()])
+        db.commit()
+    finally:
+        db.close()
+
+
+async def refresh_symbols(symbols: List[str], ttl_seconds: Optional[float] = None) -> Dict[str, Dict]:
+    """Fetch quotes for the given symbols in batches and store them in the cache and price table."""
+    batch_size = max(1, settings.PRICE_REFRESH_BATCH_SIZE)
+    refreshed: Dict[str, Dict] = {}
+    for i in range(0, len(symbols), batch_size):
+        batch = symbols[i:i + batch_size]
+        quotes = await get_multiple_stock_quotes(batch)
+        refreshed.update(await store_quotes(quotes, ttl_seconds))
+    try:
+        await asyncio.to_thread(_update_holding_prices, refreshed)
+    except Exception as e:
+        print(f"Error updating holding prices: {e}")
+    _stats["symbols_refreshed"] += len(refreshed)
+    _stats["symbols_failed"] += len(symbols) - len(refreshed)
+    return refreshed
+
+
+async def refresh_held_symbols(ttl_seconds: Optional[float] = None) -> Dict[str, Dict]:
+    """Re-price every distinct symbol across all holdings."""
+    symbols = await asyncio.to_thread(_load_held_symbols)
+    return await refresh_symbols(symbols, ttl_seconds)
+
+
+async def ingest_held_symbol_bars() -> Dict[str, int]:
+    """Append any missing daily bars for every held symbol."""
+    symbols = await asyncio.to_thread(_load_held_symbols)
+    return await ingest_symbols(symbols)
+
+
+async def _run(stop_event: asyncio.Event) -> None:
+    while not stop_event.is_set():
+        now = datetime.now(MARKET_TZ)
+        session = market_session(now)
+        delay = next_refresh_delay(now)
+        if session != "weekend":
+            try:
+                await refresh_held_symbols(ttl_seconds=delay + TTL_GRACE_SECONDS)
+            except Exception as e:
+                print(f"Error refreshing held symbol prices: {e}")
+            _stats["runs"] += 1
+            _stats["last_run_at"] = now.isoformat()
+            today = now.date().isoformat()
+            if now.time() >= MARKET_CLOSE and _stats["last_bar_ingest_date"] != today:
+                try:
+                    await ingest_held_symbol_bars()
+                    _stats["last_bar_ingest_date"] = today
+                except Exception as e:
+                    print(f"Error ingesting daily bars: {e}")
+        _stats["last_session"] = session
+        _stats["next_run_in_seconds"] = round(delay, 1)
+        try:
+            await asyncio.wait_for(stop_event.wait(), timeout=delay)
+        except asyncio.TimeoutError:
+            pass
+
+
+def start_price_refresher() -> Optional[asyncio.Task]:
+    """Start the refresher loop. Called from the app lifespan."""
+    global _task, _stop_event
+    if not settings.PRICE_REFRESHER_ENABLED:
+        return None
+    if _task is None or _task.done():
+        _stop_event = asyncio.Event()
+        _task = asyncio.create_task(_run(_stop_event))
+    return _task
+
+
+async def stop_price_refresher() -> None:
+    """Stop the refresher loop, abandoning any refresh still in flight."""
+    global _task, _stop_event
+    if _task is None:
+        return
+    _stop_event.set()
+    _task.cancel()
+    try:
+        await _task
+    except asyncio.CancelledError:
+        pass
+    finally:
+        _task = None
+        _stop_event = None
+
+
+def refresher_stats() -> Dict:
+    return {"running": _task is not None and not _task.done(), **_stats}
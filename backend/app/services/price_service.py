@@ -1,27 +1,158 @@
-from typing import Dict, Optional
-from app.services.yahoo_finance_service import get_stock_price as get_yahoo_price
+"""
+Price lookups for the request path.
+Fresh quotes come from the in-process cache. On a cache miss the last known good
+price from symbol_prices is returned straight away (flagged stale once it is older
+than PRICE_STALE_AFTER_SECONDS) while a refresh runs in the background. Only
+symbols with no stored price are fetched inline. A symbol that has never been
+priced resolves to None rather than a made-up value.
+"""
+import asyncio
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.response_cache import response_cache
+from app.services.price_store import load_prices, upsert_prices
+from app.services.quote_cache import QuoteCache
+from app.services.yahoo_finance_service import get_multiple_stock_quotes
 
 
-async def get_stock_price(symbol: str) -> Optional[float]:
+# Shared by every request in this process; see QUOTE_CACHE_* settings.
+quote_cache = QuoteCache(
+    ttl_seconds=settings.QUOTE_CACHE_TTL_SECONDS,
+    max_size=settings.QUOTE_CACHE_MAX_SIZE
+)
+
+_background_refreshes: Set[asyncio.Task] = set()
+
+
+def _load_last_good(symbols: List[str]) -> Dict[str, Dict]:
+    db = SessionLocal()
+    try:
+        return load_prices(db, symbols)
+    finally:
+        db.close()
+
+
+def _persist(quotes: Dict[str, Dict]) -> None:
+    db = SessionLocal()
+    try:
+        upsert_prices(db, quotes)
+        db.commit()
+    finally:
+        db.close()
+
+
+async def store_quotes(quotes: Dict[str, Dict], ttl_seconds: Optional[float] = None) -> Dict[str, Dict]:
+    """
+    Stamp freshly fetched quotes, put them in the cache and persist them as the
+    last known good prices. Quotes without a price are dropped.
+    """
+    fetched_at = datetime.now(timezone.utc)
+    good = {}
+    for symbol, quote in quotes.items():
+        if quote and quote.get("price"):
+            quote = {**quote, "fetched_at": fetched_at}
+            quote_cache.set(symbol, quote, ttl_seconds)
+            good[symbol.upper()] = quote
+    response_cache.note_prices(good)
+    if good:
+        try:
+            await asyncio.to_thread(_persist, good)
+        except Exception as e:
+            print(f"Error persisting prices for {len(good)} symbols: {e}")
+    return good
+
+
+async def _fetch_and_store(symbols: List[str]) -> Dict[str, Dict]:
+    quotes = await get_multiple_stock_quotes(symbols)
+    return await store_quotes(quotes)
+
+
+async def _refresh_in_background(symbols: List[str]) -> None:
+    try:
+        await quote_cache.get_many_or_fetch(symbols, _fetch_and_store)
+    except Exception as e:
+        print(f"Error refreshing prices for {len(symbols)} symbols: {e}")
+
+
+def _schedule_refresh(symbols: List[str]) -> None:
+    task = asyncio.create_task(_refresh_in_background(symbols))
+    _background_refreshes.add(task)
+    task.add_done_callback(_background_refreshes.discard)
+
+
+def _status(quote: Dict, stale: bool) -> Dict:
+    return {"price": quote.get("price"), "stale": stale, "as_of": quote.get("fetched_at")}
+
+
+async def get_price_statuses(symbols: List[str]) -> Dict[str, Dict]:
     """
-    Fetch current stock price from Yahoo Finance API.
-    Falls back to mock data if API fails.
+    Resolve prices for several symbols.
+    Returns {symbol: {"price", "stale", "as_of"}} keyed by upper-cased symbol;
+    price is None for symbols that could not be priced at all.
     """
+    keys = list(dict.fromkeys(s.upper() for s in symbols if s))
+    statuses: Dict[str, Dict] = {}
+
+    misses = []
+    for symbol in keys:
+        quote = quote_cache.lookup(symbol)
+        if quote is not None:
+            statuses[symbol] = _status(quote, stale=False)
+        else:
+            misses.append(symbol)
+    if not misses:
+        return statuses
+
     try:
-        # Try Yahoo Finance first
-        price = await get_yahoo_price(symbol)
-        if price:
-            return price
+        last_good = await asyncio.to_thread(_load_last_good, misses)
     except Exception as e:
-        print(f"Error fetching real price for {symbol}: {e}")
-    
-    # Fallback to mock prices for development
-    mock_prices: Dict[str, float] = {
-        "AAPL": 175.50,
-        "GOOGL": 140.25,
-        "MSFT": 380.00,
-        "AMZN": 145.75,
-        "TSLA": 250.30,
-    }
-    
-    return mock_prices.get(symbol.upper(), 100.0)
+        print(f"Error loading stored prices for {len(misses)} symbols: {e}")
+        last_good = {}
+
+    now = datetime.now(timezone.utc)
+    revalidate = [s for s in misses if s in last_good]
+    for symbol in revalidate:
+        stored = last_good[symbol]
+        age = (now - stored["fetched_at"]).total_seconds() if stored["fetched_at"] else None
+        statuses[symbol] = _status(stored, stale=age is None or age > settings.PRICE_STALE_AFTER_SECONDS)
+    if revalidate:
+        _schedule_refresh(revalidate)
+
+    unknown = [s for s in misses if s not in last_good]
+    if unknown:
+        try:
+            fetched = await quote_cache.get_many_or_fetch(unknown, _fetch_and_store)
+        except Exception as e:
+            print(f"Error fetching real prices for {len(unknown)} symbols: {e}")
+            fetched = {}
+        for symbol in unknown:
+            quote = fetched.get(symbol)
+            statuses[symbol] = _status(quote, stale=False) if quote else {"price": None, "stale": True, "as_of": None}
+
+    return statuses
+
+
+async def get_live_quotes(symbols: List[str], max_age_seconds: Optional[float] = None) -> Dict[str, Dict]:
+    """
+    Full quotes (price, change, volume, ...) from the cache, fetching and storing
+    whatever is missing (or older than max_age_seconds) in one batched request.
+    Unpriceable symbols are absent.
+    """
+    return await quote_cache.get_many_or_fetch(symbols, _fetch_and_store, max_age_seconds)
+
+
+async def get_stock_prices(symbols: List[str]) -> Dict[str, Optional[float]]:
+    """Current (or last known good) prices for several symbols, keyed by upper-cased symbol."""
+    statuses = await get_price_statuses(symbols)
+    return {symbol: status["price"] for symbol, status in statuses.items()}
+
+
+async def get_stock_price(symbol: str) -> Optional[float]:
+    """
+    Current price for a symbol, or its last known good price if Yahoo is unavailable.
+    Returns None if the symbol has never been priced.
+    """
+    statuses = await get_price_statuses([symbol])
+    return statuses.get(symbol.upper(), {}).get("price")
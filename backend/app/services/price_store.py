@@ -0,0 +1,75 @@
+"""
+Persistent last-known-good price store (symbol_prices table).
+"""
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Optional
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from app.models.symbol_price import SymbolPrice
+
+
+def upsert_prices(db: Session, quotes: Dict[str, Dict]) -> int:
+    """
+    Write many quotes in one INSERT ... ON CONFLICT statement.
+    A row is only overwritten by a quote fetched after it.
+    The caller commits.
+    """
+    rows = [
+        {
+            "symbol": symbol.upper(),
+            "price": quote["price"],
+            "previous_close": quote.get("previous_close"),
+            "currency": quote.get("currency"),
+            "fetched_at": quote.get("fetched_at") or datetime.now(timezone.utc),
+        }
+        for symbol, quote in quotes.items()
+        if quote and quote.get("price")
+    ]
+    if not rows:
+        return 0
+
+    stmt = insert(SymbolPrice).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[SymbolPrice.symbol],
+        set_={
+            "price": stmt.excluded.price,
+            "previous_close": stmt.excluded.previous_close,
+            "currency": stmt.excluded.currency,
+            "fetched_at": stmt.excluded.fetched_at,
+            "updated_at": datetime.now(timezone.utc),
+        },
+        where=SymbolPrice.fetched_at < stmt.excluded.fetched_at,
+    )
+    db.execute(stmt)
+    return len(rows)
+
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def load_prices(db: Session, symbols: Iterable[str]) -> Dict[str, Dict]:
+    """Fetch the stored prices for the given symbols as quote-shaped dicts, keyed by symbol."""
+    keys = list({s.upper() for s in symbols if s})
+    if not keys:
+        return {}
+    rows = db.query(
+        SymbolPrice.symbol,
+        SymbolPrice.price,
+        SymbolPrice.previous_close,
+        SymbolPrice.currency,
+        SymbolPrice.fetched_at
+    ).filter(SymbolPrice.symbol.in_(keys)).all()
+    # Backends without timezone support hand back naive values; they were written as UTC.
+    return {
+        row.symbol: {
+            "symbol": row.symbol,
+            "price": row.price,
+            "previous_close": row.previous_close,
+            "currency": row.currency,
+            "fetched_at": _as_utc(row.fetched_at),
+        }
+        for row in rows
+    }
@@ -0,0 +1,152 @@
+"""
+Monte Carlo portfolio projections.
+Monthly returns are estimated from the portfolio's historical daily returns at its
+current weights (risk_engine.portfolio_returns). The paths are split into shards
+of PROJECTION_SHARD_PATHS and simulated by monte_carlo.simulate_shard on a
+ProcessPoolExecutor owned by the app lifespan, so a 100k-path projection never
+holds the event loop or the GIL. Without a pool (scripts, tests) shards run in a
+worker thread instead.
+"""
+import asyncio
+import calendar
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from typing import Dict, Optional, Sequence
+import numpy as np
+from app.core.config import settings
+from app.services.monte_carlo import simulate_shard
+from app.services.risk_engine import portfolio_returns
+
+
+TRADING_DAYS_PER_MONTH = 21
+PERCENTILES = (5, 25, 50, 75, 95)
+
+_pool: Optional[ProcessPoolExecutor] = None
+_stats = {"projections": 0, "paths_simulated": 0}
+
+
+def start_projection_pool() -> Optional[ProcessPoolExecutor]:
+    """Start the simulation worker processes. Called from the app lifespan."""
+    global _pool
+    if settings.PROJECTION_WORKERS == 0:
+        return None
+    if _pool is None:
+        # spawn: forking a process that already runs threads (asyncio.to_thread, DB pools) is unsafe
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.PROJECTION_WORKERS or os.cpu_count(),
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _pool
+
+
+def stop_projection_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def monthly_log_returns(daily_returns: np.ndarray) -> np.ndarray:
+    """Overlapping 21-trading-day log returns: the bootstrap sample for one month."""
+    log_returns = np.log1p(daily_returns)
+    if len(log_returns) < TRADING_DAYS_PER_MONTH:
+        return np.empty(0)
+    cumulative = np.concatenate([[0.0], np.cumsum(log_returns)])
+    return cumulative[TRADING_DAYS_PER_MONTH:] - cumulative[:-TRADING_DAYS_PER_MONTH]
+
+
+def _checkpoints(months: int, max_points: int) -> np.ndarray:
+    """Months at which percentiles are reported: evenly spaced, always including 0 and the horizon."""
+    if months + 1 <= max_points:
+        return np.arange(months + 1)
+    return np.unique(np.round(np.linspace(0, months, max_points)).astype(np.intp))
+
+
+def _add_months(start: date, months: int) -> date:
+    month = start.month - 1 + months
+    year, month = start.year + month // 12, month % 12 + 1
+    return date(year, month, min(start.day, calendar.monthrange(year, month)[1]))
+
+
+async def project(
+    symbols: Sequence[str],
+    market_values: Sequence[float],
+    years: int,
+    monthly_contribution: float,
+    paths: int,
+    method: str = "bootstrap",
+    lookback_start: Optional[date] = None,
+    seed: Optional[int] = None
+) -> Dict:
+    """
+    Percentile bands of simulated portfolio value over the horizon.
+    Returns a dict; "observations" is 0 (and there are no points) when the
+    holdings have too little price history to estimate returns.
+    """
+    start_value = float(np.sum(market_values))
+    daily = await asyncio.to_thread(portfolio_returns, symbols, market_values, lookback_start)
+    monthly = monthly_log_returns(daily)
+    result = {
+        "method": method,
+        "years": years,
+        "paths": paths,
+        "monthly_contribution": monthly_contribution,
+        "start_value": start_value,
+        "total_contributions": monthly_contribution * years * 12,
+        "observations": int(len(daily)),
+        "monthly_mean": None,
+        "monthly_volatility": None,
+        "probability_of_loss": None,
+        "points": [],
+    }
+    if len(monthly) < 2:
+        result["observations"] = 0
+        return result
+
+    # Daily moments scaled to a month, so overlapping windows don't understate volatility
+    mean = float(np.mean(np.log1p(daily))) * TRADING_DAYS_PER_MONTH
+    volatility = float(np.std(np.log1p(daily), ddof=1)) * np.sqrt(TRADING_DAYS_PER_MONTH)
+    months = years * 12
+    checkpoints = _checkpoints(months, settings.PROJECTION_MAX_POINTS)
+    sample = monthly if method == "bootstrap" else None
+
+    shard_size = max(1, settings.PROJECTION_SHARD_PATHS)
+    shards = [min(shard_size, paths - i) for i in range(0, paths, shard_size)]
+    seeds = np.random.SeedSequence(seed).generate_state(len(shards))
+    loop = asyncio.get_running_loop()
+
+    def run(shard_seed: int, shard_paths: int):
+        args = (int(shard_seed), shard_paths, months, start_value, monthly_contribution, checkpoints, sample, mean, volatility)
+        if _pool is None:
+            return asyncio.to_thread(simulate_shard, *args)
+        return loop.run_in_executor(_pool, simulate_shard, *args)
+
+    shard_values = await asyncio.gather(*(run(s, n) for s, n in zip(seeds, shards)))
+    values = np.concatenate(shard_values)
+    bands = await asyncio.to_thread(np.percentile, values, PERCENTILES, axis=0)
+    _stats["projections"] += 1
+    _stats["paths_simulated"] += paths
+
+    today = date.today()
+    invested = start_value + monthly_contribution * checkpoints
+    result.update({
+        "monthly_mean": mean,
+        "monthly_volatility": volatility,
+        "probability_of_loss": float(np.mean(values[:, -1] < invested[-1])),
+        "points": [
+            {
+                "month": int(month),
+                "date": _add_months(today, int(month)),
+                "invested": float(invested[i]),
+                **{f"p{p}": float(bands[k, i]) for k, p in enumerate(PERCENTILES)},
+            }
+            for i, month in enumerate(checkpoints)
+        ],
+    })
+    return result
+
+
+def projection_stats() -> Dict:
+    return {"pool_running": _pool is not None, **_stats}
@@ -0,0 +1,164 @@
+"""
+In-process quote cache.
+Bounded LRU with a per-entry TTL. Concurrent lookups for a symbol that is already
+being fetched wait on the same upstream call instead of starting their own.
+Callers that need fresher quotes than the TTL guarantees (the quote stream) pass
+max_age_seconds; older entries are then refetched rather than served.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+
+class QuoteCache:
+    def __init__(self, ttl_seconds: float, max_size: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max(1, max_size)
+        self._entries: "OrderedDict[str, Tuple[float, float, Dict]]" = OrderedDict()  # expires_at, stored_at, quote
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def get(self, symbol: str, max_age_seconds: Optional[float] = None) -> Optional[Dict]:
+        """
+        Return the cached quote if it is still fresh (and no older than
+        max_age_seconds, if given). Does not touch the counters.
+        """
+        key = symbol.upper()
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, stored_at, quote = entry
+        now = time.monotonic()
+        if expires_at <= now:
+            del self._entries[key]
+            return None
+        if max_age_seconds is not None and now - stored_at > max_age_seconds:
+            return None
+        self._entries.move_to_end(key)
+        return quote
+
+    def lookup(self, symbol: str) -> Optional[Dict]:
+        """Like get, but a fresh entry counts as a hit."""
+        quote = self.get(symbol)
+        if quote is not None:
+            self.hits += 1
+        return quote
+
+    def set(self, symbol: str, quote: Dict, ttl_seconds: Optional[float] = None) -> None:
+        key = symbol.upper()
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        now = time.monotonic()
+        self._entries[key] = (now + ttl, now, quote)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, symbol: Optional[str] = None) -> None:
+        if symbol is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(symbol.upper(), None)
+
+    async def get_or_fetch(
+        self,
+        symbol: str,
+        fetch: Callable[[str], Awaitable[Optional[Dict]]]
+    ) -> Optional[Dict]:
+        """Return a fresh cached quote, or fetch it once no matter how many callers ask."""
+        results = await self.get_many_or_fetch([symbol], lambda symbols: self._fetch_single(symbols, fetch))
+        return results.get(symbol.upper())
+
+    async def get_many_or_fetch(
+        self,
+        symbols: Iterable[str],
+        fetch_many: Callable[[List[str]], Awaitable[Dict[str, Dict]]],
+        max_age_seconds: Optional[float] = None
+    ) -> Dict[str, Dict]:
+        """
+        Resolve several symbols at once.
+        Fresh entries (no older than max_age_seconds, if given) are served from the
+        cache, symbols another caller is already fetching are awaited, and the rest
+        go upstream in a single fetch_many call.
+        Symbols the upstream could not price are absent from the result.
+        """
+        results: Dict[str, Dict] = {}
+        waiting: Dict[str, asyncio.Future] = {}
+        to_fetch: List[str] = []
+
+        for key in dict.fromkeys(s.upper() for s in symbols if s):
+            quote = self.get(key, max_age_seconds)
+            if quote is not None:
+                self.hits += 1
+                results[key] = quote
+            elif key in self._inflight:
+                self.coalesced += 1
+                waiting[key] = self._inflight[key]
+            else:
+                self.misses += 1
+                to_fetch.append(key)
+
+        if to_fetch:
+            loop = asyncio.get_running_loop()
+            futures = {key: loop.create_future() for key in to_fetch}
+            self._inflight.update(futures)
+            try:
+                fetched = await fetch_many(to_fetch)
+                for key, future in futures.items():
+                    quote = fetched.get(key)
+                    if quote is not None:
+                        self.set(key, quote)
+                        results[key] = quote
+                    future.set_result(quote)
+            except BaseException as e:
+                for future in futures.values():
+                    if future.done():
+                        continue
+                    if isinstance(e, asyncio.CancelledError):
+                        future.cancel()
+                    else:
+                        future.set_exception(e)
+                        # Mark as retrieved so unawaited futures don't log warnings.
+                        future.exception()
+                raise
+            finally:
+                for key, future in futures.items():
+                    if self._inflight.get(key) is future:
+                        del self._inflight[key]
+
+        for key, future in waiting.items():
+            try:
+                quote = await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                quote = None
+            except Exception:
+                quote = None
+            if quote is not None:
+                results[key] = quote
+
+        return results
+
+    @staticmethod
+    async def _fetch_single(symbols: List[str], fetch: Callable[[str], Awaitable[Optional[Dict]]]) -> Dict[str, Dict]:
+        quote = await fetch(symbols[0])
+        return {symbols[0]: quote} if quote else {}
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "inflight": len(self._inflight),
+            "hit_ratio": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+        }
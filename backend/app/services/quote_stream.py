@@ -0,0 +1,117 @@
+"""
+Live quote fan-out.
+Each subscribed symbol has exactly one poller task no matter how many clients
+watch it. The poller reads through the shared quote cache, accepting nothing older
+than its poll interval, and only pushes a tick
+to subscriber queues when the price actually changes. Pollers stop once their
+last subscriber leaves.
+"""
+import asyncio
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Optional, Set
+from app.core.config import settings
+from app.services.price_refresher import market_session
+from app.services.price_service import get_live_quotes
+
+
+def _tick(symbol: str, quote: Dict) -> Dict:
+    as_of = quote.get("fetched_at")
+    return {
+        "type": "quote",
+        "symbol": symbol,
+        "price": quote.get("price"),
+        "change": quote.get("change"),
+        "change_percent": quote.get("change_percent"),
+        "as_of": (as_of or datetime.now(timezone.utc)).isoformat(),
+    }
+
+
+class QuoteHub:
+    def __init__(self):
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._pollers: Dict[str, asyncio.Task] = {}
+        self._last_ticks: Dict[str, Dict] = {}
+        self.ticks_sent = 0
+        self.ticks_dropped = 0
+
+    def subscribe(self, queue: asyncio.Queue, symbols: Iterable[str]) -> Set[str]:
+        """Attach a subscriber queue to symbols. Returns the symbols newly added."""
+        added = set()
+        for symbol in {s.upper() for s in symbols if s}:
+            subscribers = self._subscribers.setdefault(symbol, set())
+            if queue in subscribers:
+                continue
+            subscribers.add(queue)
+            added.add(symbol)
+            if symbol in self._last_ticks:
+                self._offer(queue, self._last_ticks[symbol])
+            if symbol not in self._pollers or self._pollers[symbol].done():
+                self._pollers[symbol] = asyncio.create_task(self._poll(symbol))
+        return added
+
+    def unsubscribe(self, queue: asyncio.Queue, symbols: Optional[Iterable[str]] = None) -> None:
+        """Detach a queue from some symbols, or from everything when symbols is None."""
+        targets = list(self._subscribers) if symbols is None else {s.upper() for s in symbols if s}
+        for symbol in targets:
+            subscribers = self._subscribers.get(symbol)
+            if not subscribers:
+                continue
+            subscribers.discard(queue)
+            if not subscribers:
+                del self._subscribers[symbol]
+                self._last_ticks.pop(symbol, None)
+                poller = self._pollers.pop(symbol, None)
+                if poller:
+                    poller.cancel()
+
+    def _offer(self, queue: asyncio.Queue, tick: Dict) -> None:
+        """Queue a tick for one subscriber, dropping its oldest tick if it is falling behind."""
+        if queue.full():
+            try:
+                queue.get_nowait()
+                self.ticks_dropped += 1
+            except asyncio.QueueEmpty:
+                pass
+        queue.put_nowait(tick)
+        self.ticks_sent += 1
+
+    async def _poll(self, symbol: str) -> None:
+        while symbol in self._subscribers:
+            open_now = market_session(datetime.now(timezone.utc)) == "open"
+            interval = settings.STREAM_POLL_INTERVAL_SECONDS if open_now else settings.STREAM_IDLE_POLL_INTERVAL_SECONDS
+            try:
+                # No older than one poll interval: the cache TTL alone would repeat a quote for several polls
+                quote = (await get_live_quotes([symbol], max_age_seconds=interval)).get(symbol)
+            except Exception as e:
+                print(f"Error polling quote for {symbol}: {e}")
+                quote = None
+            if quote and quote.get("price") is not None:
+                last = self._last_ticks.get(symbol)
+                if last is None or last["price"] != quote["price"]:
+                    tick = _tick(symbol, quote)
+                    self._last_ticks[symbol] = tick
+                    for queue in list(self._subscribers.get(symbol, ())):
+                        self._offer(queue, tick)
+            await asyncio.sleep(interval)
+
+    async def close(self) -> None:
+        """Cancel every poller. Called on shutdown."""
+        pollers = list(self._pollers.values())
+        for poller in pollers:
+            poller.cancel()
+        await asyncio.gather(*pollers, return_exceptions=True)
+        self._pollers.clear()
+        self._subscribers.clear()
+        self._last_ticks.clear()
+
+    def stats(self) -> Dict:
+        return {
+            "symbols": len(self._subscribers),
+            "pollers": sum(1 for p in self._pollers.values() if not p.done()),
+            "subscriptions": sum(len(s) for s in self._subscribers.values()),
+            "ticks_sent": self.ticks_sent,
+            "ticks_dropped": self.ticks_dropped,
+        }
+
+
+quote_hub = QuoteHub()
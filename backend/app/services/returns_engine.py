@@ -0,0 +1,251 @@
+"""
+Historical returns engine.
+Rebuilds a portfolio's daily value from position changes and stored daily closes
+(bar_store) instead of relying on snapshots. Positions, prices and cash flows are
+laid out as date x symbol matrices, so any past range is one vectorized pass:
+
+    positions = cumsum(quantity changes)      value = sum(positions * close)
+
+Time-weighted return chains daily returns with flows at the start of the day
+(r = (V_t + income_t - V_t-1 - flow_t) / (V_t-1 + flow_t)); money-weighted return
+is the annualized IRR of the flows. Flows are money moved into the positions
+(buys positive, sells negative); income is cash the positions paid out
+(dividends, interest; fees negative).
+"""
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Sequence
+import numpy as np
+from app.services.bar_store import BarStore, bar_store, DATE_DTYPE
+from app.services.downsampling import lttb_indices
+
+
+# Plaid investment transaction subtypes treated as income paid out by a position.
+INCOME_SUBTYPES = {"dividend", "qualified dividend", "non-qualified dividend", "interest", "long-term capital gain", "short-term capital gain"}
+
+
+def _as_date(value) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def events_from_holdings(holdings: Sequence) -> List[Dict]:
+    """
+    One position per holding, opened on the day it was added and valued at that
+    day's close, so gains made before it was entered aren't booked as a one-day
+    return. Holdings carry no trade history, so later quantity edits are treated
+    as if the current quantity had been held since then.
+    """
+    return [
+        {
+            "date": _as_date(h.created_at or datetime.utcnow()),
+            "symbol": h.symbol.upper(),
+            "quantity": h.quantity,
+            "amount": None,
+        }
+        for h in holdings
+    ]
+
+
+def events_from_plaid_transactions(transactions: Iterable[Dict]) -> List[Dict]:
+    """
+    Map Plaid investment transactions (as returned by plaid_service, with
+    ticker_symbol) to engine events. Plaid amounts are positive when money
+    leaves the account, so a buy's amount is already an inflow to the positions.
+    """
+    events = []
+    for t in transactions:
+        symbol = (t.get("ticker_symbol") or "").upper()
+        kind = (t.get("type") or "").lower()
+        subtype = (t.get("subtype") or "").lower()
+        amount = t.get("amount") or 0.0
+        quantity = abs(t.get("quantity") or 0.0)
+        if kind == "buy" and symbol:
+            events.append({"date": _as_date(t["date"]), "symbol": symbol, "quantity": quantity, "amount": abs(amount)})
+        elif kind == "sell" and symbol:
+            events.append({"date": _as_date(t["date"]), "symbol": symbol, "quantity": -quantity, "amount": -abs(amount)})
+        elif kind == "transfer" and symbol and t.get("quantity"):
+            # Shares moved in or out in kind: valued at that day's close by the engine.
+            events.append({"date": _as_date(t["date"]), "symbol": symbol, "quantity": t["quantity"], "amount": None})
+        elif (kind == "cash" and subtype in INCOME_SUBTYPES) or kind == "fee":
+            events.append({"date": _as_date(t["date"]), "symbol": symbol or None, "quantity": 0.0, "amount": 0.0, "income": -amount})
+    return events
+
+
+def _forward_fill(matrix: np.ndarray) -> np.ndarray:
+    """Carry each column's last known value down over NaN rows."""
+    rows = np.where(np.isnan(matrix), 0, np.arange(len(matrix))[:, None])
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    return matrix[rows, np.arange(matrix.shape[1])]
+
+
+def _xirr(amounts: np.ndarray, years: np.ndarray) -> Optional[float]:
+    """Annualized internal rate of return of dated flows (investor's view), or None."""
+    if not (np.any(amounts > 0) and np.any(amounts < 0)):
+        return None
+
+    def npv(rate: float) -> float:
+        return float(np.sum(amounts / (1.0 + rate) ** years))
+
+    # Bracket the root, then bisect: slower than Newton but cannot diverge.
+    lo, hi = -0.9999, 1.0
+    while npv(hi) > 0 and hi < 1e6:
+        hi *= 2
+    f_lo = npv(lo)
+    if np.sign(f_lo) == np.sign(npv(hi)):
+        return None
+    for _ in range(200):
+        mid = (lo + hi) / 2
+        f_mid = npv(mid)
+        if abs(f_mid) < 1e-9 or hi - lo < 1e-12:
+            break
+        if np.sign(f_mid) == np.sign(f_lo):
+            lo, f_lo = mid, f_mid
+        else:
+            hi = mid
+    return (lo + hi) / 2
+
+
+def compute_returns(
+    events: List[Dict],
+    opening: Optional[Dict[str, float]] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    store: BarStore = bar_store
+) -> Dict:
+    """
+    Daily value and returns over [start, end] (trading days with stored bars).
+    `events` are dicts with date, symbol, quantity (change) and amount (flow;
+    None values it at that day's close) plus optional income. `opening` gives
+    positions already held before the first event (or before `start`); they are
+    valued as the opening balance, not as a flow. Positions built before `start`
+    likewise count as the opening balance of the window.
+    """
+    opening = {s.upper(): q for s, q in (opening or {}).items() if q}
+    if end is not None:
+        # Trades after the window never count in it, whatever bars are stored
+        events = [e for e in events if _as_date(e["date"]) <= end]
+    symbols = sorted({e["symbol"] for e in events if e.get("symbol")} | set(opening))
+    if not symbols or (not events and not opening):
+        return _empty(start, end)
+
+    # Read from the earliest event (or start; all stored bars if neither), but always
+    # back to the latest stored bar, so positions opened since then still get a price.
+    candidates = [_as_date(e["date"]) for e in events] + ([start] if start else [])
+    first = min(candidates) if candidates else None
+    stored = [d for d in (store.last_date(s) for s in symbols) if d is not None]
+    if first is not None and stored:
+        first = min(first, max(stored))
+    dates, prices = store.read_matrix(symbols, first, end, column="close")
+    if not len(dates):
+        return {**_empty(start, end), "missing_symbols": symbols}
+    columns = {s: j for j, s in enumerate(symbols)}
+    missing = [s for s in symbols if np.all(np.isnan(prices[:, columns[s]]))]
+    prices = np.nan_to_num(_forward_fill(prices), nan=0.0)
+
+    # Scatter events onto the grid; trades on non-trading days land on the next session.
+    # Ones inside the window but after the last stored bar (e.g. today's) are booked
+    # on it at its close, as there is no later price to value them at.
+    last_day = dates[-1].astype(date)
+    if end is None or end > last_day:
+        events = [
+            e if _as_date(e["date"]) <= last_day else {**e, "date": last_day, "amount": None}
+            for e in events
+        ]
+    day = np.searchsorted(dates, np.array([np.datetime64(e["date"], "D") for e in events], dtype=DATE_DTYPE))
+    col = np.array([columns.get(e.get("symbol"), 0) for e in events], dtype=np.intp)
+    has_symbol = np.array([e.get("symbol") in columns for e in events], dtype=bool)
+    quantity = np.array([e.get("quantity") or 0.0 for e in events], dtype=float) * has_symbol
+    amount = np.array([np.nan if e.get("amount") is None else e["amount"] for e in events], dtype=float)
+    amount = np.where(np.isnan(amount), quantity * prices[day, col], amount)
+    income = np.array([e.get("income") or 0.0 for e in events], dtype=float)
+
+    n_days = len(dates)
+    changes = np.zeros((n_days, len(symbols)))
+    np.add.at(changes, (day, col), quantity)
+    for symbol, qty in opening.items():
+        changes[0, columns[symbol]] += qty
+    positions = np.cumsum(changes, axis=0)
+    values = np.sum(positions * prices, axis=1)
+    flows = np.bincount(day, weights=amount, minlength=n_days)
+    incomes = np.bincount(day, weights=income, minlength=n_days)
+
+    # Restrict to the window; whatever was held going in is its opening balance.
+    lo = int(np.searchsorted(dates, np.datetime64(start, "D"))) if start else 0
+    if lo >= n_days:
+        return {**_empty(start, end), "missing_symbols": missing}
+    if lo > 0:
+        opening_value = values[lo - 1]
+    else:
+        opening_value = sum(qty * prices[0, columns[s]] for s, qty in opening.items())
+    dates, values, flows, incomes = dates[lo:], values[lo:], flows[lo:], incomes[lo:]
+    previous = np.concatenate([[opening_value], values[:-1]])
+
+    base = previous + flows
+    with np.errstate(divide="ignore", invalid="ignore"):
+        daily = np.where(base > 0, (values + incomes - base) / base, 0.0)
+    growth = np.cumprod(1.0 + daily)
+    twr = growth[-1] - 1.0
+
+    years = (dates - dates[0]).astype(float) / 365.25
+    cash = incomes - flows
+    cash[0] -= opening_value
+    cash[-1] += values[-1]
+    span = years[-1]
+    return {
+        "start_date": dates[0].astype(date),
+        "end_date": dates[-1].astype(date),
+        "start_value": float(opening_value),
+        "end_value": float(values[-1]),
+        "net_contributions": float(flows.sum()),
+        "income": float(incomes.sum()),
+        "twr": float(twr),
+        "twr_annualized": float(growth[-1] ** (1.0 / span) - 1.0) if span >= 1 else None,
+        "mwr_annualized": _xirr(cash, years) if span > 0 else None,
+        "missing_symbols": missing,
+        "dates": dates.astype(date).tolist(),
+        "values": values,
+        "flows": flows,
+        "twr_series": growth - 1.0,
+    }
+
+
+def _empty(start: Optional[date], end: Optional[date]) -> Dict:
+    return {
+        "start_date": start,
+        "end_date": end,
+        "start_value": 0.0,
+        "end_value": 0.0,
+        "net_contributions": 0.0,
+        "income": 0.0,
+        "twr": 0.0,
+        "twr_annualized": None,
+        "mwr_annualized": None,
+        "missing_symbols": [],
+        "dates": [],
+        "values": np.empty(0),
+        "flows": np.empty(0),
+        "twr_series": np.empty(0),
+    }
+
+
+def summarize(result: Dict, max_points: int) -> Dict:
+    """
+    JSON-ready form of a compute_returns() result: the scalar figures plus at
+    most max_points daily points (LTTB on value).
+    """
+    dates = result["dates"]
+    keep = lttb_indices(np.arange(len(dates), dtype=float), result["values"], max_points)
+    summary = {k: v for k, v in result.items() if k not in ("dates", "values", "flows", "twr_series")}
+    summary["data_points"] = [
+        {
+            "date": dates[i],
+            "value": float(result["values"][i]),
+            "net_flow": float(result["flows"][i]),
+            "cumulative_twr": float(result["twr_series"][i]),
+        }
+        for i in keep
+    ]
+    return summary
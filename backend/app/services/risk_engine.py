@@ -0,0 +1,195 @@
+"""
+Portfolio risk analytics from stored daily bars.
+Adjusted closes for every holding and the benchmark are read as one date x symbol
+matrix (bar_store.read_matrix) and turned into a daily returns matrix; everything
+below is a handful of array operations over it, so hundreds of holdings over
+several years stay well under a second.
+
+The portfolio is held at its current weights throughout the window. A holding
+with no bar on a day (not yet listed, or a gap) contributes no return that day,
+and correlations use every day both holdings have a return (pairwise complete).
+VaR and CVaR are one-day figures, reported as positive losses.
+"""
+from datetime import date
+from statistics import NormalDist
+from typing import Dict, Optional, Sequence
+import numpy as np
+from app.services.bar_store import BarStore, bar_store
+
+
+TRADING_DAYS = 252
+
+
+def _daily_returns(prices: np.ndarray) -> np.ndarray:
+    """Simple returns between consecutive rows; NaN where either close is missing."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return prices[1:] / prices[:-1] - 1.0
+
+
+def _weighted_returns(holding_returns: np.ndarray, weights: np.ndarray):
+    """
+    Daily returns of the portfolio held at fixed weights, plus the mask of rows
+    kept: days before any holding has a bar are not part of its history.
+    """
+    traded = np.any(~np.isnan(holding_returns), axis=1)
+    portfolio = np.where(np.isnan(holding_returns), 0.0, holding_returns) @ weights
+    return portfolio[traded], traded
+
+
+def portfolio_returns(
+    symbols: Sequence[str],
+    market_values: Sequence[float],
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    store: BarStore = bar_store
+) -> np.ndarray:
+    """Daily simple returns of the positions held at their current weights (empty without history)."""
+    values = np.asarray(market_values, dtype=float)
+    if not len(symbols) or values.sum() <= 0:
+        return np.empty(0)
+    dates, prices = store.read_matrix(list(symbols), start, end, column="adj_close")
+    if len(dates) < 2:
+        return np.empty(0)
+    return _weighted_returns(_daily_returns(prices), values / values.sum())[0]
+
+
+def _annualized_volatility(returns: np.ndarray) -> np.ndarray:
+    """Per-column annualized volatility ignoring NaN (NaN with fewer than two returns)."""
+    valid = ~np.isnan(returns)
+    n = valid.sum(axis=0)
+    filled = np.where(valid, returns, 0.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = filled.sum(axis=0) / n
+        variance = (np.where(valid, returns - mean, 0.0) ** 2).sum(axis=0) / (n - 1)
+    return np.where(n > 1, np.sqrt(variance * TRADING_DAYS), np.nan)
+
+
+def _betas(returns: np.ndarray, benchmark: np.ndarray) -> np.ndarray:
+    """Beta of every column against the benchmark, over days both have a return."""
+    valid = ~np.isnan(returns) & ~np.isnan(benchmark)[:, None]
+    n = valid.sum(axis=0)
+    x = np.where(valid, returns, 0.0)
+    b = np.where(valid, benchmark[:, None], 0.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        covariance = (x * b).sum(axis=0) / n - x.sum(axis=0) / n * b.sum(axis=0) / n
+        variance = (b * b).sum(axis=0) / n - (b.sum(axis=0) / n) ** 2
+        return np.where((n > 1) & (variance > 0), covariance / variance, np.nan)
+
+
+def correlation_matrix(returns: np.ndarray) -> np.ndarray:
+    """Pairwise-complete Pearson correlation of the columns (NaN where undefined)."""
+    valid = (~np.isnan(returns)).astype(float)
+    x = np.where(valid > 0, returns, 0.0)
+    n = valid.T @ valid                 # days both columns have a return
+    sum_x = x.T @ valid                 # sum of column i over days shared with j
+    sum_xx = (x * x).T @ valid
+    sum_xy = x.T @ x
+    with np.errstate(divide="ignore", invalid="ignore"):
+        covariance = n * sum_xy - sum_x * sum_x.T
+        variance = (n * sum_xx - sum_x ** 2) * (n * sum_xx.T - sum_x.T ** 2)
+        corr = covariance / np.sqrt(variance)
+    corr = np.where((n > 1) & (variance > 0), np.clip(corr, -1.0, 1.0), np.nan)
+    np.fill_diagonal(corr, np.where(np.diag(n) > 1, 1.0, np.nan))
+    return corr
+
+
+def _value_at_risk(returns: np.ndarray, confidence: float, value: float) -> Dict[str, Dict]:
+    """Historical and parametric (normal) one-day VaR/CVaR as fractions and amounts."""
+    tail = 1.0 - confidence
+    cutoff = float(np.quantile(returns, tail))
+    losses = returns[returns <= cutoff]
+    historical_var = -cutoff
+    historical_cvar = -float(losses.mean()) if len(losses) else historical_var
+
+    mu, sigma = float(returns.mean()), float(returns.std(ddof=1))
+    normal = NormalDist()
+    z = normal.inv_cdf(tail)
+    parametric_var = -(mu + z * sigma)
+    parametric_cvar = -(mu - sigma * normal.pdf(z) / tail)
+
+    def result(var: float, cvar: float) -> Dict:
+        return {"var": var, "cvar": cvar, "var_amount": var * value, "cvar_amount": cvar * value}
+
+    return {
+        "historical": result(historical_var, historical_cvar),
+        "parametric": result(parametric_var, parametric_cvar),
+    }
+
+
+def compute_risk(
+    symbols: Sequence[str],
+    market_values: Sequence[float],
+    benchmark: str,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    confidence: float = 0.95,
+    store: BarStore = bar_store
+) -> Dict:
+    """
+    Risk figures for positions with the given market values (one per symbol,
+    symbols unique and upper-cased) against a benchmark symbol.
+    Returns a dict; "observations" is 0 when there is not enough history.
+    """
+    symbols = list(symbols)
+    values = np.asarray(market_values, dtype=float)
+    total = float(values.sum())
+    result = {
+        "benchmark": benchmark,
+        "start_date": start,
+        "end_date": end,
+        "observations": 0,
+        "confidence": confidence,
+        "total_value": total,
+        "volatility_annualized": None,
+        "beta": None,
+        "value_at_risk": None,
+        "holdings": [],
+        "correlation": {"symbols": symbols, "matrix": []},
+        "missing_symbols": [],
+    }
+    if not symbols or total <= 0:
+        return result
+
+    dates, prices = store.read_matrix(symbols + [benchmark], start, end, column="adj_close")
+    if len(dates) < 3:
+        result["missing_symbols"] = symbols
+        return result
+    returns = _daily_returns(prices)
+    holding_returns, benchmark_returns = returns[:, :-1], returns[:, -1]
+    result["missing_symbols"] = [s for s, has in zip(symbols, np.any(~np.isnan(holding_returns), axis=0)) if not has]
+
+    weights = values / total
+    portfolio, traded = _weighted_returns(holding_returns, weights)
+    if len(portfolio) < 2:
+        return result
+
+    portfolio_beta = _betas(portfolio[:, None], benchmark_returns[traded])[0]
+    volatilities = _annualized_volatility(holding_returns)
+    betas = _betas(holding_returns, benchmark_returns)
+    corr = correlation_matrix(holding_returns)
+
+    def clean(x: float) -> Optional[float]:
+        return None if np.isnan(x) else float(x)
+
+    result.update({
+        "start_date": dates[0].astype(date),
+        "end_date": dates[-1].astype(date),
+        "observations": int(len(portfolio)),
+        "volatility_annualized": float(portfolio.std(ddof=1) * np.sqrt(TRADING_DAYS)),
+        "beta": clean(portfolio_beta),
+        "value_at_risk": _value_at_risk(portfolio, confidence, total),
+        "holdings": [
+            {
+                "symbol": symbol,
+                "weight": float(weights[j]),
+                "volatility_annualized": clean(volatilities[j]),
+                "beta": clean(betas[j]),
+            }
+            for j, symbol in enumerate(symbols)
+        ],
+        "correlation": {
+            "symbols": symbols,
+            "matrix": np.where(np.isnan(corr), None, np.round(corr, 4)).tolist(),
+        },
+    })
+    return result
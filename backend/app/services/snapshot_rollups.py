@@ -0,0 +1,316 @@
+"""
+Hourly, daily and weekly rollups of portfolio snapshots.
+Each flushed batch of snapshots is folded into the open/high/low/close rows of
+its hour, day and week buckets (UTC; weeks start on Monday), so rollups stay
+current without rescanning raw rows. Compaction deletes raw snapshots older than
+SNAPSHOT_RAW_RETENTION_DAYS (rebuilding their buckets from them first: one GROUP BY
+per tier on PostgreSQL, aggregate() one portfolio at a time elsewhere) and hourly
+rollups older than SNAPSHOT_HOURLY_RETENTION_DAYS; on PostgreSQL, monthly
+snapshot partitions that are wholly expired are detached and dropped rather than
+emptied row by row; daily and weekly rollups are
+kept indefinitely. Long performance ranges read the coarsest tier that still
+yields enough points.
+"""
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import case, delete, func, literal, select, text
+from sqlalchemy.dialects.postgresql import aggregate_order_by, array_agg, insert
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.portfolio_snapshot import PortfolioSnapshot, PortfolioSnapshotRollup
+
+
+TIERS: Dict[str, timedelta] = {
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+    "week": timedelta(weeks=1),
+}
+
+# Monthly partitions created by ensure_portfolio_snapshot_partitions() (migration b5f3a1c8d920)
+PARTITION_NAME = re.compile(r"^portfolio_snapshots_(\d{4})_(\d{2})$")
+
+
+def _as_utc(value: datetime) -> datetime:
+    return value.astimezone(timezone.utc) if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def bucket_start(moment: datetime, tier: str) -> datetime:
+    """Start of the UTC bucket containing `moment`."""
+    moment = _as_utc(moment)
+    if tier == "hour":
+        return moment.replace(minute=0, second=0, microsecond=0)
+    day = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if tier == "day":
+        return day
+    if tier == "week":
+        return day - timedelta(days=day.weekday())
+    raise ValueError(f"Unknown rollup tier: {tier}")
+
+
+def aggregate(snapshots: Iterable[Dict], tiers: Iterable[str] = TIERS) -> List[Dict]:
+    """
+    Fold snapshot rows (dicts with portfolio_id, snapshot_date and the total_* fields)
+    into one rollup row per (portfolio, tier, bucket).
+    """
+    tiers = list(tiers)
+    buckets: Dict[Tuple[int, str, datetime], Dict] = {}
+    for snapshot in sorted(snapshots, key=lambda s: _as_utc(s["snapshot_date"])):
+        taken_at = _as_utc(snapshot["snapshot_date"])
+        value = snapshot["total_value"]
+        gain_loss = snapshot["total_gain_loss"]
+        for tier in tiers:
+            key = (snapshot["portfolio_id"], tier, bucket_start(taken_at, tier))
+            row = buckets.get(key)
+            if row is None:
+                buckets[key] = row = {
+                    "portfolio_id": key[0],
+                    "tier": tier,
+                    "bucket_start": key[2],
+                    "first_at": taken_at,
+                    "open_value": value,
+                    "high_value": value,
+                    "low_value": value,
+                    "high_gain_loss": gain_loss,
+                    "low_gain_loss": gain_loss,
+                    "sample_count": 0,
+                }
+            row["last_at"] = taken_at
+            row["close_value"] = value
+            row["close_cost_basis"] = snapshot["total_cost_basis"]
+            row["close_gain_loss"] = gain_loss
+            row["close_gain_loss_percent"] = snapshot["total_gain_loss_percent"]
+            row["high_value"] = max(row["high_value"], value)
+            row["low_value"] = min(row["low_value"], value)
+            row["high_gain_loss"] = max(row["high_gain_loss"], gain_loss)
+            row["low_gain_loss"] = min(row["low_gain_loss"], gain_loss)
+            row["sample_count"] += 1
+    return list(buckets.values())
+
+
+def _higher(a, b):
+    return case((b > a, b), else_=a)
+
+
+def _lower(a, b):
+    return case((b < a, b), else_=a)
+
+
+def upsert_rollups(db: Session, rollups: List[Dict], replace: bool = False) -> int:
+    """
+    Write rollup rows in one INSERT ... ON CONFLICT statement.
+    By default a row is merged into the stored bucket (open/close follow the
+    earliest/latest sample, high/low widen, counts add up); with replace=True it
+    overwrites it. The caller commits.
+    """
+    if not rollups:
+        return 0
+    stmt = insert(PortfolioSnapshotRollup).values(rollups)
+    new = stmt.excluded
+    table = PortfolioSnapshotRollup
+    if replace:
+        updates = {c: getattr(new, c) for c in rollups[0] if c not in ("portfolio_id", "tier", "bucket_start")}
+    else:
+        earlier = new.first_at < table.first_at
+        later = new.last_at >= table.last_at
+        updates = {
+            "first_at": case((earlier, new.first_at), else_=table.first_at),
+            "open_value": case((earlier, new.open_value), else_=table.open_value),
+            "last_at": case((later, new.last_at), else_=table.last_at),
+            "close_value": case((later, new.close_value), else_=table.close_value),
+            "close_cost_basis": case((later, new.close_cost_basis), else_=table.close_cost_basis),
+            "close_gain_loss": case((later, new.close_gain_loss), else_=table.close_gain_loss),
+            "close_gain_loss_percent": case((later, new.close_gain_loss_percent), else_=table.close_gain_loss_percent),
+            "high_value": _higher(table.high_value, new.high_value),
+            "low_value": _lower(table.low_value, new.low_value),
+            "high_gain_loss": _higher(table.high_gain_loss, new.high_gain_loss),
+            "low_gain_loss": _lower(table.low_gain_loss, new.low_gain_loss),
+            "sample_count": table.sample_count + new.sample_count,
+        }
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.portfolio_id, table.tier, table.bucket_start],
+        set_=updates
+    )
+    db.execute(stmt)
+    return len(rollups)
+
+
+def _rebuild_statement(tier: str, before: datetime, buckets_from: Optional[datetime] = None):
+    """
+    INSERT ... SELECT that rebuilds the `tier` buckets of every raw snapshot taken
+    before `before` (only buckets starting at or after `buckets_from`, if given),
+    replacing the stored rows. Aggregates in the database, the same way aggregate()
+    does: date_trunc weeks start on Monday, like bucket_start().
+    """
+    snapshot = PortfolioSnapshot
+    taken_at = snapshot.snapshot_date
+    bucket = func.timezone("UTC", func.date_trunc(tier, func.timezone("UTC", taken_at)))
+
+    def first(column):
+        return array_agg(aggregate_order_by(column, taken_at.asc()))[1]
+
+    def last(column):
+        return array_agg(aggregate_order_by(column, taken_at.desc()))[1]
+
+    conditions = [taken_at < before]
+    if buckets_from is not None:
+        conditions.append(bucket >= buckets_from)
+    columns = {
+        "portfolio_id": snapshot.portfolio_id,
+        "tier": literal(tier),
+        "bucket_start": bucket,
+        "first_at": func.min(taken_at),
+        "last_at": func.max(taken_at),
+        "open_value": first(snapshot.total_value),
+        "high_value": func.max(snapshot.total_value),
+        "low_value": func.min(snapshot.total_value),
+        "close_value": last(snapshot.total_value),
+        "close_cost_basis": last(snapshot.total_cost_basis),
+        "close_gain_loss": last(snapshot.total_gain_loss),
+        "close_gain_loss_percent": last(snapshot.total_gain_loss_percent),
+        "high_gain_loss": func.max(snapshot.total_gain_loss),
+        "low_gain_loss": func.min(snapshot.total_gain_loss),
+        "sample_count": func.count(),
+    }
+    query = select(*[value.label(name) for name, value in columns.items()]).where(*conditions).group_by(
+        snapshot.portfolio_id, bucket
+    )
+
+    stmt = insert(PortfolioSnapshotRollup).from_select(list(columns), query)
+    return stmt.on_conflict_do_update(
+        index_elements=[PortfolioSnapshotRollup.portfolio_id, PortfolioSnapshotRollup.tier, PortfolioSnapshotRollup.bucket_start],
+        set_={c: getattr(stmt.excluded, c) for c in columns if c not in ("portfolio_id", "tier", "bucket_start")}
+    )
+
+
+def _rebuild_in_python(db: Session, before: datetime, hourly_from: datetime) -> int:
+    """
+    Portable rebuild for databases without the PostgreSQL aggregates (SQLite):
+    each portfolio's snapshots taken before `before` go through aggregate() in
+    turn, so only one portfolio's expiring rows are in memory at a time.
+    """
+    portfolio_ids = [
+        portfolio_id for (portfolio_id,) in db.query(PortfolioSnapshot.portfolio_id).filter(
+            PortfolioSnapshot.snapshot_date < before
+        ).distinct().all()
+    ]
+    rebuilt = 0
+    for portfolio_id in portfolio_ids:
+        expiring = db.query(
+            PortfolioSnapshot.portfolio_id,
+            PortfolioSnapshot.total_value,
+            PortfolioSnapshot.total_cost_basis,
+            PortfolioSnapshot.total_gain_loss,
+            PortfolioSnapshot.total_gain_loss_percent,
+            PortfolioSnapshot.snapshot_date
+        ).filter(
+            PortfolioSnapshot.portfolio_id == portfolio_id,
+            PortfolioSnapshot.snapshot_date < before
+        ).all()
+        rollups = [
+            r for r in aggregate(row._asdict() for row in expiring)
+            if r["tier"] != "hour" or r["bucket_start"] >= hourly_from
+        ]
+        rebuilt += upsert_rollups(db, rollups, replace=True)
+    return rebuilt
+
+
+def drop_expired_partitions(db: Session, before: datetime) -> int:
+    """
+    Detach and drop the monthly portfolio_snapshots partitions whose month ends at
+    or before `before`. Returns how many went (0 unless partitioned PostgreSQL).
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return 0
+    names = db.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass('portfolio_snapshots')"
+    )).scalars().all()
+    dropped = 0
+    for name in sorted(names):
+        match = PARTITION_NAME.match(name)
+        if match is None:
+            continue
+        year, month = int(match.group(1)), int(match.group(2))
+        month_end = datetime(year + month // 12, month % 12 + 1, 1, tzinfo=timezone.utc)
+        if month_end <= before:
+            db.execute(text(f'ALTER TABLE portfolio_snapshots DETACH PARTITION "{name}"'))
+            db.execute(text(f'DROP TABLE "{name}"'))
+            dropped += 1
+    return dropped
+
+
+def compact(db: Session, now: Optional[datetime] = None) -> Dict[str, int]:
+    """
+    Apply the retention policy. Raw snapshots are cut off at a week boundary so
+    every bucket they belong to is rebuilt from complete data before they go.
+    The caller commits.
+    """
+    now = _as_utc(now or datetime.now(timezone.utc))
+    raw_cutoff = bucket_start(now - timedelta(days=settings.SNAPSHOT_RAW_RETENTION_DAYS), "week")
+    hourly_cutoff = now - timedelta(days=settings.SNAPSHOT_HOURLY_RETENTION_DAYS)
+
+    if db.get_bind().dialect.name == "postgresql":
+        buckets_rebuilt = 0
+        for tier in TIERS:
+            buckets_rebuilt += db.execute(
+                _rebuild_statement(tier, raw_cutoff, hourly_cutoff if tier == "hour" else None)
+            ).rowcount
+    else:
+        buckets_rebuilt = _rebuild_in_python(db, raw_cutoff, hourly_cutoff)
+
+    # Whole expired months go with their partition; the rest (the month the
+    # cutoff falls in, the default partition) row by row
+    partitions_dropped = drop_expired_partitions(db, raw_cutoff)
+    raw_deleted = db.execute(
+        delete(PortfolioSnapshot).where(PortfolioSnapshot.snapshot_date < raw_cutoff)
+    ).rowcount
+    hourly_deleted = db.execute(
+        delete(PortfolioSnapshotRollup).where(
+            PortfolioSnapshotRollup.tier == "hour",
+            PortfolioSnapshotRollup.bucket_start < hourly_cutoff
+        )
+    ).rowcount
+    return {
+        "raw_deleted": raw_deleted,
+        "partitions_dropped": partitions_dropped,
+        "hourly_deleted": hourly_deleted,
+        "buckets_rebuilt": buckets_rebuilt,
+    }
+
+
+def choose_tier(days: float, max_points: int) -> str:
+    """
+    The coarsest source ('week', 'day', 'hour' or 'raw') that still has at least
+    max_points buckets over the range; failing that, the finest one whose
+    retention covers the range.
+    """
+    retention = {
+        "raw": settings.SNAPSHOT_RAW_RETENTION_DAYS,
+        "hour": settings.SNAPSHOT_HOURLY_RETENTION_DAYS,
+        "day": None,
+        "week": None,
+    }
+    covering = [t for t in ("week", "day", "hour", "raw") if retention[t] is None or days <= retention[t]]
+    for tier in covering:
+        if tier != "raw" and days * timedelta(days=1) / TIERS[tier] >= max_points:
+            return tier
+    return covering[-1]
+
+
+def load_rollups(db: Session, portfolio_id: int, tier: str, since: datetime) -> List:
+    """Rollup rows of one tier whose bucket overlaps [since, now), oldest first."""
+    return db.query(
+        PortfolioSnapshotRollup.bucket_start,
+        PortfolioSnapshotRollup.open_value,
+        PortfolioSnapshotRollup.high_value,
+        PortfolioSnapshotRollup.low_value,
+        PortfolioSnapshotRollup.close_value,
+        PortfolioSnapshotRollup.close_cost_basis,
+        PortfolioSnapshotRollup.close_gain_loss,
+        PortfolioSnapshotRollup.close_gain_loss_percent
+    ).filter(
+        PortfolioSnapshotRollup.portfolio_id == portfolio_id,
+        PortfolioSnapshotRollup.tier == tier,
+        PortfolioSnapshotRollup.bucket_start >= bucket_start(since, tier)
+    ).order_by(PortfolioSnapshotRollup.bucket_start.asc()).all()
@@ -0,0 +1,251 @@
+"""
+Buffered portfolio snapshot writer.
+Summary requests hand their totals to the writer instead of inserting a row. At
+most one snapshot per portfolio is kept per SNAPSHOT_MIN_INTERVAL_SECONDS; the
+rest are dropped. Accepted snapshots are buffered and written in one batched
+INSERT every SNAPSHOT_FLUSH_INTERVAL_SECONDS (sooner once SNAPSHOT_FLUSH_BATCH_SIZE
+are waiting) by a task started in the app lifespan, and flushed on shutdown.
+A failed flush keeps its batch for the next one, up to SNAPSHOT_MAX_PENDING
+buffered snapshots; past that the oldest are dropped (and counted).
+Each flush also folds the batch into the hourly/daily/weekly rollups, and the
+same task runs rollup compaction every SNAPSHOT_COMPACT_INTERVAL_SECONDS
+(see snapshot_rollups.py) and, on PostgreSQL, creates the monthly
+portfolio_snapshots partitions for the next SNAPSHOT_PARTITION_MONTHS_AHEAD months.
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from sqlalchemy import func, insert, text
+from app.core.config import settings
+from app.core.database import SessionLocal, engine
+from app.models.portfolio_snapshot import PortfolioSnapshot
+from app.services.snapshot_rollups import aggregate, compact, upsert_rollups
+
+
+def _as_utc(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def _load_recent(since: datetime) -> Dict[int, datetime]:
+    """Latest snapshot time per portfolio, for snapshots taken since `since`."""
+    db = SessionLocal()
+    try:
+        rows = db.query(
+            PortfolioSnapshot.portfolio_id,
+            func.max(PortfolioSnapshot.snapshot_date)
+        ).filter(PortfolioSnapshot.snapshot_date >= since).group_by(PortfolioSnapshot.portfolio_id).all()
+        return {portfolio_id: _as_utc(taken_at) for portfolio_id, taken_at in rows}
+    finally:
+        db.close()
+
+
+def _write(rows: List[Dict]) -> None:
+    db = SessionLocal()
+    try:
+        db.execute(insert(PortfolioSnapshot), rows)
+        upsert_rollups(db, aggregate(rows))
+        db.commit()
+    finally:
+        db.close()
+
+
+def _compact() -> Dict[str, int]:
+    db = SessionLocal()
+    try:
+        result = compact(db)
+        db.commit()
+        return result
+    finally:
+        db.close()
+
+
+def _ensure_partitions() -> int:
+    """Create upcoming monthly partitions. Returns how many were created (0 when not partitioned)."""
+    if engine.dialect.name != "postgresql":
+        return 0
+    db = SessionLocal()
+    try:
+        partitioned = db.execute(text(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('portfolio_snapshots')"
+        )).first()
+        if partitioned is None:
+            return 0
+        now = datetime.now(timezone.utc)
+        created = db.execute(
+            text("SELECT ensure_portfolio_snapshot_partitions(:start, :end)"),
+            {"start": now, "end": now + timedelta(days=31 * settings.SNAPSHOT_PARTITION_MONTHS_AHEAD)}
+        ).scalar()
+        db.commit()
+        return created
+    finally:
+        db.close()
+
+
+class SnapshotWriter:
+    def __init__(self, min_interval_seconds: float, flush_interval_seconds: float, batch_size: int, max_pending: int):
+        self.min_interval = timedelta(seconds=min_interval_seconds)
+        self.flush_interval = flush_interval_seconds
+        self.batch_size = max(1, batch_size)
+        self.max_pending = max(self.batch_size, max_pending)
+        self._last_taken: Dict[int, datetime] = {}
+        self._pending: List[Dict] = []
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._inflight: Optional[asyncio.Future] = None
+        self.recorded = 0
+        self.deduplicated = 0
+        self.written = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.dropped = 0
+        self.last_compaction: Optional[Dict] = None
+        self.partitions_created = 0
+
+    def record(self, portfolio_id: int, totals: Dict, taken_at: Optional[datetime] = None) -> bool:
+        """
+        Offer a snapshot of a portfolio's totals (as returned by the valuation).
+        Returns False when one was already taken within the minimum interval.
+        """
+        taken_at = taken_at or datetime.now(timezone.utc)
+        last = self._last_taken.get(portfolio_id)
+        if last is not None and taken_at - last < self.min_interval:
+            self.deduplicated += 1
+            return False
+
+        self._last_taken[portfolio_id] = taken_at
+        self._pending.append({
+            "portfolio_id": portfolio_id,
+            "total_value": round(totals["total_market_value"], 2),
+            "total_cost_basis": round(totals["total_cost_basis"], 2),
+            "total_gain_loss": round(totals["total_gain_loss"], 2),
+            "total_gain_loss_percent": round(totals["total_gain_loss_percent"], 2),
+            "snapshot_date": taken_at,
+        })
+        self._trim_pending()
+        self.recorded += 1
+        if len(self._pending) >= self.batch_size and self._wake is not None:
+            self._wake.set()
+        return True
+
+    async def flush(self) -> int:
+        """Write every buffered snapshot in one INSERT. Returns the number written."""
+        if not self._pending:
+            return 0
+        batch, self._pending = self._pending, []
+        # The thread can't be stopped once started, so if we're cancelled mid-write
+        # it carries on and its outcome is settled when it finishes instead.
+        write = asyncio.ensure_future(asyncio.to_thread(_write, batch))
+        write.add_done_callback(lambda done: self._settle(done, batch))
+        self._inflight = write
+        try:
+            await asyncio.shield(write)
+        except Exception:
+            return 0
+        return len(batch)
+
+    def _settle(self, write: asyncio.Future, batch: List[Dict]) -> None:
+        error = write.exception()
+        if error is not None:
+            print(f"Error writing {len(batch)} portfolio snapshots ({self.dropped} dropped so far): {error}")
+            self.failed_flushes += 1
+            # Keep them for the next flush, within the cap.
+            self._pending = batch + self._pending
+            self._trim_pending()
+            return
+        self.flushes += 1
+        self.written += len(batch)
+
+    def _trim_pending(self) -> None:
+        """Drop the oldest buffered snapshots past max_pending."""
+        excess = len(self._pending) - self.max_pending
+        if excess > 0:
+            del self._pending[:excess]
+            self.dropped += excess
+
+    async def compact(self) -> Optional[Dict]:
+        """Apply the snapshot retention policy now."""
+        try:
+            result = await asyncio.to_thread(_compact)
+        except Exception as e:
+            print(f"Error compacting portfolio snapshots: {e}")
+            return None
+        self.last_compaction = {**result, "at": datetime.now(timezone.utc).isoformat()}
+        return result
+
+    async def ensure_partitions(self) -> None:
+        try:
+            self.partitions_created += await asyncio.to_thread(_ensure_partitions)
+        except Exception as e:
+            print(f"Error creating portfolio snapshot partitions: {e}")
+
+    async def _run(self) -> None:
+        try:
+            recent = await asyncio.to_thread(_load_recent, datetime.now(timezone.utc) - self.min_interval)
+            for portfolio_id, taken_at in recent.items():
+                if portfolio_id not in self._last_taken or self._last_taken[portfolio_id] < taken_at:
+                    self._last_taken[portfolio_id] = taken_at
+        except Exception as e:
+            print(f"Error loading recent portfolio snapshots: {e}")
+
+        next_compaction = time.monotonic()
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+            self._forget_expired()
+            if time.monotonic() >= next_compaction:
+                await self.ensure_partitions()
+                await self.compact()
+                next_compaction = time.monotonic() + settings.SNAPSHOT_COMPACT_INTERVAL_SECONDS
+
+    def _forget_expired(self) -> None:
+        """Drop dedupe entries older than the interval so the map doesn't grow with every portfolio ever seen."""
+        cutoff = datetime.now(timezone.utc) - self.min_interval
+        for portfolio_id in [p for p, taken_at in self._last_taken.items() if taken_at < cutoff]:
+            del self._last_taken[portfolio_id]
+
+    def start(self) -> asyncio.Task:
+        """Start the flush loop. Called from the app lifespan."""
+        if self._task is None or self._task.done():
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+        return self._task
+
+    async def close(self) -> None:
+        """Stop the flush loop and write whatever is still buffered."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._inflight is not None and not self._inflight.done():
+            await asyncio.wait([self._inflight])
+        await self.flush()
+
+    def stats(self) -> Dict:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "pending": len(self._pending),
+            "recorded": self.recorded,
+            "deduplicated": self.deduplicated,
+            "written": self.written,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "dropped": self.dropped,
+            "last_compaction": self.last_compaction,
+            "partitions_created": self.partitions_created,
+        }
+
+
+snapshot_writer = SnapshotWriter(
+    min_interval_seconds=settings.SNAPSHOT_MIN_INTERVAL_SECONDS,
+    flush_interval_seconds=settings.SNAPSHOT_FLUSH_INTERVAL_SECONDS,
+    batch_size=settings.SNAPSHOT_FLUSH_BATCH_SIZE,
+    max_pending=settings.SNAPSHOT_MAX_PENDING
+)
@@ -0,0 +1,159 @@
+"""
+Portfolio valuation.
+Holdings are loaded into NumPy arrays and cost basis, market value, gain/loss
+and allocation are computed for every position in one vectorized pass. The same
+pass serves a single portfolio or many at once (totals are grouped by portfolio).
+
+A position is valued at the fresh price when one is given, else at its stored
+current_price, else at its average cost.
+"""
+from typing import Dict, Iterable, List, Optional, Sequence
+import numpy as np
+
+
+def _value(
+    quantity: np.ndarray,
+    average_cost: np.ndarray,
+    price: np.ndarray,
+    group: np.ndarray,
+    groups: int
+) -> Dict[str, np.ndarray]:
+    """Per-position and per-group figures. `price` is NaN where a position has no price."""
+    cost_basis = quantity * average_cost
+    market_value = quantity * np.where(np.isnan(price), average_cost, price)
+    gain_loss = market_value - cost_basis
+    with np.errstate(divide="ignore", invalid="ignore"):
+        gain_loss_percent = np.where(cost_basis > 0, gain_loss / cost_basis * 100, 0.0)
+
+    total_cost_basis = np.bincount(group, weights=cost_basis, minlength=groups)
+    total_market_value = np.bincount(group, weights=market_value, minlength=groups)
+    total_gain_loss = total_market_value - total_cost_basis
+    with np.errstate(divide="ignore", invalid="ignore"):
+        total_gain_loss_percent = np.where(
+            total_cost_basis > 0, total_gain_loss / total_cost_basis * 100, 0.0
+        )
+        group_value = total_market_value[group]
+        allocation = np.where(group_value > 0, market_value / group_value * 100, 0.0)
+
+    return {
+        "cost_basis": cost_basis,
+        "market_value": market_value,
+        "gain_loss": gain_loss,
+        "gain_loss_percent": gain_loss_percent,
+        "allocation": allocation,
+        "total_cost_basis": total_cost_basis,
+        "total_market_value": total_market_value,
+        "total_gain_loss": total_gain_loss,
+        "total_gain_loss_percent": total_gain_loss_percent,
+    }
+
+
+def _price_array(holdings: Sequence, prices: Dict[str, Optional[float]]) -> np.ndarray:
+    """Fresh price where known, else the stored current_price, else NaN."""
+    return np.fromiter(
+        (prices.get(h.symbol.upper()) or h.current_price or np.nan for h in holdings),
+        dtype=float,
+        count=len(holdings)
+    )
+
+
+def _totals(values: Dict[str, np.ndarray], index: int, holdings: int) -> Dict:
+    return {
+        "total_holdings": holdings,
+        "total_cost_basis": float(values["total_cost_basis"][index]),
+        "total_market_value": float(values["total_market_value"][index]),
+        "total_gain_loss": float(values["total_gain_loss"][index]),
+        "total_gain_loss_percent": float(values["total_gain_loss_percent"][index]),
+    }
+
+
+def value_holdings(holdings: Sequence, prices: Optional[Dict[str, Optional[float]]] = None) -> Dict:
+    """
+    Value the holdings of one portfolio.
+    `holdings` are Holding rows (or anything with symbol, quantity, average_cost
+    and current_price); `prices` maps upper-cased symbols to fresh prices.
+    Returns per-position arrays aligned with `holdings` ("current_price" is NaN
+    where unpriced) plus a "totals" dict.
+    """
+    prices = prices or {}
+    n = len(holdings)
+    quantity = np.fromiter((h.quantity for h in holdings), dtype=float, count=n)
+    average_cost = np.fromiter((h.average_cost for h in holdings), dtype=float, count=n)
+    price = _price_array(holdings, prices)
+
+    values = _value(quantity, average_cost, price, np.zeros(n, dtype=np.intp), 1)
+    values["current_price"] = price
+    values["totals"] = _totals(values, 0, n)
+    return values
+
+
+def value_portfolios(
+    holdings: Iterable,
+    prices: Optional[Dict[str, Optional[float]]] = None,
+    portfolio_ids: Optional[Iterable[int]] = None
+) -> Dict[int, Dict]:
+    """
+    Totals for many portfolios in one pass.
+    `holdings` may span portfolios (each row needs portfolio_id). Portfolios listed
+    in `portfolio_ids` but holding nothing get zero totals.
+    Returns {portfolio_id: totals}.
+    """
+    holdings = list(holdings)
+    ids = np.fromiter((h.portfolio_id for h in holdings), dtype=np.int64, count=len(holdings))
+    wanted = np.asarray(sorted(set(portfolio_ids or ())), dtype=np.int64)
+    keys, group = np.unique(np.concatenate([ids, wanted]), return_inverse=True)
+    group = group[:len(holdings)]
+
+    quantity = np.fromiter((h.quantity for h in holdings), dtype=float, count=len(holdings))
+    average_cost = np.fromiter((h.average_cost for h in holdings), dtype=float, count=len(holdings))
+    values = _value(quantity, average_cost, _price_array(holdings, prices or {}), group, len(keys))
+    counts = np.bincount(group, minlength=len(keys))
+
+    return {int(key): _totals(values, i, int(counts[i])) for i, key in enumerate(keys)}
+
+
+def allocation_rows(symbols: List[str], values: Dict) -> List[Dict]:
+    """Asset allocation entries for positions with a market value, as the API returns them."""
+    return [
+        {"symbol": symbol, "allocation": round(float(allocation), 2), "value": float(value)}
+        for symbol, allocation, value in zip(symbols, values["allocation"], values["market_value"])
+        if value
+    ]
+
+
+def value_exposure(holdings: Sequence, prices: Optional[Dict[str, Optional[float]]] = None) -> List[Dict]:
+    """
+    Consolidated exposure per symbol across every given holding (any portfolio):
+    quantity, cost basis, market value, share of the combined market value and
+    the number of portfolios holding it. Largest exposure first.
+    """
+    n = len(holdings)
+    if not n:
+        return []
+    symbols, group = np.unique([h.symbol.upper() for h in holdings], return_inverse=True)
+    quantity = np.fromiter((h.quantity for h in holdings), dtype=float, count=n)
+    average_cost = np.fromiter((h.average_cost for h in holdings), dtype=float, count=n)
+    price = _price_array(holdings, prices or {})
+    values = _value(quantity, average_cost, price, np.zeros(n, dtype=np.intp), 1)
+
+    groups = len(symbols)
+    total_quantity = np.bincount(group, weights=quantity, minlength=groups)
+    cost_basis = np.bincount(group, weights=values["cost_basis"], minlength=groups)
+    market_value = np.bincount(group, weights=values["market_value"], minlength=groups)
+    total = market_value.sum()
+    portfolio_ids = np.fromiter((h.portfolio_id for h in holdings), dtype=np.int64, count=n)
+    held_in = np.unique(np.stack([group, portfolio_ids]), axis=1)[0]
+    portfolios = np.bincount(held_in, minlength=groups)
+
+    order = np.argsort(-market_value, kind="stable")
+    return [
+        {
+            "symbol": str(symbols[i]),
+            "quantity": float(total_quantity[i]),
+            "cost_basis": float(cost_basis[i]),
+            "market_value": float(market_value[i]),
+            "allocation": round(float(market_value[i] / total * 100), 2) if total > 0 else 0.0,
+            "portfolios": int(portfolios[i]),
+        }
+        for i in order
+    ]
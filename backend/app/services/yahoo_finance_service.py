@@ -1,41 +1,62 @@
+import asyncio
 import httpx
-from typing import Optional, Dict
-import json
+import numpy as np
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional, Dict, List
+from app.core.config import settings
+from app.core.http_client import get_http_client
 
 
-async def get_stock_quote(symbol: str) -> Optional[Dict]:
+CHART_URL = settings.YAHOO_QUERY1_URL + "/v8/finance/chart/{symbol}"
+MULTI_QUOTE_URL = settings.YAHOO_QUERY1_URL + "/v7/finance/quote"
+
+
+def _build_quote(symbol: str, price, previous_close, volume, market_cap, currency) -> Dict:
+    """Normalize raw Yahoo fields into the quote dict used across the app."""
+    return {
+        "symbol": symbol.upper(),
+        "price": price,
+        "previous_close": previous_close,
+        "change": (price or 0) - (previous_close or 0),
+        "change_percent": (((price or 0) - previous_close) / previous_close) * 100 if previous_close else 0,
+        "volume": volume,
+        "market_cap": market_cap,
+        "currency": currency or "USD"
+    }
+
+
+async def get_stock_quote(symbol: str, client: Optional[httpx.AsyncClient] = None) -> Optional[Dict]:
     """
     Fetch real-time stock data from Yahoo Finance API (using yfinance-like endpoint).
     This uses a public Yahoo Finance API endpoint.
+    Uses the shared pooled client unless one is passed in.
     """
+    client = client or get_http_client()
     try:
-        url = f"https://query1.finance.yahoo.com/v8/finance/chart/{symbol.upper()}"
+        url = CHART_URL.format(symbol=symbol.upper())
         params = {
             "interval": "1d",
             "range": "1d"
         }
-        
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(url, params=params)
-            if response.status_code == 200:
-                data = response.json()
-                if "chart" in data and "result" in data["chart"] and len(data["chart"]["result"]) > 0:
-                    result = data["chart"]["result"][0]
-                    meta = result.get("meta", {})
-                    
-                    return {
-                        "symbol": symbol.upper(),
-                        "price": meta.get("regularMarketPrice"),
-                        "previous_close": meta.get("previousClose"),
-                        "change": meta.get("regularMarketPrice", 0) - meta.get("previousClose", 0),
-                        "change_percent": ((meta.get("regularMarketPrice", 0) - meta.get("previousClose", 0)) / meta.get("previousClose", 1)) * 100 if meta.get("previousClose") else 0,
-                        "volume": meta.get("regularMarketVolume"),
-                        "market_cap": meta.get("marketCap"),
-                        "currency": meta.get("currency", "USD")
-                    }
+
+        response = await client.get(url, params=params)
+        if response.status_code == 200:
+            data = response.json()
+            if "chart" in data and data["chart"].get("result"):
+                result = data["chart"]["result"][0]
+                meta = result.get("meta", {})
+
+                return _build_quote(
+                    symbol,
+                    meta.get("regularMarketPrice"),
+                    meta.get("previousClose"),
+                    meta.get("regularMarketVolume"),
+                    meta.get("marketCap"),
+                    meta.get("currency")
+                )
     except Exception as e:
         print(f"Error fetching Yahoo Finance data for {symbol}: {e}")
-    
+
     return None
 
 
@@ -45,12 +66,125 @@ async def get_stock_price(symbol: str) -> Optional[float]:
     return quote.get("price") if quote else None
 
 
-async def get_multiple_stock_quotes(symbols: list) -> Dict[str, Dict]:
-    """Fetch quotes for multiple symbols."""
+async def get_daily_bars(symbol: str, start: date, client: Optional[httpx.AsyncClient] = None) -> Optional[Dict[str, np.ndarray]]:
+    """
+    Fetch completed daily OHLCV bars from `start` up to yesterday (exchange-local).
+    Returns column arrays keyed date/open/high/low/close/adj_close/volume, plus
+    "action_dates": the dates of splits and dividends in the window (Yahoo adjusts
+    the history before them), or None on failure.
+    """
+    client = client or get_http_client()
+    try:
+        period1 = int(datetime.combine(start, datetime.min.time(), tzinfo=timezone.utc).timestamp())
+        period2 = int(datetime.now(timezone.utc).timestamp())
+        response = await client.get(
+            CHART_URL.format(symbol=symbol.upper()),
+            params={"interval": "1d", "period1": period1, "period2": period2, "events": "div,splits"}
+        )
+        if response.status_code != 200:
+            return None
+        results = response.json().get("chart", {}).get("result") or []
+        if not results or not results[0].get("timestamp"):
+            return None
+        result = results[0]
+        gmtoffset = result.get("meta", {}).get("gmtoffset", 0) or 0
+        quote = (result.get("indicators", {}).get("quote") or [{}])[0]
+        adjclose = (result.get("indicators", {}).get("adjclose") or [{}])[0].get("adjclose")
+
+        def column(values) -> np.ndarray:
+            return np.array([np.nan if v is None else v for v in (values or [])], dtype="f8")
+
+        timestamps = np.asarray(result["timestamp"], dtype="i8") + gmtoffset
+        bars = {
+            "date": timestamps.astype("M8[s]").astype("M8[D]"),
+            "open": column(quote.get("open")),
+            "high": column(quote.get("high")),
+            "low": column(quote.get("low")),
+            "close": column(quote.get("close")),
+            "volume": column(quote.get("volume")),
+        }
+        bars["adj_close"] = column(adjclose) if adjclose else bars["close"].copy()
+
+        # Drop empty rows and today's bar, which is still forming.
+        today = np.datetime64(datetime.now(timezone.utc) + timedelta(seconds=gmtoffset), "D")
+        keep = ~np.isnan(bars["close"]) & (bars["date"] < today)
+        bars = {name: values[keep] for name, values in bars.items()}
+
+        events = result.get("events") or {}
+        action_times = [
+            int(event["date"]) + gmtoffset
+            for kind in ("splits", "dividends")
+            for event in (events.get(kind) or {}).values()
+            if event.get("date") is not None
+        ]
+        bars["action_dates"] = np.sort(np.asarray(action_times, dtype="i8").astype("M8[s]").astype("M8[D]"))
+        return bars
+    except Exception as e:
+        print(f"Error fetching Yahoo Finance daily bars for {symbol}: {e}")
+
+    return None
+
+
+async def _fetch_quote_batch(client: httpx.AsyncClient, symbols: List[str]) -> Dict[str, Dict]:
+    """
+    Fetch several symbols with a single multi-quote request.
+    Returns whatever the endpoint answered; missing symbols are simply absent.
+    """
     quotes = {}
-    for symbol in symbols:
-        quote = await get_stock_quote(symbol)
-        if quote:
-            quotes[symbol.upper()] = quote
+    try:
+        response = await client.get(MULTI_QUOTE_URL, params={"symbols": ",".join(symbols)})
+        if response.status_code == 200:
+            results = response.json().get("quoteResponse", {}).get("result") or []
+            for item in results:
+                symbol = (item.get("symbol") or "").upper()
+                price = item.get("regularMarketPrice")
+                if not symbol or price is None:
+                    continue
+                quotes[symbol] = _build_quote(
+                    symbol,
+                    price,
+                    item.get("regularMarketPreviousClose"),
+                    item.get("regularMarketVolume"),
+                    item.get("marketCap"),
+                    item.get("currency")
+                )
+    except Exception as e:
+        print(f"Error fetching Yahoo Finance batch quote for {len(symbols)} symbols: {e}")
     return quotes
 
+
+async def get_multiple_stock_quotes(symbols: list) -> Dict[str, Dict]:
+    """
+    Fetch quotes for multiple symbols.
+    Symbols are requested in chunks through the multi-quote endpoint; anything it
+    does not answer is fetched per symbol, with at most QUOTE_FETCH_CONCURRENCY
+    requests in flight. Symbols that fail are left out of the result.
+    """
+    unique_symbols = list(dict.fromkeys(s.upper() for s in symbols if s))
+    if not unique_symbols:
+        return {}
+
+    quotes: Dict[str, Dict] = {}
+    batch_size = max(1, settings.QUOTE_BATCH_SIZE)
+    semaphore = asyncio.Semaphore(max(1, settings.QUOTE_FETCH_CONCURRENCY))
+
+    client = get_http_client()
+
+    if settings.YAHOO_MULTI_QUOTE_ENABLED:
+        chunks = [unique_symbols[i:i + batch_size] for i in range(0, len(unique_symbols), batch_size)]
+        for batch in await asyncio.gather(*(_fetch_quote_batch(client, chunk) for chunk in chunks)):
+            quotes.update(batch)
+
+    async def fetch_one(symbol: str) -> Optional[Dict]:
+        async with semaphore:
+            return await get_stock_quote(symbol, client)
+
+    missing = [s for s in unique_symbols if s not in quotes]
+    results = await asyncio.gather(*(fetch_one(s) for s in missing), return_exceptions=True)
+    for symbol, quote in zip(missing, results):
+        if isinstance(quote, Exception):
+            print(f"Error fetching Yahoo Finance data for {symbol}: {quote}")
+        elif quote:
+            quotes[symbol] = quote
+
+    return quotes
@@ -0,0 +1,60 @@
+"""
+Compare two benchmark result files.
+
+    python -m benchmarks.compare benchmarks/results/<before>.json benchmarks/results/<after>.json
+
+Prints per-endpoint deltas and exits non-zero if any endpoint's p95 got slower
+than the threshold (default 10%), so it can gate a CI job.
+"""
+import argparse
+import json
+import sys
+from typing import Dict, Tuple
+
+
+def _load(path: str) -> Tuple[Dict, Dict[Tuple[str, int], Dict]]:
+    with open(path) as f:
+        report = json.load(f)
+    rows = {(r["endpoint"], r["portfolio_size"]): r for r in report["results"]}
+    return report, rows
+
+
+def _delta(before: float, after: float) -> float:
+    return (after - before) / before * 100 if before else 0.0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0, help="allowed p95 regression in percent")
+    args = parser.parse_args(argv)
+
+    baseline, before = _load(args.baseline)
+    candidate, after = _load(args.candidate)
+    print(f"baseline  {baseline.get('commit', '?')[:12]}  {baseline.get('created_at', '')}")
+    print(f"candidate {candidate.get('commit', '?')[:12]}  {candidate.get('created_at', '')}")
+    print(f"{'endpoint':<12} {'size':>5} {'p50 ms':>18} {'p95 ms':>18} {'p99 ms':>18} {'errors':>9} {'queries':>9}")
+
+    regressions = []
+    for key in sorted(before.keys() & after.keys()):
+        b, a = before[key], after[key]
+        cells = []
+        for metric in ("p50_ms", "p95_ms", "p99_ms"):
+            cells.append(f"{a[metric]:>8.1f} ({_delta(b[metric], a[metric]):+6.1f}%)")
+        queries = f"{b.get('max_queries') or '-'}->{a.get('max_queries') or '-'}"
+        print(f"{key[0]:<12} {key[1]:>5} {' '.join(cells)} {b['errors']:>4}->{a['errors']:<4} {queries:>9}")
+        if _delta(b["p95_ms"], a["p95_ms"]) > args.threshold:
+            regressions.append(key)
+
+    for key in sorted(before.keys() ^ after.keys()):
+        print(f"{key[0]:<12} {key[1]:>5} only in {'baseline' if key in before else 'candidate'}")
+
+    if regressions:
+        print(f"p95 regressed more than {args.threshold}% for: " + ", ".join(f"{e}@{s}" for e, s in regressions))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
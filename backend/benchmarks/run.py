@@ -0,0 +1,270 @@
+"""
+End-to-end latency benchmark.
+
+Boots the upstream stand-ins and the real FastAPI app (both under uvicorn, on
+local ports), seeds one portfolio per requested size, then drives each endpoint
+with a fixed number of requests at a fixed concurrency. Prints a table and writes
+machine-readable results (with the git commit) for benchmarks/compare.py.
+Exits non-zero if any request ran more SQL queries than its route's budget.
+
+Run from backend/ against a throwaway database:
+
+    DATABASE_URL=postgresql://... python -m benchmarks.run --sizes 5,25,100 --yahoo-latency 80
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, List
+
+import httpx
+import numpy as np
+import uvicorn
+
+ENDPOINTS = ["summary", "performance", "news", "sentiments", "chat"]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _serve(app, port: int) -> uvicorn.Server:
+    """Start a uvicorn server in a daemon thread and wait until it accepts requests."""
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="on"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 30
+    while not server.started:
+        if time.monotonic() > deadline or not thread.is_alive():
+            raise RuntimeError(f"server on port {port} failed to start")
+        time.sleep(0.05)
+    return server
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def _configure_environment(stub_url: str, args) -> None:
+    """Point the app at the stand-ins. Must run before anything imports app.core.config."""
+    os.environ["YAHOO_QUERY1_URL"] = stub_url
+    os.environ["YAHOO_QUERY2_URL"] = stub_url
+    os.environ["OPENAI_BASE_URL"] = stub_url + "/v1"
+    os.environ["PLAID_BASE_URL"] = stub_url
+    os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    os.environ["PRICE_REFRESHER_ENABLED"] = "true" if args.refresher else "false"
+    # The stand-ins are local; don't let the upstream guard throttle the load itself.
+    os.environ.setdefault("UPSTREAM_RATE_PER_SECOND", "100000")
+    os.environ.setdefault("UPSTREAM_BURST", "100000")
+    os.environ.setdefault("UPSTREAM_CONCURRENCY_INITIAL", "256")
+    os.environ.setdefault("UPSTREAM_CONCURRENCY_MAX", "1024")
+
+
+def _seed(sizes: List[int]) -> Dict[int, Dict]:
+    """Create one portfolio per size for the development user, replacing earlier benchmark data."""
+    from app.core.database import Base, SessionLocal, engine
+    from app.models import User, Portfolio, Holding, PortfolioSnapshot, PortfolioSnapshotRollup
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        if not db.query(User).filter(User.id == 1).first():
+            db.add(User(id=1, email="benchmark@oneview.local", hashed_password="!", full_name="Benchmark"))
+            db.commit()
+        old = [p.id for p in db.query(Portfolio.id).filter(Portfolio.name.like("benchmark-%")).all()]
+        if old:
+            for model in (PortfolioSnapshotRollup, PortfolioSnapshot, Holding):
+                db.query(model).filter(model.portfolio_id.in_(old)).delete(synchronize_session=False)
+            db.query(Portfolio).filter(Portfolio.id.in_(old)).delete(synchronize_session=False)
+            db.commit()
+
+        seeded = {}
+        for size in sizes:
+            portfolio = Portfolio(user_id=1, name=f"benchmark-{size}")
+            db.add(portfolio)
+            db.flush()
+            symbols = [f"B{i:04d}" for i in range(size)]
+            db.add_all([
+                Holding(portfolio_id=portfolio.id, symbol=s, quantity=10 + i % 7, average_cost=50 + i % 90)
+                for i, s in enumerate(symbols)
+            ])
+            seeded[size] = {"portfolio_id": portfolio.id, "symbol": symbols[0]}
+        db.commit()
+        return seeded
+    finally:
+        db.close()
+
+
+def _request(endpoint: str, target: Dict):
+    pid = target["portfolio_id"]
+    if endpoint == "summary":
+        return "GET", f"/api/v1/portfolios/{pid}/summary", None
+    if endpoint == "performance":
+        return "GET", f"/api/v1/portfolios/{pid}/performance?days=30", None
+    if endpoint == "news":
+        return "GET", f"/api/v1/news/symbol/{target['symbol']}?limit=5", None
+    if endpoint == "sentiments":
+        return "GET", f"/api/v1/news/portfolio/{pid}/sentiments", None
+    if endpoint == "chat":
+        return "POST", f"/api/v1/chatbot/portfolio/{pid}/chat", {"message": "How is my portfolio doing?"}
+    raise ValueError(endpoint)
+
+
+async def _drive(client: httpx.AsyncClient, endpoint: str, target: Dict, requests: int, concurrency: int, warmup: int) -> Dict:
+    method, url, body = _request(endpoint, target)
+    for _ in range(warmup):
+        try:
+            await client.request(method, url, json=body)
+        except httpx.HTTPError:
+            pass
+
+    latencies: List[float] = []
+    errors = 0
+    queries: List[int] = []
+    budget = None
+    queue: asyncio.Queue = asyncio.Queue()
+    for _ in range(requests):
+        queue.put_nowait(None)
+
+    async def worker():
+        nonlocal errors, budget
+        while not queue.empty():
+            queue.get_nowait()
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, url, json=body)
+                if response.status_code >= 400:
+                    errors += 1
+                if "x-query-count" in response.headers:
+                    queries.append(int(response.headers["x-query-count"]))
+                if "x-query-budget" in response.headers:
+                    budget = int(response.headers["x-query-budget"])
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+
+    samples = np.asarray(latencies)
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+    return {
+        "endpoint": endpoint,
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "p50_ms": round(float(p50), 2),
+        "p95_ms": round(float(p95), 2),
+        "p99_ms": round(float(p99), 2),
+        "mean_ms": round(float(samples.mean()), 2),
+        "throughput_rps": round(requests / wall, 2),
+        "max_queries": max(queries) if queries else None,
+        "query_budget": budget,
+    }
+
+
+async def _run(base_url: str, seeded: Dict[int, Dict], args) -> List[Dict]:
+    results = []
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        for size, target in seeded.items():
+            for endpoint in args.endpoints:
+                result = await _drive(client, endpoint, target, args.requests, args.concurrency, args.warmup)
+                result["portfolio_size"] = size
+                results.append(result)
+                print(
+                    f"{endpoint:<12} size={size:<5} p50={result['p50_ms']:>9.2f}ms "
+                    f"p95={result['p95_ms']:>9.2f}ms p99={result['p99_ms']:>9.2f}ms "
+                    f"rps={result['throughput_rps']:>8.2f} errors={result['errors']} "
+                    f"queries={result['max_queries']}/{result['query_budget'] or '-'}"
+                )
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="5,25,100", help="comma-separated portfolio sizes (holdings)")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS), help="comma-separated subset of " + ",".join(ENDPOINTS))
+    parser.add_argument("--requests", type=int, default=100, help="measured requests per endpoint and size")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--yahoo-latency", type=float, default=50.0, help="injected Yahoo latency (ms)")
+    parser.add_argument("--openai-latency", type=float, default=400.0, help="injected OpenAI latency (ms)")
+    parser.add_argument("--plaid-latency", type=float, default=100.0, help="injected Plaid latency (ms)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="uniform extra latency (ms) on every upstream")
+    parser.add_argument("--refresher", action="store_true", help="keep the background price refresher running")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/<commit>.json)")
+    args = parser.parse_args(argv)
+    args.endpoints = [e for e in args.endpoints.split(",") if e]
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+
+    if not os.environ.get("DATABASE_URL"):
+        print("DATABASE_URL must point at a throwaway database", file=sys.stderr)
+        return 2
+
+    from benchmarks.stubs import Fault, create_stub_app
+
+    faults = {
+        "yahoo": Fault(args.yahoo_latency, args.jitter),
+        "openai": Fault(args.openai_latency, args.jitter),
+        "plaid": Fault(args.plaid_latency, args.jitter),
+    }
+    stub_port = _free_port()
+    stub_server = _serve(create_stub_app(faults), stub_port)
+    _configure_environment(f"http://127.0.0.1:{stub_port}", args)
+
+    from app.main import app
+
+    seeded = _seed(sizes)
+    app_port = _free_port()
+    app_server = _serve(app, app_port)
+    try:
+        results = asyncio.run(_run(f"http://127.0.0.1:{app_port}", seeded, args))
+    finally:
+        app_server.should_exit = True
+        stub_server.should_exit = True
+
+    commit = _git_commit()
+    report = {
+        "commit": commit,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "sizes": sizes,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "faults": {name: fault.as_dict() for name, fault in faults.items()},
+            "refresher": args.refresher,
+        },
+        "results": results,
+    }
+    output = args.output or os.path.join(os.path.dirname(__file__), "results", f"{commit[:12]}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"wrote {output}")
+
+    over_budget = [
+        r for r in results
+        if r["query_budget"] is not None and r["max_queries"] is not None and r["max_queries"] > r["query_budget"]
+    ]
+    for r in over_budget:
+        print(f"{r['endpoint']} (size {r['portfolio_size']}) ran {r['max_queries']} queries, budget {r['query_budget']}")
+    return 1 if over_budget else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+"""
+Local stand-ins for Yahoo Finance, OpenAI and Plaid.
+One ASGI app replays the responses in benchmarks/recordings/, personalised per
+symbol so portfolios of any size get distinct prices. Every upstream can be given
+injected latency, jitter and an error rate (e.g. 429s) to exercise the client
+guards. The fault settings can be changed at runtime with POST /_stub/config.
+"""
+import asyncio
+import copy
+import json
+import os
+import random
+import time
+import zlib
+from typing import Dict
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+RECORDINGS_DIR = os.path.join(os.path.dirname(__file__), "recordings")
+
+
+def _load(name: str) -> Dict:
+    with open(os.path.join(RECORDINGS_DIR, name)) as f:
+        return json.load(f)
+
+
+class Fault:
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, error_rate: float = 0.0, error_status: int = 429):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+
+    def as_dict(self) -> Dict:
+        return dict(vars(self))
+
+
+def create_stub_app(faults: Dict[str, Fault]) -> FastAPI:
+    """Build the stand-in app. `faults` maps "yahoo", "openai" and "plaid" to their injected faults."""
+    app = FastAPI(title="Upstream stand-ins")
+    chart = _load("yahoo_chart.json")
+    quote = _load("yahoo_quote.json")
+    search = _load("yahoo_search.json")
+    completions = _load("openai_chat.json")
+    plaid = _load("plaid.json")
+    calls: Dict[str, int] = {"yahoo": 0, "openai": 0, "plaid": 0}
+
+    async def inject(upstream: str):
+        """Apply latency and maybe return an injected error response."""
+        calls[upstream] += 1
+        fault = faults.setdefault(upstream, Fault())
+        delay = fault.latency_ms + random.uniform(0, fault.jitter_ms)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+        if fault.error_rate and random.random() < fault.error_rate:
+            return JSONResponse({"error": "injected"}, status_code=fault.error_status, headers={"Retry-After": "1"})
+        return None
+
+    def price_for(symbol: str) -> float:
+        # Stable per symbol, so repeated runs value portfolios identically.
+        return round(20 + (zlib.crc32(symbol.encode()) % 48000) / 100, 2)
+
+    @app.get("/v8/finance/chart/{symbol}")
+    async def yahoo_chart(symbol: str, request: Request):
+        error = await inject("yahoo")
+        if error:
+            return error
+        symbol = symbol.upper()
+        price = price_for(symbol)
+        body = copy.deepcopy(chart)
+        result = body["chart"]["result"][0]
+        result["meta"].update(symbol=symbol, regularMarketPrice=price, previousClose=round(price * 0.99, 2))
+
+        params = request.query_params
+        if "period1" in params:
+            # Daily bar request: synthesize a deterministic random walk over the window.
+            start, end = int(params["period1"]), int(params.get("period2", time.time()))
+            days = list(range(start - start % 86400 + 52200, end, 86400))
+            rng = random.Random(symbol)
+            closes, level = [], price
+            for _ in days:
+                level *= 1 + rng.gauss(0.0003, 0.015)
+                closes.append(round(level, 2))
+            result["timestamp"] = days
+            result["indicators"] = {
+                "quote": [{"open": closes, "high": closes, "low": closes, "close": closes, "volume": [1000000] * len(days)}],
+                "adjclose": [{"adjclose": closes}],
+            }
+        return body
+
+    @app.get("/v7/finance/quote")
+    async def yahoo_quote(symbols: str = ""):
+        error = await inject("yahoo")
+        if error:
+            return error
+        template = quote["quoteResponse"]["result"][0]
+        results = []
+        for symbol in [s.upper() for s in symbols.split(",") if s]:
+            price = price_for(symbol)
+            results.append({
+                **template,
+                "symbol": symbol,
+                "regularMarketPrice": price,
+                "regularMarketPreviousClose": round(price * 0.99, 2),
+            })
+        return {"quoteResponse": {"result": results, "error": None}}
+
+    @app.get("/v1/finance/search")
+    async def yahoo_search(q: str = "", news_count: int = 10):
+        error = await inject("yahoo")
+        if error:
+            return error
+        symbol = q.upper()
+        body = json.loads(
+            json.dumps(search).replace("{symbol}", symbol).replace("{symbol_lower}", symbol.lower())
+        )
+        body["news"] = body["news"][:news_count]
+        return body
+
+    @app.post("/v1/chat/completions")
+    async def openai_chat(request: Request):
+        error = await inject("openai")
+        if error:
+            return error
+        payload = await request.json()
+        system = next((m.get("content", "") for m in payload.get("messages", []) if m.get("role") == "system"), "")
+        return completions["sentiment" if "sentiment" in system.lower() else "default"]
+
+    @app.get("/_stub/stats")
+    async def stats():
+        return {"calls": calls, "faults": {k: v.as_dict() for k, v in faults.items()}}
+
+    @app.post("/_stub/config")
+    async def configure(request: Request):
+        """Change faults at runtime, e.g. {"yahoo": {"error_rate": 0.5, "error_status": 429}}."""
+        for upstream, values in (await request.json()).items():
+            fault = faults.setdefault(upstream, Fault())
+            for key, value in values.items():
+                if hasattr(fault, key):
+                    setattr(fault, key, value)
+        return await stats()
+
+    @app.post("/{path:path}")
+    async def plaid_api(path: str):
+        error = await inject("plaid")
+        if error:
+            return error
+        body = plaid.get("/" + path)
+        if body is None:
+            return JSONResponse({"error_code": "NOT_RECORDED", "error_message": path}, status_code=400)
+        return body
+
+    return app
@@ -0,0 +1,249 @@
+"""
+Time-series query benchmark: query plans and latency at scale.
+
+Loads the same synthetic data into two layouts in a scratch schema
+(bench_timeseries) of a PostgreSQL database:
+
+    legacy   - plain portfolio_snapshots with single-column indexes on portfolio_id
+               and snapshot_date; news_articles indexed on symbol only
+    current  - portfolio_snapshots range-partitioned by month with a
+               (portfolio_id, snapshot_date) index; news_articles indexed on
+               (symbol, published_at DESC) - the layout of migration b5f3a1c8d920
+
+then runs the hot queries (/performance raw points, the snapshot writer's startup
+scan, latest news for a symbol) against both. Prints one EXPLAIN (ANALYZE,
+BUFFERS) per query and layout and latency percentiles over random parameters.
+Snapshots are generated interleaved in time, as the writer inserts them, so one
+portfolio's rows are spread across the whole heap.
+
+Run from backend/ against a throwaway database (10M rows take a few minutes to load):
+
+    DATABASE_URL=postgresql://... python -m benchmarks.timeseries --rows 10000000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+
+import numpy as np
+from sqlalchemy import create_engine, text
+
+SCHEMA = "bench_timeseries"
+
+SNAPSHOT_COLUMNS = """
+    id bigint NOT NULL,
+    portfolio_id integer NOT NULL,
+    total_value double precision NOT NULL,
+    total_cost_basis double precision NOT NULL,
+    total_gain_loss double precision NOT NULL,
+    total_gain_loss_percent double precision NOT NULL,
+    snapshot_date timestamptz NOT NULL,
+    created_at timestamptz
+"""
+
+NEWS_COLUMNS = """
+    id bigint NOT NULL PRIMARY KEY,
+    symbol varchar NOT NULL,
+    title varchar NOT NULL,
+    source varchar,
+    url varchar,
+    published_at timestamptz NOT NULL,
+    summary text,
+    sentiment_score double precision
+"""
+
+QUERIES = {
+    "performance_30d": """
+        SELECT id, total_value, total_cost_basis, total_gain_loss, total_gain_loss_percent, snapshot_date
+        FROM {snapshots}
+        WHERE portfolio_id = :portfolio_id AND snapshot_date >= :since
+        ORDER BY snapshot_date
+    """,
+    "performance_1y": """
+        SELECT id, total_value, total_cost_basis, total_gain_loss, total_gain_loss_percent, snapshot_date
+        FROM {snapshots}
+        WHERE portfolio_id = :portfolio_id AND snapshot_date >= :since_year
+        ORDER BY snapshot_date
+    """,
+    "writer_recent": """
+        SELECT portfolio_id, max(snapshot_date)
+        FROM {snapshots}
+        WHERE snapshot_date >= :recent
+        GROUP BY portfolio_id
+    """,
+    "news_latest": """
+        SELECT id, symbol, title, source, url, published_at, summary, sentiment_score
+        FROM {news}
+        WHERE symbol = :symbol AND published_at >= :news_since
+        ORDER BY published_at DESC
+        LIMIT 5
+    """,
+}
+
+
+def _month_starts(start: datetime, end: datetime) -> List[datetime]:
+    month = start.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    months = []
+    while month <= end:
+        months.append(month)
+        month = (month + timedelta(days=32)).replace(day=1)
+    return months
+
+
+def _load(conn, args, start: datetime, end: datetime) -> None:
+    """Create both layouts and fill them with identical data."""
+    conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+    conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    conn.execute(text(f"SET search_path TO {SCHEMA}"))
+    span = (end - start).total_seconds()
+
+    print(f"loading {args.rows:,} snapshots for {args.portfolios:,} portfolios...", flush=True)
+    conn.execute(text(f"CREATE TABLE legacy_snapshots ({SNAPSHOT_COLUMNS}, PRIMARY KEY (id))"))
+    conn.execute(text("""
+        INSERT INTO legacy_snapshots
+        SELECT g,
+               (g % :portfolios) + 1,
+               10000 + random() * 90000,
+               10000 + random() * 50000,
+               random() * 20000 - 5000,
+               random() * 40 - 10,
+               :start + make_interval(secs => g::double precision / :rows * :span),
+               :start + make_interval(secs => g::double precision / :rows * :span)
+        FROM generate_series(1, :rows) AS g
+    """), {"portfolios": args.portfolios, "rows": args.rows, "start": start, "span": span})
+
+    conn.execute(text(
+        f"CREATE TABLE snapshots ({SNAPSHOT_COLUMNS}, PRIMARY KEY (id, snapshot_date)) PARTITION BY RANGE (snapshot_date)"
+    ))
+    for month in _month_starts(start, end + timedelta(days=31)):
+        upper = (month + timedelta(days=32)).replace(day=1)
+        conn.execute(text(
+            f"CREATE TABLE snapshots_{month:%Y_%m} PARTITION OF snapshots FOR VALUES FROM ('{month.isoformat()}') TO ('{upper.isoformat()}')"
+        ))
+    conn.execute(text("CREATE TABLE snapshots_default PARTITION OF snapshots DEFAULT"))
+    conn.execute(text("INSERT INTO snapshots SELECT * FROM legacy_snapshots"))
+
+    print(f"loading {args.news_rows:,} news articles for {args.symbols:,} symbols...", flush=True)
+    conn.execute(text(f"CREATE TABLE legacy_news ({NEWS_COLUMNS})"))
+    conn.execute(text("""
+        INSERT INTO legacy_news
+        SELECT g,
+               'SYM' || ((g % :symbols) + 1),
+               'Headline ' || g,
+               'Newswire',
+               'https://example.com/' || g,
+               :start + make_interval(secs => g::double precision / :rows * :span),
+               NULL,
+               random() * 2 - 1
+        FROM generate_series(1, :rows) AS g
+    """), {"symbols": args.symbols, "rows": args.news_rows, "start": start, "span": span})
+    conn.execute(text(f"CREATE TABLE news ({NEWS_COLUMNS})"))
+    conn.execute(text("INSERT INTO news SELECT * FROM legacy_news"))
+
+    print("building indexes...", flush=True)
+    conn.execute(text("CREATE INDEX ON legacy_snapshots (portfolio_id)"))
+    conn.execute(text("CREATE INDEX ON legacy_snapshots (snapshot_date)"))
+    conn.execute(text("CREATE INDEX ON snapshots (portfolio_id, snapshot_date)"))
+    conn.execute(text("CREATE INDEX ON snapshots (snapshot_date)"))
+    conn.execute(text("CREATE INDEX ON legacy_news (symbol)"))
+    conn.execute(text("CREATE INDEX ON news (symbol, published_at DESC)"))
+    conn.execute(text("ANALYZE"))
+
+
+def _params(args, end: datetime) -> Dict:
+    return {
+        "portfolio_id": random.randint(1, args.portfolios),
+        "since": end - timedelta(days=30),
+        "since_year": end - timedelta(days=365),
+        "recent": end - timedelta(minutes=15),
+        "symbol": f"SYM{random.randint(1, args.symbols)}",
+        "news_since": end - timedelta(hours=24 * 7),
+    }
+
+
+def _run(conn, args, end: datetime) -> List[Dict]:
+    layouts = {
+        "legacy": {"snapshots": "legacy_snapshots", "news": "legacy_news"},
+        "current": {"snapshots": "snapshots", "news": "news"},
+    }
+    results = []
+    for name, template in QUERIES.items():
+        for layout, tables in layouts.items():
+            sql = template.format(**tables)
+            sample = _params(args, end)
+            plan = conn.execute(text("EXPLAIN (ANALYZE, BUFFERS, COSTS OFF) " + sql), sample).scalars().all()
+            print(f"\n=== {name} [{layout}] ===")
+            print("\n".join(plan))
+
+            for _ in range(args.warmup):
+                conn.execute(text(sql), _params(args, end)).all()
+            latencies = []
+            for _ in range(args.iterations):
+                params = _params(args, end)
+                started = time.perf_counter()
+                conn.execute(text(sql), params).all()
+                latencies.append((time.perf_counter() - started) * 1000)
+            results.append({
+                "query": name,
+                "layout": layout,
+                "iterations": args.iterations,
+                "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+                "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+                "mean_ms": round(float(np.mean(latencies)), 3),
+            })
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000_000, help="portfolio snapshots to generate")
+    parser.add_argument("--portfolios", type=int, default=5000)
+    parser.add_argument("--news-rows", type=int, default=2_000_000, help="news articles to generate")
+    parser.add_argument("--symbols", type=int, default=500)
+    parser.add_argument("--months", type=int, default=24, help="history covered by the generated rows")
+    parser.add_argument("--iterations", type=int, default=200, help="measured runs per query and layout")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--reuse", action="store_true", help=f"query the data already in schema {SCHEMA}")
+    parser.add_argument("--keep", action="store_true", help=f"keep schema {SCHEMA} afterwards")
+    parser.add_argument("--output", help="write the latency results as JSON")
+    args = parser.parse_args(argv)
+
+    url = os.environ.get("DATABASE_URL", "")
+    if not url.startswith("postgresql"):
+        print("DATABASE_URL must point at a throwaway PostgreSQL database", file=sys.stderr)
+        return 2
+
+    random.seed(0)
+    end = datetime.now(timezone.utc)
+    start = end - timedelta(days=30 * args.months)
+    engine = create_engine(url)
+    with engine.connect() as conn:
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        if args.reuse:
+            conn.execute(text(f"SET search_path TO {SCHEMA}"))
+            end = conn.execute(text("SELECT max(snapshot_date) FROM snapshots")).scalar()
+        else:
+            started = time.perf_counter()
+            _load(conn, args, start, end)
+            print(f"loaded in {time.perf_counter() - started:.0f}s")
+        conn.execute(text("SET max_parallel_workers_per_gather = 0"))  # per-request latency, not throughput
+        results = _run(conn, args, end)
+        if not args.keep:
+            conn.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+
+    print(f"\n{'query':<18} {'layout':<8} {'p50 ms':>9} {'p95 ms':>9} {'mean ms':>9}")
+    for r in results:
+        print(f"{r['query']:<18} {r['layout']:<8} {r['p50_ms']:>9.3f} {r['p95_ms']:>9.3f} {r['mean_ms']:>9.3f}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"rows": args.rows, "news_rows": args.news_rows, "results": results}, f, indent=2)
+        print(f"wrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
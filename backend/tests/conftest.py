@@ -0,0 +1,39 @@
+"""
+Test settings. Must be applied before anything imports app.core.config, so the
+app runs against a throwaway SQLite database, local upstream stand-ins and no
+background jobs.
+"""
+import os
+import socket
+import tempfile
+import pytest
+
+_tmp = tempfile.mkdtemp(prefix="oneview-tests-")
+os.environ.setdefault("SECRET_KEY", "test")
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp}/test.db")
+os.environ.setdefault("BAR_STORE_PATH", os.path.join(_tmp, "bars"))
+os.environ.setdefault("PRICE_REFRESHER_ENABLED", "false")
+os.environ.setdefault("PROJECTION_WORKERS", "0")
+
+# Upstream stand-ins (benchmarks/stubs.py) are served on this port by the
+# stub_upstreams fixture; the upstream guard must not throttle them.
+with socket.socket() as _s:
+    _s.bind(("127.0.0.1", 0))
+    STUB_PORT = _s.getsockname()[1]
+STUB_URL = f"http://127.0.0.1:{STUB_PORT}"
+for _name in ("YAHOO_QUERY1_URL", "YAHOO_QUERY2_URL", "PLAID_BASE_URL"):
+    os.environ.setdefault(_name, STUB_URL)
+os.environ.setdefault("OPENAI_BASE_URL", STUB_URL + "/v1")
+os.environ.setdefault("UPSTREAM_RATE_PER_SECOND", "100000")
+os.environ.setdefault("UPSTREAM_BURST", "100000")
+
+
+@pytest.fixture(scope="session")
+def stub_upstreams():
+    from benchmarks.run import _serve
+    from benchmarks.stubs import Fault, create_stub_app
+
+    server = _serve(create_stub_app({"yahoo": Fault(), "openai": Fault(), "plaid": Fault()}), STUB_PORT)
+    yield STUB_URL
+    server.should_exit = True
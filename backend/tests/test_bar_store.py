@@ -0,0 +1,104 @@
+import asyncio
+from datetime import date, timedelta
+import numpy as np
+import pytest
+from app.services import bar_store as bar_store_module
+from app.services.bar_store import BarStore, ingest_symbol, schedule_backfill
+
+
+def _bars(start: date, closes, factor: float = 1.0, actions=()):
+    dates = np.array([np.datetime64(start + timedelta(days=i), "D") for i in range(len(closes))])
+    closes = np.asarray(closes, dtype="f8") * factor
+    return {
+        "date": dates,
+        "open": closes, "high": closes, "low": closes, "close": closes, "adj_close": closes,
+        "volume": np.full(len(closes), 100.0),
+        "action_dates": np.array([np.datetime64(d, "D") for d in actions], dtype="M8[D]"),
+    }
+
+
+def _fake_upstream(monkeypatch, history):
+    """get_daily_bars stand-in serving `history()` (full series) from the requested start."""
+    async def get_daily_bars(symbol, start):
+        bars = history()
+        keep = bars["date"] >= np.datetime64(start, "D")
+        return {k: (v if k == "action_dates" else v[keep]) for k, v in bars.items()}
+    monkeypatch.setattr(bar_store_module, "get_daily_bars", get_daily_bars)
+
+
+def test_ingest_appends_then_rewrites_after_split(tmp_path, monkeypatch):
+    store = BarStore(str(tmp_path))
+    origin = date.today() - timedelta(days=10)
+    state = {"bars": _bars(origin, [10, 11, 12, 13, 14])}
+    _fake_upstream(monkeypatch, lambda: state["bars"])
+
+    assert asyncio.run(ingest_symbol("abc", store)) == 5
+
+    # Two more days, no corporate action: plain append
+    state["bars"] = _bars(origin, [10, 11, 12, 13, 14, 15, 16])
+    assert asyncio.run(ingest_symbol("abc", store)) == 2
+    assert store.rewrites == 0
+
+    # 2:1 split after the last stored bar: upstream halves all earlier prices
+    split_day = origin + timedelta(days=8)
+    state["bars"] = _bars(origin, [10, 11, 12, 13, 14, 15, 16, 17, 18], factor=0.5, actions=[split_day])
+    assert asyncio.run(ingest_symbol("abc", store)) == 9
+    assert store.rewrites == 1
+    np.testing.assert_allclose(store.read("ABC")["close"], np.arange(10, 19) * 0.5)
+
+
+def test_ingest_rewrites_when_overlapping_bar_changed(tmp_path, monkeypatch):
+    store = BarStore(str(tmp_path))
+    origin = date.today() - timedelta(days=10)
+    state = {"bars": _bars(origin, [10, 11, 12])}
+    _fake_upstream(monkeypatch, lambda: state["bars"])
+    asyncio.run(ingest_symbol("xyz", store))
+
+    # Dividend outside the fetched window, but the stored last bar was re-adjusted
+    state["bars"] = _bars(origin, [10, 11, 12, 13], factor=0.98)
+    asyncio.run(ingest_symbol("xyz", store))
+    assert store.rewrites == 1
+    assert store.length("XYZ") == 4
+    np.testing.assert_allclose(store.read("XYZ")["adj_close"], np.array([10, 11, 12, 13]) * 0.98)
+    assert store.symbols() == ["XYZ"]
+
+
+def test_schedule_backfill_reports_missing_and_ingests_in_background(tmp_path, monkeypatch):
+    store = BarStore(str(tmp_path))
+    origin = date.today() - timedelta(days=10)
+    _fake_upstream(monkeypatch, lambda: _bars(origin, [10, 11, 12]))
+    monkeypatch.setattr(bar_store_module, "_backfill_attempted", {})
+
+    async def scenario():
+        missing = schedule_backfill(["new", "NEW"], store)
+        assert store.length("NEW") == 0  # nothing fetched inline
+        assert schedule_backfill(["new"], store) == ["NEW"]  # still missing, not scheduled twice
+        assert len(bar_store_module._backfill_tasks) == 1
+        await asyncio.gather(*bar_store_module._backfill_tasks)
+        return missing
+
+    assert asyncio.run(scenario()) == ["NEW"]
+    assert store.length("NEW") == 3
+
+
+def test_symbols_that_are_not_tickers_never_reach_the_filesystem(tmp_path):
+    store = BarStore(str(tmp_path / "bars"))
+    bars = _bars(date.today() - timedelta(days=3), [1, 2])
+    for symbol in ("../x", "/etc", "..", ".", "A/B", "-rf", "X" * 16, ""):
+        assert store.length(symbol) == 0
+        with pytest.raises(ValueError):
+            store.append(symbol, bars)
+        with pytest.raises(ValueError):
+            asyncio.run(ingest_symbol(symbol, store))
+    assert not (tmp_path / "x").exists()
+    assert schedule_backfill(["../x"], store) == ["../X"]  # reported, never fetched
+
+
+def test_dotted_tickers_are_listed(tmp_path):
+    store = BarStore(str(tmp_path))
+    bars = _bars(date.today() - timedelta(days=3), [1, 2])
+    for symbol in ("BRK.B", "^GSPC", "EURUSD=X"):
+        store.append(symbol, bars)
+    store.replace("BRK.B", bars)
+    (tmp_path / "BRK.B.rewrite").mkdir()  # left behind by an interrupted replace()
+    assert store.symbols() == ["BRK.B", "EURUSD=X", "^GSPC"]
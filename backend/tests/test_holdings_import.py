@@ -0,0 +1,77 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.services.holdings_import import validate_record
+
+
+@pytest.mark.parametrize("record", [
+    {"symbol": "AAPL", "quantity": "inf", "average_cost": "10"},
+    {"symbol": "AAPL", "quantity": "5", "average_cost": "nan"},
+    {"symbol": "AAPL", "quantity": "5", "cost_basis": "Infinity"},
+])
+def test_non_finite_numbers_are_rejected(record):
+    with pytest.raises(ValueError, match="finite"):
+        validate_record(record)
+
+
+@pytest.fixture(scope="module")
+def imports(stub_upstreams):
+    from app.core.database import Base, SessionLocal, engine
+    from app.main import app
+    from app.models import User, Portfolio
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        if not db.query(User).filter(User.id == 1).first():
+            db.add(User(id=1, email="tests@oneview.local", hashed_password="!", full_name="Tests"))
+        portfolio = Portfolio(user_id=1, name="holdings-import")
+        db.add(portfolio)
+        db.commit()
+        portfolio_id = portfolio.id
+    finally:
+        db.close()
+
+    with TestClient(app) as client:
+        yield client, f"/api/v1/portfolios/{portfolio_id}/holdings/import"
+
+
+def _multipart(content: bytes):
+    boundary = "oneview-test-boundary"
+    body = (
+        f"--{boundary}\r\n"
+        'Content-Disposition: form-data; name="file"; filename="holdings.csv"\r\n'
+        "Content-Type: text/csv\r\n\r\n"
+    ).encode() + content + f"\r\n--{boundary}--\r\n".encode()
+    return body, {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+
+
+def test_multipart_upload_is_imported(imports):
+    client, path = imports
+    body, headers = _multipart(b"symbol,quantity,average_cost\nMPART,2,10\n")
+    response = client.post(path, content=body, headers=headers)
+    assert response.status_code == 200, response.text
+    assert [h["symbol"] for h in response.json()["holdings"]] == ["MPART"]
+
+
+def test_oversized_upload_is_rejected_by_content_length(imports, monkeypatch):
+    from app.core.config import settings
+    client, path = imports
+    monkeypatch.setattr(settings, "IMPORT_MAX_BYTES", 100)
+    response = client.post(path, content=b"symbol,quantity\n" + b"AAPL,1\n" * 50, headers={"Content-Type": "text/csv"})
+    assert response.status_code == 413
+
+
+@pytest.mark.parametrize("size", [2_000, 200_000])
+def test_oversized_multipart_stream_is_cut_off(imports, monkeypatch, size):
+    from app.core.config import settings
+    client, path = imports
+    monkeypatch.setattr(settings, "IMPORT_MAX_BYTES", 1_000)
+    body, headers = _multipart(b"symbol,quantity\n" + b"A" * size)
+
+    def chunked():
+        # No Content-Length: the limit has to be enforced while the body streams in
+        for i in range(0, len(body), 4096):
+            yield body[i:i + 4096]
+
+    response = client.post(path, content=chunked(), headers=headers)
+    assert response.status_code == 413
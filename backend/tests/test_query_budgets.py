@@ -0,0 +1,103 @@
+"""
+Every route that declares a query_budget() stays within it: the app runs on
+SQLite against the upstream stand-ins, and each request's X-Query-Count header
+is checked against its X-Query-Budget.
+"""
+from datetime import datetime, timedelta
+import pytest
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture(scope="module")
+def seeded(stub_upstreams):
+    from app.core.database import Base, SessionLocal, engine
+    from app.main import app
+    from app.models import User, Portfolio, Holding
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        if not db.query(User).filter(User.id == 1).first():
+            db.add(User(id=1, email="tests@oneview.local", hashed_password="!", full_name="Tests"))
+        portfolio = Portfolio(user_id=1, name="query-budgets")
+        db.add(portfolio)
+        db.flush()
+        added = datetime.utcnow() - timedelta(days=90)
+        db.add_all([
+            Holding(portfolio_id=portfolio.id, symbol=f"Q{i:03d}", quantity=5 + i, average_cost=40 + i, created_at=added)
+            for i in range(12)
+        ])
+        db.commit()
+        portfolio_id = portfolio.id
+    finally:
+        db.close()
+
+    with TestClient(app) as client:
+        yield client, portfolio_id
+
+
+IMPORT_CSV = "symbol,quantity,average_cost\nQ000,3,41\nQNEW1,2,10\nQNEW2,4,12\n"
+
+BUDGETED_ROUTES = [
+    ("GET", "/api/v1/portfolios/", {}),
+    ("GET", "/api/v1/portfolios/net-worth", {}),
+    ("GET", "/api/v1/portfolios/{pid}", {}),
+    ("GET", "/api/v1/portfolios/{pid}/summary", {}),
+    ("POST", "/api/v1/portfolios/{pid}/holdings/import", {"content": IMPORT_CSV, "headers": {"Content-Type": "text/csv"}}),
+    ("GET", "/api/v1/portfolios/{pid}/performance?days=30", {}),
+    ("GET", "/api/v1/portfolios/{pid}/returns", {}),
+    ("GET", "/api/v1/portfolios/{pid}/risk", {}),
+    ("GET", "/api/v1/portfolios/{pid}/projection?years=1&paths=200&seed=1", {}),
+    ("GET", "/api/v1/chatbot/portfolio/{pid}/insights", {}),
+    ("POST", "/api/v1/chatbot/portfolio/{pid}/chat", {"json": {"message": "How is my portfolio doing?"}}),
+]
+
+
+@pytest.mark.parametrize("method,path,kwargs", BUDGETED_ROUTES, ids=[f"{m} {p}" for m, p, _ in BUDGETED_ROUTES])
+def test_route_stays_within_query_budget(seeded, method, path, kwargs):
+    client, pid = seeded
+    path = path.format(pid=pid)
+    # Twice: cold (caches empty) and warm
+    for _ in range(2):
+        response = client.request(method, path, **kwargs)
+        assert response.status_code == 200, response.text
+        budget = response.headers.get("X-Query-Budget")
+        assert budget is not None, f"{path} declares no query budget"
+        count = int(response.headers["X-Query-Count"])
+        assert count <= int(budget), f"{method} {path} ran {count} queries, budget {budget}"
+
+
+def _query_count(client, path):
+    """Queries one warm request to `path` ran, after checking it against its budget."""
+    client.get(path)  # warm the quote cache for any new symbols
+    response = client.get(path)
+    assert response.status_code == 200, response.text
+    count = int(response.headers["X-Query-Count"])
+    assert count <= int(response.headers["X-Query-Budget"]), f"{path} ran {count} queries"
+    return count
+
+
+@pytest.mark.parametrize("path", ["/api/v1/portfolios/", "/api/v1/portfolios/net-worth"])
+def test_query_count_does_not_grow_with_portfolios(seeded, path):
+    from app.core.database import SessionLocal
+    from app.models import Portfolio, Holding
+
+    client, _ = seeded
+    baseline = _query_count(client, path)
+
+    db = SessionLocal()
+    try:
+        for n in range(20):
+            portfolio = Portfolio(user_id=1, name=f"query-budgets-{path.strip('/').replace('/', '-')}-{n}")
+            db.add(portfolio)
+            db.flush()
+            db.add_all([
+                Holding(portfolio_id=portfolio.id, symbol=f"P{n:02d}{i}", quantity=1 + i, average_cost=10 + n)
+                for i in range(3)
+            ])
+        db.commit()
+        assert db.query(Portfolio).filter(Portfolio.user_id == 1).count() >= 21
+    finally:
+        db.close()
+
+    assert _query_count(client, path) == baseline
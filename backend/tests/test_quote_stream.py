@@ -0,0 +1,76 @@
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+from app.services.quote_cache import QuoteCache
+
+
+def test_max_age_refetches_entries_within_ttl(monkeypatch):
+    clock = {"now": 1000.0}
+    monkeypatch.setattr("app.services.quote_cache.time.monotonic", lambda: clock["now"])
+    cache = QuoteCache(ttl_seconds=45, max_size=10)
+    fetches = []
+
+    async def fetch_many(symbols):
+        fetches.append(list(symbols))
+        return {s: {"price": clock["now"]} for s in symbols}
+
+    async def scenario():
+        await cache.get_many_or_fetch(["AAPL"], fetch_many)
+        clock["now"] += 10
+        cached = await cache.get_many_or_fetch(["AAPL"], fetch_many)  # within the TTL
+        polled = await cache.get_many_or_fetch(["AAPL"], fetch_many, max_age_seconds=5)
+        return cached, polled
+
+    cached, polled = asyncio.run(scenario())
+    assert cached["AAPL"]["price"] == 1000.0
+    assert polled["AAPL"]["price"] == 1010.0
+    assert fetches == [["AAPL"], ["AAPL"]]
+
+
+@pytest.fixture(scope="module")
+def client():
+    from app.main import app
+
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.mark.parametrize("portfolio_id", ["abc", "1.5", [1], {"id": 1}, True])
+def test_invalid_portfolio_id_message_closes_with_1008(client, portfolio_id):
+    with client.websocket_connect("/api/v1/stream/quotes") as websocket:
+        websocket.send_json({"action": "subscribe", "portfolio_id": portfolio_id})
+        with pytest.raises(WebSocketDisconnect) as closed:
+            websocket.receive_json()
+    assert closed.value.code == 1008
+
+
+def test_invalid_portfolio_id_query_closes_with_1008(client):
+    with pytest.raises(WebSocketDisconnect) as closed:
+        with client.websocket_connect("/api/v1/stream/quotes?portfolio_id=abc") as websocket:
+            websocket.receive_json()
+    assert closed.value.code == 1008
+
+
+def _subscribed(websocket):
+    while True:
+        message = websocket.receive_json()
+        if message["type"] == "subscribed":
+            return message["symbols"]
+
+
+def test_string_symbols_subscribe_whole_symbols(client):
+    with client.websocket_connect("/api/v1/stream/quotes") as websocket:
+        websocket.send_json({"action": "subscribe", "symbols": "msft"})
+        assert _subscribed(websocket) == ["MSFT"]
+        websocket.send_json({"action": "subscribe", "symbols": "AAPL,GOOG"})
+        assert _subscribed(websocket) == ["AAPL", "GOOG", "MSFT"]
+
+
+@pytest.mark.parametrize("symbols", [5, {"symbol": "AAPL"}, ["AAPL", 3], True])
+def test_invalid_symbols_message_closes_with_1008(client, symbols):
+    with client.websocket_connect("/api/v1/stream/quotes") as websocket:
+        websocket.send_json({"action": "subscribe", "symbols": symbols})
+        with pytest.raises(WebSocketDisconnect) as closed:
+            websocket.receive_json()
+    assert closed.value.code == 1008
@@ -0,0 +1,69 @@
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+import numpy as np
+from app.services.bar_store import BarStore
+from app.services.returns_engine import compute_returns, events_from_holdings
+
+
+def _store(tmp_path, closes_by_symbol, origin: date) -> BarStore:
+    store = BarStore(str(tmp_path))
+    for symbol, closes in closes_by_symbol.items():
+        closes = np.asarray(closes, dtype="f8")
+        store.append(symbol, {
+            "date": np.array([np.datetime64(origin + timedelta(days=i), "D") for i in range(len(closes))]),
+            "open": closes, "high": closes, "low": closes, "close": closes, "adj_close": closes,
+            "volume": np.full(len(closes), 100.0),
+        })
+    return store
+
+
+def _holding(symbol, quantity, average_cost, created_at):
+    return SimpleNamespace(symbol=symbol, quantity=quantity, average_cost=average_cost, created_at=created_at)
+
+
+def test_holdings_open_at_that_days_close(tmp_path):
+    origin = date.today() - timedelta(days=5)
+    store = _store(tmp_path, {"ABC": [10, 20, 22]}, origin)
+    # Bought long ago at 5: the gain up to the day it was added is not this portfolio's return
+    events = events_from_holdings([_holding("abc", 2, 5.0, datetime.combine(origin + timedelta(days=1), datetime.min.time()))])
+
+    result = compute_returns(events, store=store)
+    assert result["net_contributions"] == 40.0
+    assert result["values"].tolist() == [40.0, 44.0]
+    assert abs(result["twr"] - 0.1) < 1e-12
+
+
+def test_holdings_added_after_last_stored_bar(tmp_path):
+    origin = date.today() - timedelta(days=5)
+    store = _store(tmp_path, {"ABC": [10, 11, 12]}, origin)
+    events = events_from_holdings([_holding("ABC", 3, 9.0, datetime.utcnow())])
+
+    result = compute_returns(events, store=store)
+    assert result["missing_symbols"] == []
+    assert result["end_date"] == origin + timedelta(days=2)
+    assert result["values"].tolist() == [36.0]
+    assert result["twr"] == 0.0
+
+
+def test_opening_positions_without_events_or_start(tmp_path):
+    origin = date.today() - timedelta(days=5)
+    store = _store(tmp_path, {"ABC": [10, 11, 12]}, origin)
+
+    result = compute_returns([], opening={"abc": 1}, store=store)
+    assert result["start_date"] == origin
+    assert result["start_value"] == 10.0
+    assert abs(result["twr"] - 0.2) < 1e-12
+
+
+def test_trades_after_a_past_end_stay_out_of_the_window(tmp_path):
+    origin = date.today() - timedelta(days=30)
+    store = _store(tmp_path, {"ABC": list(range(10, 30))}, origin)
+    events = [
+        {"date": origin, "symbol": "ABC", "quantity": 1, "amount": 10.0},
+        {"date": origin + timedelta(days=15), "symbol": "ABC", "quantity": 100, "amount": 2500.0},
+    ]
+
+    result = compute_returns(events, end=origin + timedelta(days=5), store=store)
+    assert result["values"].tolist() == [10.0, 11.0, 12.0, 13.0, 14.0, 15.0]
+    assert result["net_contributions"] == 10.0
+    assert result["end_date"] == origin + timedelta(days=5)
@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from app.core.database import Base
+from app.models import PortfolioSnapshot, PortfolioSnapshotRollup
+from app.services.snapshot_rollups import aggregate, bucket_start, choose_tier, compact, upsert_rollups
+
+NOW = datetime(2026, 6, 17, 12, 0, tzinfo=timezone.utc)  # a Wednesday
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/rollups.db")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def _snapshot(portfolio_id, taken_at, value):
+    return {
+        "portfolio_id": portfolio_id,
+        "total_value": value,
+        "total_cost_basis": 100.0,
+        "total_gain_loss": value - 100.0,
+        "total_gain_loss_percent": value - 100.0,
+        "snapshot_date": taken_at,
+    }
+
+
+def _rollup(db, portfolio_id, tier, start):
+    return db.query(PortfolioSnapshotRollup).filter_by(portfolio_id=portfolio_id, tier=tier).filter(
+        PortfolioSnapshotRollup.bucket_start == start
+    ).one()
+
+
+def test_upsert_merges_into_stored_buckets(db):
+    hour = datetime(2026, 6, 1, 10, tzinfo=timezone.utc)
+    later = [_snapshot(1, hour + timedelta(minutes=40), 130.0), _snapshot(1, hour + timedelta(minutes=50), 120.0)]
+    earlier = [_snapshot(1, hour + timedelta(minutes=5), 90.0)]
+    upsert_rollups(db, aggregate(later, ["hour"]))
+    upsert_rollups(db, aggregate(earlier, ["hour"]))
+    db.commit()
+
+    row = _rollup(db, 1, "hour", hour)
+    assert (row.open_value, row.close_value) == (90.0, 120.0)
+    assert (row.low_value, row.high_value) == (90.0, 130.0)
+    assert row.sample_count == 3
+
+    upsert_rollups(db, aggregate(earlier, ["hour"]), replace=True)
+    db.commit()
+    db.expire_all()
+    row = _rollup(db, 1, "hour", hour)
+    assert (row.open_value, row.close_value, row.sample_count) == (90.0, 90.0, 1)
+
+
+def test_compact_rebuilds_expired_buckets_and_applies_retention(db):
+    expired_at = NOW - timedelta(days=30)
+    expired = [_snapshot(portfolio_id, expired_at + timedelta(minutes=10 * i), 100.0 + i) for portfolio_id in (1, 2) for i in range(4)]
+    fresh = [_snapshot(1, NOW - timedelta(days=1), 150.0)]
+    db.execute(insert(PortfolioSnapshot), expired + fresh)
+    old_hour = bucket_start(NOW - timedelta(days=120), "hour")
+    upsert_rollups(db, [{**r, "bucket_start": old_hour} for r in aggregate(fresh, ["hour"])])
+    db.commit()
+
+    result = compact(db, now=NOW)
+    db.commit()
+
+    assert result["raw_deleted"] == 8
+    assert result["hourly_deleted"] == 1
+    assert result["buckets_rebuilt"] == 2 * 3  # one hour, day and week bucket per portfolio
+    assert db.query(PortfolioSnapshot).count() == 1
+    for tier in ("hour", "day", "week"):
+        row = _rollup(db, 2, tier, bucket_start(expired_at, tier))
+        assert (row.open_value, row.close_value, row.high_value, row.low_value) == (100.0, 103.0, 103.0, 100.0)
+        assert row.sample_count == 4
+
+
+@pytest.mark.parametrize("days,max_points,tier", [
+    (365, 50, "week"),   # 52 weekly buckets are enough
+    (30, 100, "hour"),   # 30 days < 100, 720 hours >= 100
+    (365, 400, "day"),   # finer than daily isn't retained for a year
+    (5, 500, "raw"),     # nothing rolled up has enough points
+])
+def test_choose_tier(days, max_points, tier):
+    assert choose_tier(days, max_points) == tier
+
+
+def test_snapshot_key_is_id_and_date_on_every_database(db):
+    assert [c.name for c in PortfolioSnapshot.__table__.primary_key] == ["id", "snapshot_date"]
+    rows = [_snapshot(1, NOW, 100.0), _snapshot(1, NOW, 101.0)]
+    db.execute(insert(PortfolioSnapshot), rows)
+    snapshot = PortfolioSnapshot(**_snapshot(1, NOW, 102.0))
+    db.add(snapshot)
+    db.commit()
+    assert snapshot.id == 3
+    assert [s.id for s in db.query(PortfolioSnapshot).order_by(PortfolioSnapshot.id)] == [1, 2, 3]
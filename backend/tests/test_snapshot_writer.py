@@ -0,0 +1,73 @@
+import asyncio
+import threading
+import pytest
+from datetime import datetime, timedelta, timezone
+from app.services import snapshot_writer as snapshot_writer_module
+from app.services.snapshot_writer import SnapshotWriter
+
+TOTALS = {"total_market_value": 100.0, "total_cost_basis": 90.0, "total_gain_loss": 10.0, "total_gain_loss_percent": 11.1}
+
+
+def test_pending_buffer_is_capped_after_failed_flushes(monkeypatch):
+    def failing_write(rows):
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(snapshot_writer_module, "_write", failing_write)
+    writer = SnapshotWriter(min_interval_seconds=0, flush_interval_seconds=30, batch_size=2, max_pending=5)
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+    for i in range(4):
+        writer.record(i, TOTALS, start + timedelta(minutes=i))
+    assert asyncio.run(writer.flush()) == 0
+    for i in range(4, 8):
+        writer.record(i, TOTALS, start + timedelta(minutes=i))
+    asyncio.run(writer.flush())
+
+    stats = writer.stats()
+    assert stats["pending"] == 5
+    assert stats["dropped"] == 3
+    assert stats["failed_flushes"] == 2
+    # The newest snapshots are the ones kept
+    assert [row["portfolio_id"] for row in writer._pending] == [3, 4, 5, 6, 7]
+
+
+@pytest.mark.parametrize("fails", [False, True])
+def test_flush_cancelled_mid_write_settles_the_batch_once(monkeypatch, fails):
+    started, release, written = threading.Event(), threading.Event(), []
+
+    def slow_write(rows):
+        started.set()
+        release.wait(5)
+        if fails:
+            raise RuntimeError("database unavailable")
+        written.extend(rows)
+
+    monkeypatch.setattr(snapshot_writer_module, "_write", slow_write)
+    writer = SnapshotWriter(min_interval_seconds=0, flush_interval_seconds=30, batch_size=10, max_pending=10)
+    for i in range(3):
+        writer.record(i, TOTALS)
+
+    async def scenario():
+        flush = asyncio.create_task(writer.flush())
+        await asyncio.to_thread(started.wait, 5)
+        flush.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await flush
+        # Shutting down waits for the write that is still running before flushing again
+        close = asyncio.create_task(writer.close())
+        await asyncio.sleep(0.05)
+        assert not close.done()
+        release.set()
+        await close
+
+    asyncio.run(scenario())
+    stats = writer.stats()
+    if fails:
+        # Put back when the thread failed, then retried (and failed again) by close()
+        assert stats["pending"] == 3
+        assert stats["failed_flushes"] == 2
+        assert written == []
+    else:
+        assert stats["pending"] == 0
+        assert (stats["written"], stats["flushes"]) == (3, 1)
+        assert len(written) == 3
@@ -0,0 +1,152 @@
+import asyncio
+import httpx
+import pytest
+from app.core.upstream_guard import GuardedTransport, UpstreamUnavailable, get_guard, reset_guards
+
+
+class StubUpstream(httpx.AsyncBaseTransport):
+    """Answers every request with 200 and counts them."""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        return httpx.Response(200, json={"ok": True})
+
+
+def _half_open(host: str):
+    guard = get_guard(host)
+    guard.breaker.record_failure()
+    guard.breaker._trip(open_for=0.0)
+    return guard
+
+
+@pytest.fixture(autouse=True)
+def fresh_guards():
+    reset_guards()
+    yield
+    reset_guards()
+
+
+@pytest.mark.parametrize("blocked", ["limiter", "bucket"])
+def test_cancelled_half_open_probe_is_released(blocked):
+    async def scenario():
+        upstream = StubUpstream()
+        transport = GuardedTransport(upstream)
+        guard = _half_open("probe.test")
+        if blocked == "limiter":
+            guard.limiter.inflight = int(guard.limiter.limit)
+        else:
+            guard.bucket.tokens = 0.0
+            guard.bucket.rate = 1.0
+
+        request = httpx.Request("GET", "http://probe.test/quote")
+        probe = asyncio.create_task(transport.handle_async_request(request))
+        await asyncio.sleep(0.05)
+        assert guard.breaker._probe_inflight
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        assert not guard.breaker._probe_inflight
+        assert upstream.calls == 0
+
+        # The next caller gets the probe and closes the breaker
+        guard.limiter.inflight = 0
+        guard.bucket.tokens = float(guard.bucket.capacity)
+        response = await transport.handle_async_request(request)
+        assert response.status_code == 200
+        assert guard.breaker.state == "closed"
+
+    asyncio.run(scenario())
+
+
+def test_rejected_half_open_probe_is_released(monkeypatch):
+    async def scenario():
+        from app.core import upstream_guard
+        monkeypatch.setattr(upstream_guard.settings, "UPSTREAM_MAX_QUEUE_WAIT_SECONDS", 0.0)
+        transport = GuardedTransport(StubUpstream())
+        guard = _half_open("reject.test")
+        guard.limiter.inflight = int(guard.limiter.limit)
+        with pytest.raises(UpstreamUnavailable):
+            await transport.handle_async_request(httpx.Request("GET", "http://reject.test/"))
+        assert not guard.breaker._probe_inflight
+
+    asyncio.run(scenario())
+
+
+class GatedUpstream(StubUpstream):
+    """Holds every request until its gate opens."""
+
+    def __init__(self):
+        super().__init__()
+        self.gate = asyncio.Event()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await self.gate.wait()
+        return await super().handle_async_request(request)
+
+
+def test_stale_request_does_not_touch_the_probe():
+    async def scenario():
+        upstream = GatedUpstream()
+        transport = GuardedTransport(upstream)
+        guard = get_guard("stale.test")
+        request = httpx.Request("GET", "http://stale.test/")
+        stale = asyncio.create_task(transport.handle_async_request(request))
+        await asyncio.sleep(0.05)
+
+        # The breaker opens and half-opens while the first request is still in flight
+        _half_open("stale.test")
+        probe = asyncio.create_task(transport.handle_async_request(request))
+        await asyncio.sleep(0.05)
+        assert guard.breaker._probe_inflight
+
+        stale.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await stale
+        assert guard.breaker._probe_inflight
+
+        upstream.gate.set()
+        await probe
+        assert guard.breaker.state == "closed"
+
+    asyncio.run(scenario())
+
+
+def test_stale_success_does_not_close_the_breaker():
+    async def scenario():
+        upstream = GatedUpstream()
+        transport = GuardedTransport(upstream)
+        guard = get_guard("late.test")
+        request = httpx.Request("GET", "http://late.test/")
+        stale = asyncio.create_task(transport.handle_async_request(request))
+        await asyncio.sleep(0.05)
+
+        guard.breaker.record_failure()
+        guard.breaker._trip(open_for=60.0)
+        upstream.gate.set()
+        response = await stale
+        assert response.status_code == 200
+        assert guard.breaker.state == "open"
+
+    asyncio.run(scenario())
+
+
+def test_concurrency_slot_is_held_until_the_body_is_closed():
+    class StreamingUpstream(StubUpstream):
+        async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+            return httpx.Response(200, stream=httpx.ByteStream(b"body"))
+
+    async def scenario():
+        guard = get_guard("body.test")
+        async with httpx.AsyncClient(transport=GuardedTransport(StreamingUpstream())) as client:
+            async with client.stream("GET", "http://body.test/") as response:
+                assert guard.limiter.inflight == 1
+                assert await response.aread() == b"body"
+            assert guard.limiter.inflight == 0
+            response = await client.get("http://body.test/")
+            assert response.content == b"body"
+            assert guard.limiter.inflight == 0
+
+    asyncio.run(scenario())
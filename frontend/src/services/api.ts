@@ -19,6 +19,8 @@ export interface Holding {
   market_value: number | null;
   gain_loss: number | null;
   gain_loss_percent: number | null;
+  price_stale?: boolean | null;
+  price_as_of?: string | null;
   created_at: string;
 }
 
@@ -74,11 +76,15 @@ export interface PortfolioSnapshot {
   total_gain_loss: number;
   total_gain_loss_percent: number;
   snapshot_date: string;
+  open_value?: number | null;
+  high_value?: number | null;
+  low_value?: number | null;
 }
 
 export interface HistoricalPerformance {
   portfolio_id: number;
   portfolio_name: string;
+  resolution?: 'raw' | 'hour' | 'day' | 'week';
   data_points: PortfolioSnapshot[];
   current_value: number;
   initial_value: number | null;
@@ -133,8 +139,9 @@ export const portfolioApi = {
     await api.delete(`/portfolios/${portfolioId}/holdings/${holdingId}`);
   },
 
-  getPerformance: async (id: number, days: number = 30): Promise<HistoricalPerformance> => {
-    const response = await api.get(`/portfolios/${id}/performance?days=${days}`);
+  getPerformance: async (id: number, days: number = 30, maxPoints?: number): Promise<HistoricalPerformance> => {
+    const params = maxPoints ? `&max_points=${maxPoints}` : '';
+    const response = await api.get(`/portfolios/${id}/performance?days=${days}${params}`);
     return response.data;
   },
 };